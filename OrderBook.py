@@ -1,21 +1,59 @@
 import sys
-from collections import deque
-from decimal import Decimal, getcontext # Import Decimal
-from ordertree import OrderTree
+from decimal import Decimal, Context, getcontext # Import Decimal
+from ordertree import OrderTree, OrderPool
+from ladderordertree import LadderOrderTree
+from fills import FillColumns, FillBuffer, FillView
+from tape import TradeTape
+from journal import EventJournal
+from snapshot import dump_book, load_book
+from latency import LatencyRecorder
 from io import StringIO
 import time
+from time import perf_counter_ns
 # Set global decimal precision (important for crypto)
 getcontext().prec = 10
 
 
+def _check_owner(owner):
+    # Journals and snapshots keep an owner's type only for str and int
+    if type(owner) is not str and type(owner) is not int:
+        raise TypeError(f'order owner must be a str or an int, not {type(owner).__name__}')
+
+
 class OrderBook:
-    def __init__(self, symbol='BTC/USD', tick_size=Decimal('0.01')): # Use Decimal for tick_size
+    def __init__(self, symbol='BTC/USD', tick_size=Decimal('0.01'), integer_ticks=False, lot_size=Decimal('0.00000001'),
+                 ladder_capacity=None, tape=None, track_latency=False): # Use Decimal for tick_size
         self.symbol = symbol
-        self.tick_size = tick_size
-
-        self.bids = OrderTree()
-        self.asks = OrderTree()
-        self.tape = deque(maxlen=None)  # recent trades
+        self.tick_size = Decimal(str(tick_size))
+        # Integer tick mode: prices are held internally as integer multiples of
+        # tick_size and quantities as integer multiples of lot_size. Decimal
+        # conversion only happens at the API boundary.
+        self.integer_ticks = integer_ticks
+        self.lot_size = Decimal(str(lot_size))
+        self._ctx = Context(prec=28) # wide context so large books do not lose digits converting
+        # tick_size and lot_size as exact fractions: ticks * num / den is the correctly rounded float price
+        self._tick_ratio = self.tick_size.as_integer_ratio()
+        self._lot_ratio = self.lot_size.as_integer_ratio()
+
+        self.order_pool = OrderPool() # Order records shared by both sides
+        if ladder_capacity:
+            # Dense tick ladder instead of a SortedDict for books that trade in a band around mid
+            if not integer_ticks:
+                raise ValueError('ladder_capacity requires integer_ticks=True')
+            self.bids = LadderOrderTree(ladder_capacity, self.order_pool, 'bid')
+            self.asks = LadderOrderTree(ladder_capacity, self.order_pool, 'ask')
+        else:
+            self.bids = OrderTree(integer_ticks, self.order_pool, 'bid')
+            self.asks = OrderTree(integer_ticks, self.order_pool, 'ask')
+        self._depth_views = {} # side : (top_version, n, converted levels) for integer tick mode
+        self.depth_seq = 0 # sequence number of the last L2 delta emitted
+        self.depth_listeners = [] # fn(seq, side, price, volume) receiving L2 deltas
+        self.journal = None # EventJournal recording every order/cancel/modify, see open_journal
+        self.tape = tape if tape is not None else TradeTape()  # recent trades, bounded ring buffer
+        self.fill_buffer = FillBuffer(integer_ticks) # reused by every order, see process_order_fills
+        self.latency = LatencyRecorder() if track_latency else None # per operation/outcome histograms, see latency_stats
+        self.owner_orders = {} # owner : {order_id: side} of its resting orders, in arrival order
+        self.order_owners = {} # order_id : owner, for resting orders placed with an 'owner'
         self.time = 0
         self.next_order_id = 0
 
@@ -23,10 +61,90 @@ class OrderBook:
     def update_time(self):
         self.time += 1
 
+    # ---- Integer Tick Conversion ----
+    def _to_units(self, value, size, size_name):
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value))
+        units = self._ctx.divide(value, size)
+        if units != units.to_integral_value():
+            # Rounding would silently move the order (or turn a sub-lot quantity into 0)
+            raise ValueError(f'{value} is not a multiple of {size_name} {size}')
+        return int(units)
+
+    def to_ticks(self, price):
+        '''Convert an external price (Decimal, float, int or str) to integer ticks.
+
+        Raises ValueError when price is not a whole number of ticks.
+        '''
+        return self._to_units(price, self.tick_size, 'tick_size')
+
+    def from_ticks(self, ticks):
+        return self._ctx.multiply(Decimal(ticks), self.tick_size)
+
+    def to_lots(self, quantity):
+        '''Convert an external quantity to integer lots. Raises ValueError when it is not a whole number of lots.'''
+        return self._to_units(quantity, self.lot_size, 'lot_size')
+
+    def from_lots(self, lots):
+        return self._ctx.multiply(Decimal(lots), self.lot_size)
+
+    def _export_order(self, quote):
+        '''Copy of a resting quote with price/quantity converted back from ticks/lots.'''
+        order = dict(quote)
+        order['price'] = self.from_ticks(quote['price'])
+        order['quantity'] = self.from_lots(quote['quantity'])
+        return order
+
     # ---- Processing Orders ----
     def process_order(self, quote, from_data=False, verbose=False):
+        fills, order_in_book = self._process_quote(quote, from_data, verbose)
+        if self.integer_ticks and order_in_book is not None:
+            order_in_book = self._export_order(order_in_book)
+        return fills.to_dicts(), order_in_book
+
+    def process_order_fills(self, quote, from_data=False, verbose=False):
+        '''Like process_order, but the fills come back as a FillView over the book's reusable FillBuffer.
+
+        No trade dict or list is built per fill; the view reads prices,
+        quantities and maker ids from the buffer (engine units) and can still
+        produce the trade dicts on demand. It is only valid until the next
+        order is processed. order_in_book is in engine units.
+        '''
+        return self._process_quote(quote, from_data, verbose)
+
+    def process_orders(self, batch=None, sides=None, types=None, prices=None, quantities=None,
+                       from_data=False, verbose=False):
+        '''Process a batch of orders and return the fills as a FillColumns.
+
+        Orders are given either as a sequence of quote dicts (``batch``) or as
+        parallel sequences ``sides``, ``types``, ``prices`` and ``quantities``
+        (the price of a market order is ignored). Fills are appended straight
+        into typed column arrays, so no per-fill trade dicts are built. Order
+        ids must be integers.
+        '''
+        if batch is None:
+            batch = [{'side': side, 'type': order_type, 'price': price, 'quantity': quantity}
+                     for side, order_type, price, quantity in zip(sides, types, prices, quantities)]
+        fills = FillColumns(self.integer_ticks)
+        process_quote = self._process_quote
+        for quote in batch:
+            process_quote(quote, from_data, verbose, fills)
+        return fills
+
+    def _process_quote(self, quote, from_data, verbose, fills=None, raw=False):
+        # raw=True: quote is already in engine units (journal replay of an integer tick book)
+        latency = self.latency
+        if latency is not None:
+            started = perf_counter_ns()
+            fills_before = self.tape.total_count
         order_type = quote['type']
         order_in_book = None
+        if self.integer_ticks and not raw:
+            # Work on a copy so the caller never sees internal ticks/lots
+            quote = dict(quote)
+            quote['quantity'] = self.to_lots(quote['quantity'])
+            if order_type == 'limit':
+                quote['price'] = self.to_ticks(quote['price'])
         if from_data:
             self.time = quote['timestamp']
         else:
@@ -35,6 +153,9 @@ class OrderBook:
 
         if quote['quantity'] <= 0:
             sys.exit('process_order() given order of quantity <= 0')
+        owner = quote.get('owner')
+        if owner is not None:
+            _check_owner(owner)
 
         if not from_data:
             self.next_order_id += 1
@@ -43,39 +164,57 @@ class OrderBook:
             if 'order_id' not in quote:
                 quote['order_id'] = self.next_order_id
 
+        if self.journal is not None:
+            self.journal.write_order(quote)
 
+        view = fills is None
+        if view:
+            fills = self.fill_buffer
+            fills.reset()
         if order_type == 'market':
-            trades = self._process_market_order(quote, verbose)
+            unfilled = self._process_market_order(quote, verbose, fills)
         elif order_type == 'limit':
             # Ensure price is Decimal when it enters the OrderBook
-            if not isinstance(quote['price'], Decimal):
+            if not self.integer_ticks and not isinstance(quote['price'], Decimal):
                 quote['price'] = Decimal(str(quote['price'])) # Convert to string first to avoid float precision issues
-            trades, order_in_book = self._process_limit_order(quote, from_data, verbose)
+            order_in_book = self._process_limit_order(quote, from_data, verbose, fills)
         else:
             sys.exit("order_type must be 'market' or 'limit'")
+        # Batch callers read their own FillColumns
+        trades = FillView(fills, quote['trade_id'], quote['side'], self) if view else []
+
+        if order_in_book is not None and owner is not None:
+            self._index_owner(owner, quote['order_id'], quote['side'])
+
+        if latency is not None:
+            elapsed = perf_counter_ns() - started
+            filled = self.tape.total_count > fills_before
+            if order_in_book is not None:
+                outcome = 'partial' if filled else 'rested'
+            elif order_type == 'limit' or unfilled == 0:
+                outcome = 'filled'
+            else:
+                outcome = 'partial' if filled else 'unfilled' # the other side ran dry
+            latency.record(order_type, outcome, elapsed)
         return trades, order_in_book
 
-    def _process_market_order(self, quote, verbose):
-        trades = []
+    def _process_market_order(self, quote, verbose, fills):
         quantity_to_trade = quote['quantity']
         side = quote['side']
         if side == 'bid':
             while quantity_to_trade > 0 and self.asks:
                 best_asks = self.asks.min_price_list()
-                quantity_to_trade, new_trades = self._process_order_list('ask', best_asks, quantity_to_trade, quote, verbose)
-                trades += new_trades
+                quantity_to_trade = self._process_order_list('ask', best_asks, quantity_to_trade, quote, verbose, fills)
         elif side == 'ask':
             while quantity_to_trade > 0 and self.bids:
                 best_bids = self.bids.max_price_list()
-                quantity_to_trade, new_trades = self._process_order_list('bid', best_bids, quantity_to_trade, quote, verbose)
-                trades += new_trades
+                quantity_to_trade = self._process_order_list('bid', best_bids, quantity_to_trade, quote, verbose, fills)
         else:
             sys.exit('process_market_order() received neither "bid" nor "ask"')
-        return trades
+        return quantity_to_trade # what could not be filled
 
-    def _process_limit_order(self, quote, from_data, verbose):
+    def _process_limit_order(self, quote, from_data, verbose, fills):
         order_in_book = None
-        trades = []
         quantity_to_trade = quote['quantity']
         side = quote['side']
         price = quote['price'] # Price is already Decimal from process_order
@@ -83,8 +222,7 @@ class OrderBook:
         if side == 'bid':
             while self.asks and price >= self.asks.min_price() and quantity_to_trade > 0:
                 best_asks = self.asks.min_price_list()
-                quantity_to_trade, new_trades = self._process_order_list('ask', best_asks, quantity_to_trade, quote, verbose)
-                trades += new_trades
+                quantity_to_trade = self._process_order_list('ask', best_asks, quantity_to_trade, quote, verbose, fills)
             if quantity_to_trade > 0:
                 if not from_data:
                     # order_id is already set in process_order for new orders
@@ -96,8 +234,7 @@ class OrderBook:
         elif side == 'ask':
             while self.bids and price <= self.bids.max_price() and quantity_to_trade > 0:
                 best_bids = self.bids.max_price_list()
-                quantity_to_trade, new_trades = self._process_order_list('bid', best_bids, quantity_to_trade, quote, verbose)
-                trades += new_trades
+                quantity_to_trade = self._process_order_list('bid', best_bids, quantity_to_trade, quote, verbose, fills)
             if quantity_to_trade > 0:
                 if not from_data:
                     # order_id is already set in process_order for new orders
@@ -107,122 +244,444 @@ class OrderBook:
                 order_in_book = quote
         else:
             sys.exit('process_limit_order() given neither "bid" nor "ask"')
-        return trades, order_in_book
+        return order_in_book
 
     # ---- Matching Engine ----
-    def _process_order_list(self, side, order_list, quantity_to_trade, quote, verbose):
-     trades = []
-
-     # Ensure quantity_to_trade is Decimal for consistent arithmetic
-     quantity_to_trade = Decimal(str(quantity_to_trade))
+    def _process_order_list(self, side, order_list, quantity_to_trade, quote, verbose, fills):
+     latency = self.latency
+     if latency is not None:
+         started = perf_counter_ns()
+
+     integer_ticks = self.integer_ticks
+     if integer_ticks:
+         tick_num, tick_den = self._tick_ratio
+         lot_num, lot_den = self._lot_ratio
+     else:
+         # Ensure quantity_to_trade is Decimal for consistent arithmetic
+         quantity_to_trade = Decimal(str(quantity_to_trade))
 
      while len(order_list) > 0 and quantity_to_trade > 0:
         head_order = order_list.get_head_order()
         traded_price = head_order.price # This is already Decimal
         counter_party = head_order.trade_id
+        # Capture the id up front: a filled head_order goes back to the pool
+        head_order_id = head_order.order_id
         new_book_quantity = None
 
         if quantity_to_trade < head_order.quantity:
             traded_quantity = quantity_to_trade
             new_book_quantity = head_order.quantity - quantity_to_trade
-            head_order.update_quantity(new_book_quantity, head_order.timestamp)
-            quantity_to_trade = Decimal('0') # Set to Decimal zero
+            (self.bids if side == 'bid' else self.asks).reduce_order(head_order, new_book_quantity)
+            quantity_to_trade = 0
         elif quantity_to_trade == head_order.quantity:
             traded_quantity = quantity_to_trade
-            self._remove_order(side, head_order.order_id)
-            quantity_to_trade = Decimal('0') # Set to Decimal zero
+            self._remove_order(side, head_order_id)
+            quantity_to_trade = 0
         else:
             traded_quantity = head_order.quantity
-            self._remove_order(side, head_order.order_id)
+            self._remove_order(side, head_order_id)
             quantity_to_trade -= traded_quantity
 
-        if verbose:
-            print(f"[TRADE] {self.symbol} | Time {self.time} | {traded_quantity} @ {traded_price} | {counter_party} <-> {quote['trade_id']}")
-
-        # This is the trade record that goes to PnL
-        trade = {
-            "price": traded_price, # Keep as Decimal
-            "quantity": traded_quantity, # Keep as Decimal
-            "buy_order_id": head_order.order_id if side == 'ask' else quote['trade_id'],
-            "sell_order_id": head_order.order_id if side == 'bid' else quote['trade_id'],
-            "our_side": quote["side"]  # Add this so PnLTracker knows your role
-        }
+        # Fills are written into columns in engine units (FillBuffer, or FillColumns for batches); no dict per fill
+        fills.append(traded_price, traded_quantity, head_order_id, quote['order_id'], self.time)
 
-        trades.append(trade)
+        if verbose:
+            if integer_ticks:
+                print(f"[TRADE] {self.symbol} | Time {self.time} | {self.from_lots(traded_quantity)} @ {self.from_ticks(traded_price)} | {counter_party} <-> {quote['trade_id']}")
+            else:
+                print(f"[TRADE] {self.symbol} | Time {self.time} | {traded_quantity} @ {traded_price} | {counter_party} <-> {quote['trade_id']}")
+
+        if integer_ticks:
+            # The tape stores floats: convert ticks/lots straight to them, without a Decimal per fill
+            traded_price = traded_price * tick_num / tick_den
+            traded_quantity = traded_quantity * lot_num / lot_den
+            if new_book_quantity is not None:
+                new_book_quantity = new_book_quantity * lot_num / lot_den
 
         # Also record to trade tape (not necessarily needed by PnLTracker)
-        transaction_record = {
-            'timestamp': self.time,
-            'price': traded_price,
-            'quantity': traded_quantity,
-            'party1': [counter_party, side, head_order.order_id, new_book_quantity],
-            'party2': [quote['trade_id'], 'ask' if side == 'bid' else 'bid', None, None]
-        }
-
-        self.tape.append(transaction_record)
+        self.tape.append(self.time, traded_price, traded_quantity, counter_party, side,
+                         head_order_id, new_book_quantity, quote['trade_id'])
 
-     return float(quantity_to_trade), trades # Return float as expected by simulation
+     if latency is not None:
+         # filled: the incoming order was used up at this level, partial: it sweeps on to the next one
+         latency.record('match', 'filled' if quantity_to_trade == 0 else 'partial', perf_counter_ns() - started)
+     if integer_ticks:
+         return quantity_to_trade # Stay in lots inside the engine
+     return float(quantity_to_trade) # Return float as expected by simulation
 
     def _remove_order(self, side, order_id):
         if side == 'bid':
             self.bids.remove_order_by_id(order_id)
         else:
             self.asks.remove_order_by_id(order_id)
+        if self.order_owners:
+            self._unindex_owner(order_id)
+
+    # ---- Owner Index ----
+    def _index_owner(self, owner, order_id, side):
+        self.order_owners[order_id] = owner
+        orders = self.owner_orders.get(owner)
+        if orders is None:
+            orders = self.owner_orders[owner] = {}
+        orders[order_id] = side
+
+    def _unindex_owner(self, order_id):
+        owner = self.order_owners.pop(order_id, None)
+        if owner is not None:
+            orders = self.owner_orders[owner]
+            del orders[order_id]
+            if not orders:
+                del self.owner_orders[owner]
+
+    def order_side(self, order_id):
+        ''''bid' or 'ask' for a resting order, None if it is not in the book.'''
+        if self.bids.order_exists(order_id):
+            return 'bid'
+        if self.asks.order_exists(order_id):
+            return 'ask'
+        return None
+
+    def queue_position(self, order_id):
+        '''(volume ahead, orders ahead) of a resting order in its price level, None if it is not in the book.
+
+        Kept up to date incrementally by the OrderLists, so a query is O(1)
+        apart from an occasional renormalization after changes in the middle
+        of a level.
+        '''
+        order = self.bids.order_map.get(order_id) or self.asks.order_map.get(order_id)
+        if order is None:
+            return None
+        volume, orders = order.order_list.queue_position(order)
+        if self.integer_ticks:
+            volume = self.from_lots(volume)
+        return volume, orders
+
+    def owner_order_ids(self, owner):
+        '''Ids of the resting orders placed with quote['owner'] == owner, oldest first.'''
+        return list(self.owner_orders.get(owner, ()))
 
     # ---- Utilities ----
+    def cancel(self, order_id, time=None):
+        '''Cancel a resting order by id alone. Returns False if it was not in the book.'''
+        side = self.order_side(order_id)
+        if side is None:
+            self.cancel_order('bid', order_id, time) # recorded as not_found
+            return False
+        self.cancel_order(side, order_id, time)
+        return True
+
+    def cancel_all(self, owner, time=None):
+        '''Cancel every resting order of owner in one call. Returns the number cancelled.
+
+        Each side's orders are removed together (OrderTree.remove_orders), so
+        levels emptied by the cancel are dropped once and depth listeners get
+        one delta per level touched. The journal still records one cancel per
+        order.
+        '''
+        latency = self.latency
+        if latency is not None:
+            started = perf_counter_ns()
+        self.time = time if time else self.time + 1
+        orders = self.owner_orders.pop(owner, None)
+        if not orders:
+            if latency is not None:
+                latency.record('cancel_all', 'not_found', perf_counter_ns() - started)
+            return 0
+        bids, asks = [], []
+        order_owners = self.order_owners
+        for order_id, side in orders.items():
+            del order_owners[order_id]
+            (bids if side == 'bid' else asks).append(order_id)
+            if self.journal is not None:
+                self.journal.write_cancel(side, order_id, self.time)
+        if bids:
+            self.bids.remove_orders(bids)
+        if asks:
+            self.asks.remove_orders(asks)
+        if latency is not None:
+            latency.record('cancel_all', 'cancelled', perf_counter_ns() - started)
+        return len(orders)
+
+    def replace_ladder(self, owner, bids=(), asks=()):
+        '''Make owner's resting quotes match a ladder of (price, quantity) per side, with the fewest changes.
+
+        Levels the owner already quotes at the wanted quantity are left
+        alone. A different quantity is amended in place, so a decrease keeps
+        queue priority and an increase goes to the back of the level, as in
+        modify_order. Levels no longer wanted are cancelled together. New
+        levels are then entered as limit orders tagged with owner, and they
+        may trade. A level with quantity 0 is not quoted, so an existing
+        quote there is cancelled. Both ladders are converted and checked
+        before anything changes: an off-grid or negative entry raises
+        ValueError and leaves the book as it was. Returns {'unchanged',
+        'amended', 'cancelled', 'inserted', 'trades'}.
+        '''
+        _check_owner(owner)
+        ladders = (('bid', self._ladder_levels(bids)), ('ask', self._ladder_levels(asks)))
+        latency = self.latency
+        if latency is not None:
+            started = perf_counter_ns()
+        self.time += 1
+        result = {'unchanged': 0, 'amended': 0, 'cancelled': 0, 'inserted': 0, 'trades': []}
+        resting = self.owner_orders.get(owner, {})
+        inserts = []
+        for side, wanted in ladders:
+            tree = self.bids if side == 'bid' else self.asks
+            stale = []
+            for order_id, order_side in resting.items():
+                if order_side != side:
+                    continue
+                order = tree.get_order(order_id)
+                level = wanted.pop(order.price, None) # a second order of owner at a wanted price is stale
+                if level is None:
+                    stale.append(order_id)
+                elif level[0] == order.quantity:
+                    result['unchanged'] += 1
+                else:
+                    update = {'side': side, 'order_id': order_id, 'price': order.price, 'quantity': level[0],
+                              'timestamp': self.time}
+                    if self.journal is not None:
+                        self.journal.write_modify(update)
+                    tree.update_order(update)
+                    result['amended'] += 1
+            if stale:
+                for order_id in stale:
+                    if self.journal is not None:
+                        self.journal.write_cancel(side, order_id, self.time)
+                    self._unindex_owner(order_id)
+                tree.remove_orders(stale)
+                result['cancelled'] += len(stale)
+            inserts.extend((side, price, quantity) for _, price, quantity in wanted.values())
+        # Enter new levels once every stale quote of owner is gone, so the ladder cannot trade with itself
+        for side, price, quantity in inserts:
+            fills, _ = self._process_quote({'type': 'limit', 'side': side, 'price': price, 'quantity': quantity,
+                                            'owner': owner}, False, False)
+            if fills:
+                result['trades'] += fills.to_dicts()
+        result['inserted'] = len(inserts)
+        if latency is not None:
+            latency.record('replace_ladder', 'applied', perf_counter_ns() - started)
+        return result
+
+    def _ladder_levels(self, ladder):
+        '''{engine price: [engine quantity, price, quantity]} for one side of a replace_ladder call.'''
+        wanted = {}
+        for price, quantity in ladder:
+            if self.integer_ticks:
+                key, lots = self.to_ticks(price), self.to_lots(quantity)
+            else:
+                key = price = price if isinstance(price, Decimal) else Decimal(str(price))
+                lots = quantity = quantity if isinstance(quantity, Decimal) else Decimal(str(quantity))
+            if lots < 0:
+                raise ValueError(f'replace_ladder() given quantity {quantity} < 0 at {price}')
+            if lots == 0:
+                continue # not quoted
+            level = wanted.get(key)
+            if level is None:
+                wanted[key] = [lots, price, quantity]
+            else: # the same price twice: quote the total
+                level[0] += lots
+                level[2] += quantity
+        return wanted
+
     def cancel_order(self, side, order_id, time=None):
+        latency = self.latency
+        if latency is not None:
+            started = perf_counter_ns()
         self.time = time if time else self.time + 1
+        if self.journal is not None:
+            self.journal.write_cancel(side, order_id, self.time)
+        outcome = 'not_found'
         if side == 'bid':
             if self.bids.order_exists(order_id):
-                self.bids.remove_order_by_id(order_id)
+                self._remove_order('bid', order_id)
+                outcome = 'cancelled'
         elif side == 'ask':
             if self.asks.order_exists(order_id):
-                self.asks.remove_order_by_id(order_id)
+                self._remove_order('ask', order_id)
+                outcome = 'cancelled'
         else:
             sys.exit('cancel_order() given neither "bid" nor "ask"')
+        if latency is not None:
+            latency.record('cancel', outcome, perf_counter_ns() - started)
 
     def modify_order(self, order_id, update, time=None):
+        '''Change the price and/or quantity of a resting order; update['side'] is optional.
+
+        Returns False if the order is not in the book (e.g. it was just
+        filled), True once it has been modified.
+        '''
+        latency = self.latency
+        if latency is not None:
+            started = perf_counter_ns()
         self.time = time if time else self.time + 1
-        side = update['side']
+        side = self.order_side(order_id)
+        if side is None:
+            if latency is not None:
+                latency.record('modify', 'not_found', perf_counter_ns() - started)
+            return False
+        update['side'] = side
         update['order_id'] = order_id
         update['timestamp'] = self.time
-        # Ensure price is Decimal for update
-        if 'price' in update and not isinstance(update['price'], Decimal):
-            update['price'] = Decimal(str(update['price']))
-        if side == 'bid' and self.bids.order_exists(order_id):
-            self.bids.update_order(update)
-        elif side == 'ask' and self.asks.order_exists(order_id):
-            self.asks.update_order(update)
+        if self.integer_ticks:
+            update['price'] = self.to_ticks(update['price'])
+            update['quantity'] = self.to_lots(update['quantity'])
         else:
-            sys.exit('modify_order() given neither "bid" nor "ask"')
+            # Ensure price is Decimal for update
+            if 'price' in update and not isinstance(update['price'], Decimal):
+                update['price'] = Decimal(str(update['price']))
+            # Same conversion insert_order applies to the quantity of a new order
+            if not isinstance(update['quantity'], Decimal):
+                update['quantity'] = Decimal(update['quantity'])
+        if self.journal is not None:
+            self.journal.write_modify(update)
+        tree = self.bids if side == 'bid' else self.asks
+        # repriced: moved to another level (back of its queue), resized: quantity change at the same price
+        outcome = 'repriced' if update['price'] != tree.get_order(order_id).price else 'resized'
+        tree.update_order(update)
+        if latency is not None:
+            latency.record('modify', outcome, perf_counter_ns() - started)
+        return True
 
     def get_volume_at_price(self, side, price):
-        price = Decimal(str(price)) # Convert to Decimal
+        if self.integer_ticks:
+            price = self.to_ticks(price)
+        else:
+            price = Decimal(str(price)) # Convert to Decimal
         tree = self.bids if side == 'bid' else self.asks
         if tree.price_exists(price):
-            return tree.get_price_list(price).volume # Use get_price_list
+            volume = tree.get_price_list(price).volume # Use get_price_list
+            return self.from_lots(volume) if self.integer_ticks else volume
         return 0
 
+    def get_depth(self, n=10):
+        '''Top n levels per side: {'bids': [(price, volume), ...], 'asks': [...]}, best first.
+
+        Levels come from a cache kept by each OrderTree that is only touched
+        when an update reaches the top n, so polling between updates is cheap.
+        '''
+        return {'bids': self._side_depth(self.bids, n), 'asks': self._side_depth(self.asks, n)}
+
+    def _side_depth(self, tree, n):
+        levels = tree.get_depth(n)
+        if not self.integer_ticks:
+            return levels
+        view = self._depth_views.get(tree.side)
+        if view is None or view[0] != tree.top_version or view[1] != n:
+            converted = [(self.from_ticks(price), self.from_lots(volume)) for price, volume in levels]
+            view = (tree.top_version, n, converted)
+            self._depth_views[tree.side] = view
+        return view[2]
+
+    # ---- Latency ----
+    def latency_stats(self):
+        '''Latency percentiles per operation and outcome, in nanoseconds.
+
+        {'limit': {'rested': {...}, 'partial': {...}, 'filled': {...}},
+         'market': {...}, 'match': {...}, 'cancel': {...}, 'modify': {...}}
+        where each summary has count, mean_ns, min_ns, p50_ns, p99_ns,
+        p99.9_ns and max_ns. Needs OrderBook(track_latency=True).
+        '''
+        if self.latency is None:
+            raise RuntimeError('latency tracking is off, create the book with track_latency=True')
+        return self.latency.stats()
+
+    # ---- Event Journal ----
+    def open_journal(self, path, buffer_size=1 << 20):
+        '''Append every order, cancel and modify to a binary journal at path (see journal.replay_journal).'''
+        self.close_journal()
+        self.journal = EventJournal(path, self.integer_ticks, self.tick_size, self.lot_size, buffer_size)
+        return self.journal
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    # ---- Snapshot / Restore ----
+    def snapshot(self):
+        '''Compact binary snapshot of every resting order, level by level in FIFO order.'''
+        return dump_book(self)
+
+    def restore(self, data):
+        '''Replace the resting orders with a snapshot() taken from a book of the same tick mode.
+
+        Levels are rebuilt in bulk without the matching path, and the owner
+        index comes back with them. The trade tape is not part of the
+        snapshot. Depth listeners then get one L2 delta
+        per level that differs from the book before the restore.
+        '''
+        if self.depth_listeners:
+            before = [{price: order_list.volume for price, order_list in tree.iter_levels()}
+                      for tree in (self.bids, self.asks)]
+        load_book(self, data)
+        if self.depth_listeners:
+            for side, tree, levels in (('bid', self.bids, before[0]), ('ask', self.asks, before[1])):
+                after = {price: order_list.volume for price, order_list in tree.iter_levels()}
+                for price in levels:
+                    if price not in after:
+                        self._emit_depth(side, price, 0)
+                for price, volume in after.items():
+                    if levels.get(price) != volume:
+                        self._emit_depth(side, price, volume)
+
+    # ---- L2 Depth Deltas ----
+    def add_depth_listener(self, fn):
+        '''Receive an L2 delta fn(seq, side, price, volume) for every level change.
+
+        volume is the new aggregate volume at price; 0 means the level was
+        removed. seq increases by one per delta, so a consumer can mirror
+        the book with O(changes) work and detect missed updates.
+        '''
+        self.depth_listeners.append(fn)
+        self.bids.level_listener = self._emit_depth
+        self.asks.level_listener = self._emit_depth
+
+    def remove_depth_listener(self, fn):
+        self.depth_listeners.remove(fn)
+        if not self.depth_listeners:
+            self.bids.level_listener = None
+            self.asks.level_listener = None
+
+    def _emit_depth(self, side, price, volume):
+        self.depth_seq += 1
+        if self.integer_ticks:
+            price = self.from_ticks(price)
+            volume = self.from_lots(volume)
+        for fn in self.depth_listeners:
+            fn(self.depth_seq, side, price, volume)
+
     def get_best_bid(self):
-        return self.bids.max_price()
+        price = self.bids.max_price()
+        if self.integer_ticks and price is not None:
+            return self.from_ticks(price)
+        return price
 
     def get_best_ask(self):
-        return self.asks.min_price()
+        price = self.asks.min_price()
+        if self.integer_ticks and price is not None:
+            return self.from_ticks(price)
+        return price
 
     # ---- String representation ----
+    def _fmt_level(self, price, volume):
+        if self.integer_ticks:
+            return f"{self.from_ticks(price)}: {self.from_lots(volume)}"
+        return f"{price}: {volume}"
+
     def __str__(self):
         buf = StringIO()
         buf.write(f"=== OrderBook {self.symbol} ===\n")
         buf.write(">> Bids <<\n")
         if self.bids and len(self.bids) > 0:
             for price, orders in reversed(self.bids.price_map.items()):
-                buf.write(f"{price}: {orders.volume}\n")
+                buf.write(f"{self._fmt_level(price, orders.volume)}\n")
         buf.write(">> Asks <<\n")
         if self.asks and len(self.asks) > 0:
             for price, orders in self.asks.price_map.items():
-                buf.write(f"{price}: {orders.volume}\n")
+                buf.write(f"{self._fmt_level(price, orders.volume)}\n")
         buf.write(">> Last Trades <<\n")
-        for trade in list(self.tape)[-10:]:
+        for trade in self.tape.last(10):
             buf.write(f"{trade['quantity']} @ {trade['price']} [{trade['timestamp']}] {trade['party1'][0]}/{trade['party2'][0]}\n")
         return buf.getvalue()
 
@@ -0,0 +1,320 @@
+import gc
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+from decimal import Decimal
+from OrderBook import OrderBook
+from ordertree import OrderTree
+from orderlist import OrderList
+from order import Order
+from pnl_tracker import PnLTracker
+
+DEPTHS = (10, 100, 1000)
+ORDERS_PER_LEVEL = (1, 10)
+MODES = ('decimal', 'ticks')
+QUICK_DEPTHS = (10, 100)
+QUICK_ORDERS_PER_LEVEL = (1, 5)
+
+
+# ---- Cases ----
+# Every case returns (setup, run): setup() builds fresh state outside the
+# timer, run(state) does the measured work and returns the number of ops.
+
+def _resting_quotes(depth, per_level, integer_ticks, side='ask'):
+    '''depth levels of per_level orders each, best level first, ids from 1.'''
+    quotes = []
+    order_id = 1
+    for level in range(depth):
+        if integer_ticks:
+            price = 10000 + level if side == 'ask' else 10000 - level
+            quantity = 100
+        else:
+            price = Decimal(100) + Decimal(level) / 100 if side == 'ask' else Decimal(100) - Decimal(level) / 100
+            quantity = Decimal(1)
+        for _ in range(per_level):
+            quotes.append({'type': 'limit', 'side': side, 'price': price, 'quantity': quantity,
+                           'order_id': order_id, 'trade_id': order_id, 'timestamp': order_id})
+            order_id += 1
+    return quotes
+
+
+def _filled_tree(quotes, integer_ticks):
+    tree = OrderTree(integer_ticks)
+    for quote in quotes:
+        tree.insert_order(quote)
+    return tree
+
+
+def _book(depth, per_level, integer_ticks):
+    '''A book with the resting asks of _resting_quotes, in engine units.'''
+    book = OrderBook(integer_ticks=integer_ticks)
+    for quote in _resting_quotes(depth, per_level, integer_ticks):
+        book._process_quote(quote, True, False, None, integer_ticks)
+    return book
+
+
+def bench_tree_insert(depth, per_level, integer_ticks):
+    quotes = _resting_quotes(depth, per_level, integer_ticks)
+
+    def run(tree):
+        for quote in quotes:
+            tree.insert_order(quote)
+        return len(quotes)
+    return (lambda: OrderTree(integer_ticks)), run
+
+
+def bench_tree_remove(depth, per_level, integer_ticks):
+    quotes = _resting_quotes(depth, per_level, integer_ticks)
+    # Interleave levels so removals hit the middle of lists as well as the ends
+    order_ids = [quote['order_id'] for quote in quotes]
+    random.Random(1).shuffle(order_ids)
+
+    def run(tree):
+        for order_id in order_ids:
+            tree.remove_order_by_id(order_id)
+        return len(order_ids)
+    return (lambda: _filled_tree(quotes, integer_ticks)), run
+
+
+def bench_tree_update(depth, per_level, integer_ticks):
+    quotes = _resting_quotes(depth, per_level, integer_ticks)
+    # Quantity increases move the order to the tail of its level, decreases keep its place
+    updates = []
+    for i, quote in enumerate(quotes):
+        update = dict(quote)
+        quantity = quote['quantity']
+        update['quantity'] = quantity * 2 if i % 2 else (quantity // 2 if integer_ticks else quantity / 2)
+        updates.append(update)
+
+    def run(tree):
+        for update in updates:
+            tree.update_order(update)
+        return len(updates)
+    return (lambda: _filled_tree(quotes, integer_ticks)), run
+
+
+def bench_list_move_to_tail(depth, per_level, integer_ticks):
+    moves = depth * max(per_level, 2) * 10
+    per_level = max(per_level, 2) # move_to_tail needs an order behind the head
+
+    def setup():
+        order_list = OrderList()
+        for order_id in range(per_level):
+            order_list.append_order(Order(order_id, 1, 100, order_id, order_id, order_list))
+        return order_list
+
+    def run(order_list):
+        move_to_tail = order_list.move_to_tail
+        for _ in range(moves):
+            move_to_tail(order_list.head_order)
+        return moves
+    return setup, run
+
+
+def bench_crossing_limits(depth, per_level, integer_ticks):
+    '''Limit bids priced through the book, each filling exactly one resting order.'''
+    quotes = _resting_quotes(depth, per_level, integer_ticks)
+    top = quotes[-1]['price']
+    bids = [{'type': 'limit', 'side': 'bid', 'price': top, 'quantity': quote['quantity']} for quote in quotes]
+
+    def run(book):
+        process_quote = book._process_quote
+        for bid in bids:
+            process_quote(dict(bid), False, False, None, integer_ticks)
+        return len(bids)
+    return (lambda: _book(depth, per_level, integer_ticks)), run
+
+
+def bench_market_sweep(depth, per_level, integer_ticks):
+    '''One market order sweeping every level; ops are resting orders filled.'''
+    quantity = sum(quote['quantity'] for quote in _resting_quotes(depth, per_level, integer_ticks))
+
+    def run(book):
+        book._process_quote({'type': 'market', 'side': 'bid', 'quantity': quantity}, False, False, None, integer_ticks)
+        return depth * per_level
+    return (lambda: _book(depth, per_level, integer_ticks)), run
+
+
+def bench_queue_position(depth, per_level, integer_ticks):
+    '''Queue position of every resting order, as a quoting loop polls it each tick.'''
+    order_ids = [quote['order_id'] for quote in _resting_quotes(depth, per_level, integer_ticks)]
+
+    def run(book):
+        queue_position = book.queue_position
+        for order_id in order_ids:
+            queue_position(order_id)
+        return len(order_ids)
+    return (lambda: _book(depth, per_level, integer_ticks)), run
+
+
+def bench_pnl_record_trade(depth, per_level, integer_ticks):
+    rng = random.Random(1)
+    trades = [(100 + rng.uniform(-1, 1), rng.uniform(0.1, 2), 'buy' if rng.random() < 0.5 else 'sell')
+              for _ in range(depth * per_level * 10)]
+
+    def run(tracker):
+        record_trade = tracker.record_trade
+        for price, quantity, side in trades:
+            record_trade(price, quantity, side)
+        return len(trades)
+    return (lambda: PnLTracker(verbose=False)), run
+
+
+def bench_calibration(depth, per_level, integer_ticks):
+    '''Fixed pure-Python reference work, used to factor out the speed of the machine.'''
+    items = [Order(i, i, i, i, i) for i in range(1000)]
+
+    def run(index):
+        for order in items:
+            index[order.order_id] = order.quantity + order.price
+        for order in items:
+            del index[order.order_id]
+        return 2 * len(items)
+    return dict, run
+
+
+CASES = {
+    'tree_insert': bench_tree_insert,
+    'tree_remove': bench_tree_remove,
+    'tree_update': bench_tree_update,
+    'list_move_to_tail': bench_list_move_to_tail,
+    'crossing_limits': bench_crossing_limits,
+    'market_sweep': bench_market_sweep,
+    'queue_position': bench_queue_position,
+    'pnl_record_trade': bench_pnl_record_trade,
+}
+# Cases whose work does not depend on the tick mode
+MODE_FREE = ('list_move_to_tail', 'pnl_record_trade')
+CALIBRATION = 'calibration'
+
+
+def case_key(name, mode, depth, per_level):
+    if name in MODE_FREE:
+        return f"{name}[depth={depth},per_level={per_level}]"
+    return f"{name}[{mode},depth={depth},per_level={per_level}]"
+
+
+def measure(factory, depth, per_level, integer_ticks, repeat=5, min_time=0.02):
+    '''Best ops/sec over repeat samples.
+
+    Each sample runs the case on freshly built state as many times as it
+    takes to spend min_time seconds inside run(), so small books are not
+    timed off a handful of operations. Like timeit, the garbage collector
+    is off while run() is timed.
+    '''
+    setup, run = factory(depth, per_level, integer_ticks)
+    best = 0.0
+    gc_was_enabled = gc.isenabled()
+    try:
+        for _ in range(repeat):
+            ops = 0
+            elapsed = 0.0
+            while elapsed < min_time:
+                state = setup()
+                gc.disable()
+                try:
+                    started = time.perf_counter()
+                    ops += run(state)
+                    elapsed += time.perf_counter() - started
+                finally:
+                    gc.enable()
+            best = max(best, ops / elapsed)
+    finally:
+        if not gc_was_enabled:
+            gc.disable()
+    return best
+
+
+def run_benchmarks(depths=DEPTHS, orders_per_level=ORDERS_PER_LEVEL, modes=MODES, repeat=5, only=None,
+                   min_time=0.02, verbose=True):
+    '''Run every case over the depth / orders-per-level / tick mode grid. Returns {case_key: ops_per_sec}.
+
+    The reference workload is measured before and after the cases and
+    stored under 'calibration' (the faster of the two).
+    '''
+    calibration = measure(bench_calibration, 0, 0, False, repeat, min_time)
+    results = {}
+    for name, factory in CASES.items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        for mode in (modes[:1] if name in MODE_FREE else modes):
+            for depth in depths:
+                for per_level in orders_per_level:
+                    key = case_key(name, mode, depth, per_level)
+                    results[key] = measure(factory, depth, per_level, mode == 'ticks', repeat, min_time)
+                    if verbose:
+                        print(f"{key:<55} {results[key]:>14,.0f} ops/s")
+    results[CALIBRATION] = max(calibration, measure(bench_calibration, 0, 0, False, repeat, min_time))
+    return results
+
+
+def save_baseline(results, path):
+    baseline = {
+        'meta': {'python': platform.python_version(), 'machine': platform.machine(),
+                 'platform': platform.platform(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, threshold=0.2, normalize=False):
+    '''Cases whose ops/sec fell more than threshold (a fraction) below the baseline.
+
+    With normalize, the baseline is first scaled by how much faster or
+    slower this machine ran the calibration workload, for baselines that
+    were recorded on a different machine.
+
+    Returns a list of (case_key, baseline_ops, current_ops, ratio), worst first.
+    Cases missing from either side are ignored.
+    '''
+    baseline = baseline.get('results', baseline)
+    scale = 1.0
+    if normalize and results.get(CALIBRATION) and baseline.get(CALIBRATION):
+        scale = results[CALIBRATION] / baseline[CALIBRATION]
+    regressions = []
+    for key, previous in baseline.items():
+        current = results.get(key)
+        if key == CALIBRATION or current is None or previous <= 0:
+            continue
+        ratio = current / (previous * scale)
+        if ratio < 1 - threshold:
+            regressions.append((key, previous, current, ratio))
+    return sorted(regressions, key=lambda regression: regression[3])
+
+
+def main():
+    '''Benchmark runner: python benchmark.py --save baseline.json, later --compare baseline.json'''
+    p = argparse.ArgumentParser(description="OrderBook microbenchmarks")
+    p.add_argument('--quick', action='store_true', help='smaller grid for a fast check')
+    p.add_argument('--repeat', type=int, default=5, help='runs per case, the best is kept')
+    p.add_argument('--only', action='append', help='run only cases whose name contains this (repeatable)')
+    p.add_argument('--save', type=str, help='write the results as a JSON baseline')
+    p.add_argument('--compare', type=str, help='fail if any case regressed against this baseline')
+    p.add_argument('--threshold', type=float, default=0.2, help='allowed ops/sec drop as a fraction (default 0.2)')
+    p.add_argument('--normalize', action='store_true',
+                   help='scale the baseline by the calibration workload (baseline from another machine)')
+    args = p.parse_args()
+
+    results = run_benchmarks(QUICK_DEPTHS if args.quick else DEPTHS,
+                             QUICK_ORDERS_PER_LEVEL if args.quick else ORDERS_PER_LEVEL,
+                             repeat=args.repeat, only=args.only)
+    if args.save:
+        save_baseline(results, args.save)
+        print(f"Baseline saved to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.normalize)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed more than {args.threshold:.0%}:")
+            for key, previous, current, ratio in regressions:
+                print(f"  {key:<55} {previous:>12,.0f} -> {current:>12,.0f} ops/s ({ratio - 1:+.1%})")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.compare}")
+
+if __name__ == '__main__':
+    main()
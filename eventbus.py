@@ -0,0 +1,265 @@
+import queue
+import asyncio
+import inspect
+import threading
+
+_LATEST = object() # queue marker: deliver the latest payload of a conflated event type
+_STOP = object()
+
+
+class EventBus(object):
+    '''
+    Publish/subscribe bus that delivers Simulator events on a separate
+    consumer thread, so slow callbacks do not hold up the publisher.
+
+    - Subscriptions can be filtered by event type and can ask for batched
+      delivery: fn([(event, data), ...]) once per drained batch instead of
+      fn(event, data) per event.
+    - Event types in ``conflate`` (market_data by default) are snapshots of
+      state: a new one replaces a pending one that has not been delivered
+      yet, so a slow consumer only ever sees the latest state.
+    - Other events go through a bounded queue. When it is full the
+      publisher waits (``overflow='block'``) or the event is counted in
+      ``dropped`` and discarded (``overflow='drop'``).
+    - A callback that raises is reported through ``on_error`` (printed by
+      default) on the consumer thread and does not stop delivery.
+
+    With ``threaded=False`` events are dispatched synchronously in publish().
+    '''
+
+    def __init__(self, maxsize=10000, conflate=('market_data',), overflow='block', threaded=True,
+                 max_batch=256, on_error=None):
+        if overflow not in ('block', 'drop'):
+            raise ValueError("overflow must be 'block' or 'drop'")
+        self.queue = queue.Queue(maxsize)
+        self.conflate = frozenset(conflate)
+        self.overflow = overflow
+        self.threaded = threaded
+        self.max_batch = max_batch
+        self.on_error = on_error or self._print_error
+        self.subscribers = [] # (fn, event types or None for all, batch)
+        self.latest = {} # conflated event type : newest undelivered payload
+        self.lock = threading.Lock()
+        self.thread = None
+        self.published = 0
+        self.delivered = 0
+        self.conflated = 0 # payloads replaced before delivery
+        self.dropped = 0
+        self.errors = 0
+
+    # ---- Subscriptions ----
+    def subscribe(self, fn, events=None, batch=False):
+        '''Call fn(event, data) for every event of the given types (all when None).
+
+        With batch=True, fn([(event, data), ...]) is called once per batch.
+        '''
+        if isinstance(events, str):
+            events = (events,)
+        self.subscribers.append((fn, frozenset(events) if events is not None else None, batch))
+        return fn
+
+    def unsubscribe(self, fn):
+        self.subscribers = [subscriber for subscriber in self.subscribers if subscriber[0] is not fn]
+
+    def wants(self, event):
+        '''Whether any subscriber listens to event, so publishers can skip building it.'''
+        for _, events, _ in self.subscribers:
+            if events is None or event in events:
+                return True
+        return False
+
+    # ---- Publishing ----
+    def publish(self, event, data):
+        self.published += 1
+        if not self.threaded:
+            self._dispatch([(event, data)])
+            return
+        if self.thread is None:
+            self.start()
+        if event in self.conflate:
+            with self.lock:
+                pending = event in self.latest
+                self.latest[event] = data
+            if pending:
+                self.conflated += 1 # the queued marker will pick up this newer payload
+                return
+            data = _LATEST
+        try:
+            self.queue.put((event, data), block=self.overflow == 'block')
+        except queue.Full:
+            self.dropped += 1
+            if data is _LATEST:
+                with self.lock:
+                    self.latest.pop(event, None)
+
+    # ---- Consumer thread ----
+    def start(self):
+        if self.threaded and self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='EventBus', daemon=True)
+            self.thread.start()
+
+    def flush(self):
+        '''Wait until every event published so far has been delivered.'''
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        '''Deliver what is queued, then stop the consumer thread.'''
+        if self.thread is not None:
+            self.queue.put((_STOP, None))
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        get = self.queue.get
+        get_nowait = self.queue.get_nowait
+        while True:
+            items = [get()]
+            while len(items) < self.max_batch:
+                try:
+                    items.append(get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            events = []
+            for event, data in items:
+                if event is _STOP:
+                    stop = True
+                elif data is _LATEST:
+                    with self.lock:
+                        data = self.latest.pop(event)
+                    events.append((event, data))
+                else:
+                    events.append((event, data))
+            if events:
+                self._dispatch(events)
+            for _ in items:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def _dispatch(self, events):
+        for fn, types, batch in self.subscribers:
+            selected = events if types is None else [item for item in events if item[0] in types]
+            if not selected:
+                continue
+            if batch:
+                try:
+                    fn(selected)
+                except Exception as e:
+                    self.errors += 1
+                    self.on_error('batch', e)
+            else:
+                for event, data in selected:
+                    try:
+                        fn(event, data)
+                    except Exception as e:
+                        self.errors += 1
+                        self.on_error(event, e)
+            self.delivered += len(selected)
+
+    @staticmethod
+    def _print_error(event, error):
+        print(f"Error in callback for event {event}: {error}")
+
+    def stats(self):
+        return {'published': self.published, 'delivered': self.delivered, 'conflated': self.conflated,
+                'dropped': self.dropped, 'errors': self.errors, 'queued': self.queue.qsize()}
+
+
+class AsyncEventBus(EventBus):
+    '''
+    EventBus for coroutines: events are delivered by a consumer task on the
+    running event loop instead of a thread.
+
+    Filtering, batching, conflation and overflow work as in EventBus, but
+    publish(), flush() and close() are coroutines. Callbacks may be plain
+    functions or coroutine functions; awaitable results are awaited before
+    the next event is delivered.
+    '''
+
+    def __init__(self, maxsize=10000, conflate=('market_data',), overflow='block', max_batch=256, on_error=None):
+        super().__init__(maxsize, conflate, overflow, True, max_batch, on_error)
+        self.queue = asyncio.Queue(maxsize)
+        self.task = None
+
+    # ---- Publishing ----
+    async def publish(self, event, data):
+        self.published += 1
+        if self.task is None:
+            self.start()
+        if event in self.conflate:
+            pending = event in self.latest
+            self.latest[event] = data
+            if pending:
+                self.conflated += 1
+                return
+            data = _LATEST
+        if self.overflow == 'block':
+            await self.queue.put((event, data))
+            return
+        try:
+            self.queue.put_nowait((event, data))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if data is _LATEST:
+                self.latest.pop(event, None)
+
+    # ---- Consumer task ----
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def flush(self):
+        '''Wait until every event published so far has been delivered.'''
+        if self.task is not None:
+            await self.queue.join()
+
+    async def close(self):
+        '''Deliver what is queued, then stop the consumer task.'''
+        if self.task is not None:
+            await self.queue.put((_STOP, None))
+            await self.task
+            self.task = None
+
+    async def _run(self):
+        get = self.queue.get
+        get_nowait = self.queue.get_nowait
+        while True:
+            items = [await get()]
+            while len(items) < self.max_batch:
+                try:
+                    items.append(get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            stop = False
+            events = []
+            for event, data in items:
+                if event is _STOP:
+                    stop = True
+                elif data is _LATEST:
+                    events.append((event, self.latest.pop(event)))
+                else:
+                    events.append((event, data))
+            if events:
+                await self._dispatch(events)
+            for _ in items:
+                self.queue.task_done()
+            if stop:
+                return
+
+    async def _dispatch(self, events):
+        for fn, types, batch in self.subscribers:
+            selected = events if types is None else [item for item in events if item[0] in types]
+            if not selected:
+                continue
+            calls = [(fn, (selected,), 'batch')] if batch else [(fn, item, item[0]) for item in selected]
+            for callback, args, event in calls:
+                try:
+                    result = callback(*args)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    self.errors += 1
+                    self.on_error(event, e)
+            self.delivered += len(selected)
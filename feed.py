@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import argparse
+from decimal import Decimal
+
+MAGIC = b'FDR1'
+# compressed payload length, number of messages, first and last receive time (ns)
+CHUNK = struct.Struct('<IIqq')
+# receive time (ns), message length; followed by the raw message bytes
+RECORD = struct.Struct('<qI')
+
+
+class DepthFeedHandler(object):
+    '''
+    Keeps an OrderBook in sync with an exchange diff-depth stream (Binance
+    ``<symbol>@depth`` messages: {'U': first id, 'u': last id, 'b': [[price,
+    qty], ...], 'a': [...]}).
+
+    Every feed level is held as a single resting order at its price. A diff
+    is applied level by level straight to the OrderTrees: a new price
+    inserts a level, a known price has its quantity set in place and a zero
+    quantity removes the level. A message costs O(levels it changes), not
+    O(depth), and the trees' depth caches and L2 delta listeners see only
+    the levels that moved.
+
+    Sequencing follows the Binance rules. The book starts from a REST depth
+    snapshot (load_snapshot) carrying lastUpdateId; diffs that end at or
+    before it are dropped as stale, and every diff must start no later than
+    right after the previous one. On a gap the handler sets synced=False
+    and ignores diffs until the next snapshot.
+    '''
+
+    def __init__(self, book):
+        self.book = book
+        # Feed strings parse straight to ticks/lots when tick_size and lot_size are powers of ten
+        self.price_places = _decimal_places(book.tick_size) if book.integer_ticks else None
+        self.quantity_places = _decimal_places(book.lot_size) if book.integer_ticks else None
+        self.last_update_id = None # id of the last update reflected in the book
+        self.synced = False
+        self.applied = 0 # diffs applied
+        self.stale = 0 # diffs dropped because the snapshot already covered them
+        self.gaps = 0 # sequence gaps seen
+
+    def _parse_level(self, price, quantity):
+        '''Feed price/quantity strings in the units of the book.'''
+        if self.book.integer_ticks:
+            ticks = parse_scaled(price, self.price_places)
+            lots = parse_scaled(quantity, self.quantity_places)
+            return (ticks if ticks is not None else self.book.to_ticks(Decimal(price)),
+                    lots if lots is not None else self.book.to_lots(Decimal(quantity)))
+        return Decimal(price), Decimal(quantity)
+
+    def set_level(self, side, price, quantity, timestamp=0):
+        '''Set the quantity at price on one side (engine units); 0 removes the level.
+
+        A new level's order takes the book's next order id, so it can never
+        collide with an order placed through book.process_order.
+        '''
+        book = self.book
+        tree = book.bids if side == 'bid' else book.asks
+        order_list = tree.find_price_list(price)
+        if order_list is None:
+            if quantity:
+                book.next_order_id += 1
+                tree.insert_order({'order_id': book.next_order_id, 'timestamp': timestamp, 'price': price,
+                                   'quantity': quantity, 'trade_id': book.next_order_id})
+        elif quantity:
+            tree.reduce_order(order_list.head_order, quantity) # in place, also for increases: the level has one order
+        else:
+            tree.remove_order_by_id(order_list.head_order.order_id)
+
+    def _set_levels(self, side, levels, timestamp):
+        parse_level = self._parse_level
+        set_level = self.set_level
+        for price, quantity in levels:
+            price, quantity = parse_level(price, quantity)
+            set_level(side, price, quantity, timestamp)
+
+    def load_snapshot(self, snapshot):
+        '''Replace the book with a depth snapshot {'lastUpdateId': id, 'bids': [...], 'asks': [...]}.
+
+        The book is diffed against the snapshot rather than wiped: levels
+        the snapshot drops are removed (with their owners) and the others
+        set in place, so on a resync depth listeners get a delta for every
+        level that changed, including a 0-volume one per level dropped.
+        '''
+        book = self.book
+        for side, tree, levels in (('bid', book.bids, snapshot['bids']), ('ask', book.asks, snapshot['asks'])):
+            wanted = {}
+            for price, quantity in levels:
+                price, quantity = self._parse_level(price, quantity)
+                if quantity:
+                    wanted[price] = quantity
+            gone = []
+            for price, order_list in list(tree.iter_levels()):
+                quantity = wanted.get(price)
+                if quantity is None or len(order_list) > 1: # a level holding other orders is rebuilt as one feed order
+                    gone.extend(order.order_id for order in order_list)
+                elif quantity == order_list.volume:
+                    del wanted[price] # unchanged, no delta
+            if gone:
+                if book.order_owners:
+                    for order_id in gone:
+                        book._unindex_owner(order_id)
+                tree.remove_orders(gone)
+            for price, quantity in wanted.items():
+                self.set_level(side, price, quantity, 0)
+        self.last_update_id = snapshot['lastUpdateId']
+        self.synced = True
+
+    def apply(self, message):
+        '''Apply one diff. Returns False when it was stale or the book is out of sync.'''
+        if not self.synced:
+            return False
+        if message['u'] <= self.last_update_id:
+            self.stale += 1
+            return False
+        if message['U'] > self.last_update_id + 1:
+            # Updates between the last one applied and this one were missed
+            self.gaps += 1
+            self.synced = False
+            return False
+        timestamp = message.get('E', 0)
+        self._set_levels('bid', message['b'], timestamp)
+        self._set_levels('ask', message['a'], timestamp)
+        self.last_update_id = message['u']
+        self.applied += 1
+        return True
+
+    def process(self, message):
+        '''Load a snapshot or apply a diff, whichever message is.'''
+        if 'lastUpdateId' in message:
+            self.load_snapshot(message)
+            return True
+        return self.apply(message)
+
+
+def _decimal_places(size):
+    '''k when size is 10**-k (k >= 0), else None.'''
+    sign, digits, exponent = size.normalize().as_tuple()
+    if digits == (1,) and exponent <= 0:
+        return -exponent
+    return None
+
+
+def parse_scaled(text, places):
+    '''Integer value of a plain decimal string in units of 10**-places ("67123.45", 2 -> 6712345).
+
+    Works on the digits directly, without building a Decimal. Returns None
+    when places is None or the text has non-zero digits beyond places, so
+    the caller can fall back to Decimal rounding.
+    '''
+    if places is None:
+        return None
+    whole, _, fraction = text.partition('.')
+    if len(fraction) > places:
+        if fraction[places:].strip('0'):
+            return None
+        fraction = fraction[:places]
+    try:
+        return int(whole + fraction + '0' * (places - len(fraction)))
+    except ValueError:
+        return None
+
+
+# ---- Recording and replay ----
+class FeedRecorder(object):
+    '''
+    Records raw feed messages with their receive time into a chunked,
+    zlib-compressed file.
+
+    Messages are buffered until chunk_size bytes are pending, then written
+    as one compressed chunk behind a small header, so readers can stream a
+    recording chunk by chunk with flat memory use. Messages are stored as
+    received (str, bytes, or dicts encoded as JSON).
+
+    An existing recording is appended to. A chunk torn by a crash is cut
+    off first, so the new chunks follow the last complete one.
+    '''
+
+    def __init__(self, path, chunk_size=1 << 20, level=6):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.level = level
+        if os.path.exists(path):
+            os.truncate(path, _complete_length(path))
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.buffer = bytearray()
+        self.pending = 0 # messages in buffer
+        self.first_time = 0
+        self.last_time = 0
+        self.count = 0 # messages recorded by this writer
+        self.chunks = 0 # chunks written by this writer
+
+    def write(self, message, timestamp=None):
+        '''Record one message; timestamp is the receive time in ns (now by default).'''
+        if timestamp is None:
+            timestamp = time.time_ns()
+        if isinstance(message, str):
+            message = message.encode()
+        elif not isinstance(message, (bytes, bytearray)):
+            message = json.dumps(message, separators=(',', ':')).encode()
+        if not self.pending:
+            self.first_time = timestamp
+        self.last_time = timestamp
+        self.buffer += RECORD.pack(timestamp, len(message))
+        self.buffer += message
+        self.pending += 1
+        self.count += 1
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        '''Write the pending messages as one chunk.'''
+        if self.pending:
+            payload = zlib.compress(bytes(self.buffer), self.level)
+            self.file.write(CHUNK.pack(len(payload), self.pending, self.first_time, self.last_time))
+            self.file.write(payload)
+            self.file.flush()
+            self.buffer = bytearray()
+            self.pending = 0
+            self.chunks += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def _complete_length(path):
+    '''Length of a recording up to the end of its last complete chunk (0 if not even the magic is complete).'''
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        if len(magic) < len(MAGIC):
+            return 0
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a feed recording')
+        end = f.tell()
+        while True:
+            header = f.read(CHUNK.size)
+            if len(header) < CHUNK.size:
+                return end
+            length = CHUNK.unpack(header)[0]
+            if end + CHUNK.size + length > size:
+                return end
+            end = f.seek(length, os.SEEK_CUR)
+
+
+def read_recording(path):
+    '''Yield (receive time ns, raw message bytes) from a FeedRecorder file, one chunk in memory at a time.'''
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('not a feed recording')
+        while True:
+            header = f.read(CHUNK.size)
+            if len(header) < CHUNK.size:
+                return # end of file, or a chunk cut short by a crash
+            length, count, _, _ = CHUNK.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            try:
+                data = zlib.decompress(payload)
+            except zlib.error:
+                return # a corrupt chunk ends the stream like a torn one
+            offset = 0
+            for _ in range(count):
+                timestamp, size = RECORD.unpack_from(data, offset)
+                offset += RECORD.size
+                yield timestamp, data[offset:offset + size]
+                offset += size
+
+
+def replay_recording(path, handler, speed=None):
+    '''Stream a recording from disk through a DepthFeedHandler.
+
+    With speed=None messages are applied as fast as they can be parsed;
+    otherwise the recorded gaps between messages are replayed speed times
+    faster than they happened. Returns replay statistics.
+    '''
+    loads = json.loads
+    process = handler.process
+    messages = 0
+    first = None
+    started = time.perf_counter()
+    for timestamp, raw in read_recording(path):
+        if speed:
+            if first is None:
+                first = timestamp
+            delay = started + (timestamp - first) / 1e9 / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        process(loads(raw))
+        messages += 1
+    elapsed = time.perf_counter() - started
+    return {'messages': messages, 'applied': handler.applied, 'stale': handler.stale, 'gaps': handler.gaps,
+            'seconds': elapsed, 'messages_per_sec': messages / elapsed if elapsed > 0 else 0.0}
+
+
+def read_feed(path):
+    '''Messages of a recorded feed file, one JSON message per line.'''
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    '''Replay a recording: python feed.py btcusdt.feed [--speed 10] [--integer-ticks]'''
+    from OrderBook import OrderBook
+    p = argparse.ArgumentParser(description="Replay a recorded depth feed into an OrderBook")
+    p.add_argument('path', help='FeedRecorder file')
+    p.add_argument('--speed', type=float, help='replay this many times faster than recorded (default: as fast as possible)')
+    p.add_argument('--integer-ticks', action='store_true', help='use an integer tick book')
+    p.add_argument('--tick-size', type=str, default='0.01')
+    p.add_argument('--depth', type=int, default=5, help='levels per side to print at the end')
+    args = p.parse_args()
+
+    book = OrderBook(tick_size=Decimal(args.tick_size), integer_ticks=args.integer_ticks)
+    stats = replay_recording(args.path, DepthFeedHandler(book), args.speed)
+    print(f"{stats['messages']} messages in {stats['seconds']:.2f}s ({stats['messages_per_sec']:,.0f} msg/s), "
+          f"{stats['applied']} applied, {stats['stale']} stale, {stats['gaps']} gaps")
+    depth = book.get_depth(args.depth)
+    for side in ('asks', 'bids'):
+        levels = depth[side] if side == 'bids' else list(reversed(depth[side]))
+        for price, quantity in levels:
+            print(f"  {side[:-1]:<4} {price} -> {quantity}")
+    if stats['gaps']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+from array import array
+
+
+class FillColumns(object):
+    '''
+    Column store for fills produced by OrderBook.process_orders.
+
+    Instead of one dict per fill, every fill is appended to a set of parallel
+    typed arrays: price, quantity, maker_id (the resting order), taker_id (the
+    incoming order) and timestamp. Index i across all columns is fill i.
+
+    In the Decimal engine price and quantity are stored as floats. In integer
+    tick mode they are stored as raw integer ticks and lots; multiply by the
+    book's tick_size / lot_size (or use OrderBook.from_ticks / from_lots) to
+    get external units.
+    '''
+
+    def __init__(self, integer_ticks=False):
+        self.integer_ticks = integer_ticks
+        value_type = 'q' if integer_ticks else 'd'
+        self.price = array(value_type)
+        self.quantity = array(value_type)
+        self.maker_id = array('q')
+        self.taker_id = array('q')
+        self.timestamp = array('q')
+
+    def __len__(self):
+        return len(self.price)
+
+    def append(self, price, quantity, maker_id, taker_id, timestamp):
+        self.price.append(price)
+        self.quantity.append(quantity)
+        self.maker_id.append(maker_id)
+        self.taker_id.append(taker_id)
+        self.timestamp.append(timestamp)
+
+    def clear(self):
+        del self.price[:]
+        del self.quantity[:]
+        del self.maker_id[:]
+        del self.taker_id[:]
+        del self.timestamp[:]
+
+    def __iter__(self):
+        return zip(self.price, self.quantity, self.maker_id, self.taker_id, self.timestamp)
+
+    def __str__(self):
+        return "FillColumns({} fills)".format(len(self))
+
+
+class FillBuffer(object):
+    '''
+    Reusable, preallocated fill columns the matching engine writes into.
+
+    The book keeps one FillBuffer and resets it at the start of every
+    order, so filling an order only stores values into slots that already
+    exist: price, quantity and maker_id (the resting order) per fill. The
+    taker, side and time are the same for every fill of an order and are
+    kept on the FillView instead. Integer tick books store ticks/lots in
+    int64 arrays. Decimal books keep the engine's Decimal objects, so views
+    report exactly what the engine traded. Capacity doubles when an order
+    produces more fills than fit, then stays.
+    '''
+
+    def __init__(self, integer_ticks=False, capacity=256):
+        self.integer_ticks = integer_ticks
+        self.capacity = capacity
+        if integer_ticks:
+            self.price = array('q', [0]) * capacity
+            self.quantity = array('q', [0]) * capacity
+        else:
+            self.price = [None] * capacity
+            self.quantity = [None] * capacity
+        self.maker_id = array('q', [0]) * capacity
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def reset(self):
+        self.size = 0
+
+    def append(self, price, quantity, maker_id, taker_id=None, timestamp=None):
+        '''Same signature as FillColumns.append; taker_id and timestamp live on the FillView.'''
+        i = self.size
+        if i == self.capacity:
+            self._grow()
+        self.price[i] = price
+        self.quantity[i] = quantity
+        self.maker_id[i] = maker_id
+        self.size = i + 1
+
+    def _grow(self):
+        self.price.extend(self.price)
+        self.quantity.extend(self.quantity)
+        self.maker_id.extend(self.maker_id)
+        self.capacity *= 2
+
+
+class FillView(object):
+    '''
+    The fills of one order, read straight from the book's FillBuffer.
+
+    price(i), quantity(i) and maker_id(i) return engine units (Decimals, or
+    ticks/lots in integer tick mode). Indexing and iteration build the
+    classic trade dicts on demand, and to_dicts() returns them all, which
+    is what OrderBook.process_order hands back. The view is only valid
+    until the book processes its next order.
+    '''
+    __slots__ = ('buffer', 'size', 'taker_trade_id', 'side', 'book')
+
+    def __init__(self, buffer, taker_trade_id, side, book):
+        self.buffer = buffer
+        self.size = buffer.size
+        self.taker_trade_id = taker_trade_id
+        self.side = side # side of the incoming order
+        self.book = book # converts ticks/lots back to Decimal for the trade dicts
+
+    def __len__(self):
+        return self.size
+
+    def price(self, i):
+        return self.buffer.price[i]
+
+    def quantity(self, i):
+        return self.buffer.quantity[i]
+
+    def maker_id(self, i):
+        return self.buffer.maker_id[i]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError('fill index out of range')
+        buffer = self.buffer
+        price = buffer.price[i]
+        quantity = buffer.quantity[i]
+        if buffer.integer_ticks:
+            price = self.book.from_ticks(price)
+            quantity = self.book.from_lots(quantity)
+        maker_id = buffer.maker_id[i]
+        # Same id mapping as the trade dicts the engine has always returned
+        return {
+            "price": price,
+            "quantity": quantity,
+            "buy_order_id": maker_id if self.side == 'bid' else self.taker_trade_id,
+            "sell_order_id": maker_id if self.side == 'ask' else self.taker_trade_id,
+            "our_side": self.side,
+        }
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self[i]
+
+    def to_dicts(self):
+        return [self[i] for i in range(self.size)]
+
+    def __str__(self):
+        return "FillView({} fills)".format(self.size)
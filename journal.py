@@ -0,0 +1,308 @@
+import os
+import mmap
+import struct
+from decimal import Decimal
+
+MAGIC = b'OBJ5'
+# magic, integer_ticks flag, tick_size, lot_size (ascii, space padded)
+HEADER = struct.Struct('<4sB3x24s24s')
+
+ORDER, CANCEL, MODIFY = 0, 1, 2
+SIDES = ('bid', 'ask')
+TYPES = ('limit', 'market')
+
+# Integer tick books: kind, side, order type, owner id, timestamp, order_id, trade_id, price ticks,
+# quantity lots; every record has the same width
+INT_RECORD = struct.Struct('<BBBxIqqqqq')
+# Decimal books: kind, side, order type, flags, owner id, timestamp, order_id, trade_id and the byte
+# lengths of the price and quantity text that follow, so every Decimal comes back exactly
+DECIMAL_RECORD = struct.Struct('<BBBBIqqqHH')
+FLOAT_QUANTITY = 1 # flag: the quantity was given as a float (rests as Decimal(float) in the engine)
+
+# Owner table next to a journal (path + OWNERS_SUFFIX): magic, then per owner the byte length of the
+# owner (pack_owner) and the owner itself. Owner id n is the n-th entry; 0 in a record means no owner.
+OWNERS_SUFFIX = '.owners'
+OWNERS_MAGIC = b'OBO1'
+OWNER_ENTRY = struct.Struct('<H')
+
+
+def pack_owner(owner):
+    '''Bytes of an order owner, tagged with its type so it comes back as the same str or int.'''
+    if type(owner) is str:
+        return b's' + owner.encode()
+    if type(owner) is int:
+        return b'i' + str(owner).encode()
+    raise TypeError(f'order owner must be a str or an int, not {type(owner).__name__}')
+
+
+def unpack_owner(data):
+    data = bytes(data)
+    text = data[1:].decode()
+    return int(text) if data[:1] == b'i' else text
+
+
+class EventJournal(object):
+    '''
+    Append-only binary journal of the orders, cancels and modifies an
+    OrderBook receives, in compact binary records behind a buffered writer.
+
+    Opening an existing journal appends to it. Its header must match the
+    tick mode, tick size and lot size, and a record torn by a crash is cut
+    off first so new records line up behind the last complete one.
+
+    Records are written after the book has assigned timestamps and ids, so
+    replay_journal() can push them back through the from_data=True path and
+    rebuild the same book. Order and trade ids must be integers. Integer
+    tick books journal ticks and lots; Decimal books journal prices and
+    quantities as text. Records carry an owner id instead of the owner
+    itself, so integer tick records are all the same width; each owner is
+    written once, with its type, to a small table at path + '.owners', and
+    a replayed book has the same owner index.
+    '''
+
+    def __init__(self, path, integer_ticks=False, tick_size=Decimal('0.01'),
+                 lot_size=Decimal('0.00000001'), buffer_size=1 << 20):
+        self.path = path
+        self.integer_ticks = integer_ticks
+        tick_size = Decimal(str(tick_size))
+        lot_size = Decimal(str(lot_size))
+        self.owner_ids = {} # owner : id in the owner table
+        owners_length = 0
+        if os.path.exists(path):
+            owners_length = self._check_existing(integer_ticks, tick_size, lot_size)
+        self.file = open(path, 'ab', buffering=buffer_size)
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, 1 if integer_ticks else 0,
+                                        str(tick_size).encode(), str(lot_size).encode()))
+            owners_length = 0
+        owners_path = path + OWNERS_SUFFIX
+        if owners_length:
+            os.truncate(owners_path, owners_length) # cut an entry torn by a crash
+            self.owners_file = open(owners_path, 'ab')
+        else:
+            self.owner_ids = {}
+            self.owners_file = open(owners_path, 'wb')
+            self.owners_file.write(OWNERS_MAGIC)
+            self.owners_file.flush()
+        self.count = 0 # records written by this writer
+
+    def _check_existing(self, integer_ticks, tick_size, lot_size):
+        '''Validate the header of a journal about to be appended to and cut off a torn final record.
+
+        Loads the owner table and returns its length up to the last complete
+        entry (0 when the journal starts over or has no table yet).
+        '''
+        size = os.path.getsize(self.path)
+        if size < HEADER.size:
+            os.truncate(self.path, 0) # only part of a header was written: start over
+            return 0
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header = read_header(mm)
+            if header != (integer_ticks, tick_size, lot_size):
+                raise ValueError('%s is a journal of a book with integer_ticks=%s, tick_size %s, lot_size %s'
+                                 % ((self.path,) + header))
+            body = memoryview(mm)[HEADER.size:]
+            records = _records(body, integer_ticks)
+            try:
+                complete = 0
+                for complete, _ in records:
+                    pass
+            finally:
+                records.close()
+                body.release()
+        if HEADER.size + complete < size:
+            os.truncate(self.path, HEADER.size + complete)
+        owners, length = _read_owners(self.path)
+        self.owner_ids = {owner: owner_id for owner_id, owner in enumerate(owners, 1)}
+        return length
+
+    def _owner_id(self, owner):
+        '''Id of owner in the owner table, adding it (and writing it out at once) on first use.'''
+        owner_id = self.owner_ids.get(owner)
+        if owner_id is None:
+            data = pack_owner(owner)
+            owner_id = self.owner_ids[owner] = len(self.owner_ids) + 1
+            # Flushed before any record that refers to it can reach the disk
+            self.owners_file.write(OWNER_ENTRY.pack(len(data)) + data)
+            self.owners_file.flush()
+        return owner_id
+
+    def _write(self, kind, side, order_type, timestamp, order_id, trade_id, price, quantity, owner=None):
+        side = 0 if side == 'bid' else 1
+        owner_id = 0 if owner is None else self._owner_id(owner)
+        if self.integer_ticks:
+            self.file.write(INT_RECORD.pack(kind, side, order_type, owner_id, timestamp, order_id, trade_id,
+                                            price or 0, quantity or 0))
+        else:
+            flags = 0
+            if price is None:
+                price_text = b''
+            else:
+                # The engine reads a limit price as Decimal(str(price))
+                price_text = str(price if isinstance(price, Decimal) else Decimal(str(price))).encode()
+            if quantity is None:
+                quantity_text = b''
+            elif isinstance(quantity, float):
+                flags |= FLOAT_QUANTITY
+                quantity_text = repr(quantity).encode()
+            else:
+                quantity_text = str(Decimal(quantity)).encode()
+            self.file.write(DECIMAL_RECORD.pack(kind, side, order_type, flags, owner_id, timestamp, order_id,
+                                                trade_id, len(price_text), len(quantity_text)))
+            self.file.write(price_text)
+            self.file.write(quantity_text)
+        self.count += 1
+
+    def write_order(self, quote):
+        if quote['type'] == 'limit':
+            self._write(ORDER, quote['side'], 0, quote['timestamp'], quote['order_id'], quote['trade_id'],
+                        quote['price'], quote['quantity'], quote.get('owner'))
+        else:
+            self._write(ORDER, quote['side'], 1, quote['timestamp'], quote['order_id'], quote['trade_id'],
+                        None, quote['quantity'], quote.get('owner'))
+
+    def write_cancel(self, side, order_id, timestamp):
+        self._write(CANCEL, side, 0, timestamp, order_id, 0, None, None)
+
+    def write_modify(self, update):
+        self._write(MODIFY, update['side'], 0, update['timestamp'], update['order_id'], 0,
+                    update['price'], update['quantity'])
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            self.owners_file.close()
+
+
+def read_header(buffer):
+    magic, integer_ticks, tick_size, lot_size = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError('not an OrderBook journal')
+    return bool(integer_ticks), Decimal(tick_size.rstrip(b'\0 ').decode()), Decimal(lot_size.rstrip(b'\0 ').decode())
+
+
+def _read_owners(path):
+    '''(owners in id order, length up to the last complete entry) of a journal's owner table.'''
+    try:
+        with open(path + OWNERS_SUFFIX, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+    if data[:len(OWNERS_MAGIC)] != OWNERS_MAGIC:
+        return [], 0
+    owners = []
+    offset = len(OWNERS_MAGIC)
+    while offset + OWNER_ENTRY.size <= len(data):
+        (length,) = OWNER_ENTRY.unpack_from(data, offset)
+        end = offset + OWNER_ENTRY.size + length
+        if end > len(data):
+            break # torn by a crash
+        owners.append(unpack_owner(data[offset + OWNER_ENTRY.size:end]))
+        offset = end
+    return owners, offset
+
+
+def _records(body, integer_ticks):
+    '''Yield (end offset, record tuple) for the complete records of a journal body; owners as ids.'''
+    if integer_ticks:
+        # Fixed width: step straight through the buffer
+        size = INT_RECORD.size
+        end = len(body) - len(body) % size
+        for offset, values in enumerate(INT_RECORD.iter_unpack(body[:end]), 1):
+            kind, side, order_type, owner_id, timestamp, order_id, trade_id, price, quantity = values
+            yield offset * size, (kind, side, order_type, timestamp, order_id, trade_id, price, quantity, owner_id)
+        return
+    unpack_from = DECIMAL_RECORD.unpack_from
+    size = DECIMAL_RECORD.size
+    limit = len(body)
+    offset = 0
+    while offset + size <= limit:
+        start = offset + size
+        kind, side, order_type, flags, owner_id, timestamp, order_id, trade_id, price_length, quantity_length = \
+            unpack_from(body, offset)
+        end = start + price_length + quantity_length
+        if end > limit:
+            return # a torn final record after a crash
+        price = Decimal(bytes(body[start:start + price_length]).decode()) if price_length else 0
+        start += price_length
+        quantity = bytes(body[start:end]).decode()
+        if not quantity_length:
+            quantity = 0
+        elif flags & FLOAT_QUANTITY:
+            quantity = float(quantity)
+        else:
+            quantity = Decimal(quantity)
+        yield end, (kind, side, order_type, timestamp, order_id, trade_id, price, quantity, owner_id)
+        offset = end
+
+
+def read_journal(path):
+    '''Yield the record tuples of a journal file (memory mapped).
+
+    Integer tick journals yield ticks and lots, Decimal journals the
+    prices and quantities as the book received them. The last field is
+    the owner of an order (from the owner table), or None.
+    '''
+    owners, _ = _read_owners(path)
+    owners.insert(0, None) # owner id 0: no owner
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        integer_ticks, _, _ = read_header(mm)
+        body = memoryview(mm)[HEADER.size:]
+        records = _records(body, integer_ticks)
+        try:
+            for _, values in records:
+                owner_id = values[8]
+                if owner_id >= len(owners):
+                    raise ValueError(f'{path} refers to owner {owner_id}, missing from {path + OWNERS_SUFFIX}')
+                yield values[:8] + (owners[owner_id],)
+        finally:
+            records.close() # drop its views of the map before it is closed
+            body.release()
+
+
+def replay_journal(path, book):
+    '''Stream a journal into book and return the number of records applied.
+
+    Integer tick journals go straight into the engine without unit
+    conversion, so they need an integer tick book with the same tick and
+    lot size. Decimal journals can be replayed into any book.
+    '''
+    with open(path, 'rb') as f:
+        integer_ticks, tick_size, lot_size = read_header(f.read(HEADER.size))
+    if integer_ticks and (not book.integer_ticks or book.tick_size != tick_size or book.lot_size != lot_size):
+        raise ValueError('integer tick journal needs an integer tick book with tick_size %s and lot_size %s'
+                         % (tick_size, lot_size))
+
+    journal, book.journal = book.journal, None # do not re-journal what we replay
+    process_quote = book._process_quote
+    count = 0
+    last_trade_id = 0
+    try:
+        for kind, side, order_type, timestamp, order_id, trade_id, price, quantity, owner in read_journal(path):
+            if kind == ORDER:
+                quote = {'type': TYPES[order_type], 'side': SIDES[side], 'quantity': quantity,
+                         'timestamp': timestamp, 'order_id': order_id, 'trade_id': trade_id}
+                if order_type == 0:
+                    quote['price'] = price
+                if owner is not None:
+                    quote['owner'] = owner
+                process_quote(quote, True, False, None, integer_ticks)
+                if trade_id > last_trade_id:
+                    last_trade_id = trade_id
+            elif kind == CANCEL:
+                book.cancel_order(SIDES[side], order_id, time=timestamp)
+            else:
+                if integer_ticks:
+                    price = book.from_ticks(price)
+                    quantity = book.from_lots(quantity)
+                book.modify_order(order_id, {'side': SIDES[side], 'price': price, 'quantity': quantity},
+                                  time=timestamp)
+            count += 1
+    finally:
+        book.journal = journal
+    # Continue numbering after the replayed orders
+    book.next_order_id = max(book.next_order_id, last_trade_id)
+    return count
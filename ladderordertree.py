@@ -0,0 +1,230 @@
+from sortedcontainers import SortedDict
+from orderlist import OrderList
+from ordertree import OrderTree, OrderPool
+
+class LadderOrderTree(OrderTree):
+    '''A dense, array backed alternative to OrderTree for integer tick books.
+
+    Price levels live in a contiguous list indexed by tick offset from a base
+    price, so level lookup, level creation and best price queries are O(1)
+    instead of going through a SortedDict. The highest and lowest occupied
+    slots are tracked with pointers; when the top level empties the pointer
+    walks to the next occupied slot, which is a short walk in a book that
+    trades around the touch.
+
+    The ladder is a fixed band of ``capacity`` ticks that follows the touch.
+    Levels outside the band (a stray far-off order, or the deep end of the
+    book) are kept in an overflow SortedDict, so memory stays bounded by
+    capacity whatever the spread of prices. The band recenters when an order
+    arrives at a better price than it can hold, or when its last level
+    empties while overflow levels remain. Either way the best level is
+    always in the band and overflow levels sit on its far side.
+
+    Prices must be integer ticks, so this tree is only used in integer tick
+    mode (OrderBook(integer_ticks=True, ladder_capacity=...)).
+    '''
+
+    def __init__(self, capacity=1024, pool=None, side=None):
+        self.integer_ticks = True
+        self.pool = pool if pool is not None else OrderPool() # recycles Order records
+        self.side = side # 'bid' ladders rank the highest price first, anything else the lowest
+        self.capacity = capacity
+        self.levels = [None] * capacity # tick offset : OrderList object (or None)
+        self.base = None # tick price of levels[0], set by the first insert
+        self.low = None # index of the lowest occupied level
+        self.high = None # index of the highest occupied level
+        self.banded = 0 # levels held in the band, the rest are in overflow
+        self.overflow = SortedDict() # price : OrderList for levels outside the band
+        self._price_map = None # cached SortedDict view, see price_map
+        self.order_map = {} # Dictionary containing order_id : Order object
+        self.volume = 0 # Contains total quantity from all Orders in tree
+        self.num_orders = 0 # Contains count of Orders in tree
+        self.depth = 0 # Number of different prices in tree
+        self.top_cache = None # cached [(price, volume), ...] for the best top_n levels, None when stale
+        self.top_n = 0
+        self.top_version = 0
+        self.level_listener = None
+
+    @property
+    def price_map(self):
+        '''SortedDict view of the occupied levels, for display and inspection.
+
+        Built on first access and kept until a level is created or removed.
+        '''
+        if self._price_map is None:
+            price_map = SortedDict(self.overflow)
+            if self.banded:
+                levels = self.levels
+                for i in range(self.low, self.high + 1):
+                    if levels[i] is not None:
+                        price_map[self.base + i] = levels[i]
+            self._price_map = price_map
+        return self._price_map
+
+    @property
+    def prices(self):
+        return self.price_map.keys()
+
+    def _is_better(self, price, than):
+        return price > than if self.side == 'bid' else price < than
+
+    def _recenter(self, center):
+        '''Move the band to be centred on center, swapping levels with the overflow.'''
+        capacity = self.capacity
+        new_base = center - capacity // 2
+        levels = [None] * capacity
+        overflow = self.overflow
+        placed = [] # band indexes now occupied
+        if self.banded:
+            old_levels = self.levels
+            for i in range(self.low, self.high + 1):
+                order_list = old_levels[i]
+                if order_list is not None:
+                    price = self.base + i
+                    j = price - new_base
+                    if 0 <= j < capacity:
+                        levels[j] = order_list
+                        placed.append(j)
+                    else:
+                        overflow[price] = order_list
+        for price in list(overflow.irange(new_base, new_base + capacity - 1)):
+            levels[price - new_base] = overflow.pop(price)
+            placed.append(price - new_base)
+        self.levels = levels
+        self.base = new_base
+        self.banded = len(placed)
+        if placed:
+            self.low = min(placed)
+            self.high = max(placed)
+        else:
+            self.low = self.high = None
+
+    def clear(self):
+        self.levels = [None] * self.capacity
+        self.base = None
+        self.low = None
+        self.high = None
+        self.banded = 0
+        self.overflow = SortedDict()
+        self._price_map = None
+        self.order_map = {}
+        self.volume = 0
+        self.num_orders = 0
+        self.depth = 0
+        self.top_cache = None
+        self.top_version += 1
+
+    def iter_levels(self):
+        '''Walk occupied slots from the best price outwards, then the overflow levels.'''
+        if self.depth == 0:
+            return
+        levels = self.levels
+        base = self.base
+        if self.side == 'bid':
+            indexes = range(self.high, self.low - 1, -1)
+            overflow = reversed(self.overflow.items())
+        else:
+            indexes = range(self.low, self.high + 1)
+            overflow = iter(self.overflow.items())
+        for i in indexes:
+            if levels[i] is not None:
+                yield base + i, levels[i]
+        yield from overflow
+
+    def get_price_list(self, price):
+        order_list = self.find_price_list(price)
+        if order_list is None:
+            raise KeyError(price)
+        return order_list
+
+    def find_price_list(self, price):
+        if self.base is None:
+            return None
+        i = price - self.base
+        if 0 <= i < self.capacity:
+            return self.levels[i]
+        return self.overflow.get(price)
+
+    def price_exists(self, price):
+        return self.find_price_list(price) is not None
+
+    def create_price(self, price):
+        self.depth += 1 # Add a price depth level to the ladder
+        self._price_map = None
+        new_list = OrderList()
+        if self.base is None:
+            self.base = price - self.capacity // 2
+        elif not 0 <= price - self.base < self.capacity:
+            if self.banded and not self._is_better(price, self.base + (self.high if self.side == 'bid' else self.low)):
+                # Away from the touch: park it outside the band
+                self.overflow[price] = new_list
+                return new_list
+            self._recenter(price)
+        i = price - self.base
+        self.levels[i] = new_list
+        self.banded += 1
+        if self.high is None:
+            self.low = self.high = i
+        elif i > self.high:
+            self.high = i
+        elif i < self.low:
+            self.low = i
+        return new_list
+
+    def remove_price(self, price):
+        self.depth -= 1 # Remove a price depth level
+        self._price_map = None
+        i = price - self.base
+        if not 0 <= i < self.capacity:
+            del self.overflow[price]
+            return
+        levels = self.levels
+        levels[i] = None
+        self.banded -= 1
+        if self.banded == 0:
+            self.low = self.high = None
+            if self.overflow:
+                # The touch has moved out of the band: follow it
+                prices = self.overflow.keys()
+                self._recenter(prices[-1] if self.side == 'bid' else prices[0])
+            return
+        # Walk the best pointers to the next occupied level
+        if i == self.high:
+            high = i - 1
+            while levels[high] is None:
+                high -= 1
+            self.high = high
+        if i == self.low:
+            low = i + 1
+            while levels[low] is None:
+                low += 1
+            self.low = low
+
+    # The best level is always in the band; overflow levels sit beyond its far end
+    def max_price(self):
+        if self.depth == 0:
+            return None
+        if self.overflow and self.side != 'bid':
+            return self.overflow.keys()[-1]
+        return self.base + self.high
+
+    def min_price(self):
+        if self.depth == 0:
+            return None
+        if self.overflow and self.side == 'bid':
+            return self.overflow.keys()[0]
+        return self.base + self.low
+
+    def max_price_list(self):
+        if self.depth == 0:
+            return None
+        if self.overflow and self.side != 'bid':
+            return self.overflow.values()[-1]
+        return self.levels[self.high]
+
+    def min_price_list(self):
+        if self.depth == 0:
+            return None
+        if self.overflow and self.side == 'bid':
+            return self.overflow.values()[0]
+        return self.levels[self.low]
@@ -0,0 +1,111 @@
+import math
+
+SUB_BITS = 5
+SUB_COUNT = 1 << SUB_BITS # sub-buckets per power of two: values are kept to within 1/32 (~3%)
+NUM_BUCKETS = 64 * SUB_COUNT
+
+
+def bucket_bounds(index):
+    '''Lowest and highest value that fall into a bucket.'''
+    if index < 2 * SUB_COUNT:
+        return index, index
+    shift = index // SUB_COUNT - 1
+    sub = index % SUB_COUNT + SUB_COUNT
+    return sub << shift, ((sub + 1) << shift) - 1
+
+
+class LatencyHistogram(object):
+    '''
+    Log-linear histogram of non-negative integer latencies (nanoseconds).
+
+    Values below 64 get their own bucket, larger values share buckets that
+    are 1/32 of their power of two wide, so every percentile is accurate to
+    about 3% while recording stays a few integer operations. Count, sum,
+    min and max are exact.
+    '''
+
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value):
+        if value < 2 * SUB_COUNT:
+            index = value if value > 0 else 0
+        else:
+            shift = value.bit_length() - SUB_BITS - 1
+            index = (shift + 1) * SUB_COUNT + (value >> shift) - SUB_COUNT
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    def percentile(self, p):
+        '''Upper bound of the bucket holding the p-th percentile (0-100), capped at max.'''
+        if self.count == 0:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_bounds(index)[1], self.max)
+        return self.max
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+
+    def summary(self):
+        if self.count == 0:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ns': self.total / self.count,
+            'min_ns': self.min,
+            'p50_ns': self.percentile(50),
+            'p99_ns': self.percentile(99),
+            'p99.9_ns': self.percentile(99.9),
+            'max_ns': self.max,
+        }
+
+
+class LatencyRecorder(object):
+    '''One LatencyHistogram per (operation, outcome), created on first use.'''
+
+    def __init__(self):
+        self.histograms = {}
+
+    def record(self, operation, outcome, value):
+        histogram = self.histograms.get((operation, outcome))
+        if histogram is None:
+            histogram = self.histograms[(operation, outcome)] = LatencyHistogram()
+        histogram.record(value)
+
+    def reset(self):
+        self.histograms = {}
+
+    def merge(self, other):
+        for key, histogram in other.histograms.items():
+            mine = self.histograms.get(key)
+            if mine is None:
+                mine = self.histograms[key] = LatencyHistogram()
+            mine.merge(histogram)
+
+    def stats(self):
+        '''{operation: {outcome: summary}}'''
+        stats = {}
+        for (operation, outcome), histogram in sorted(self.histograms.items()):
+            stats.setdefault(operation, {})[outcome] = histogram.summary()
+        return stats
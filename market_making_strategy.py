@@ -1,5 +1,7 @@
 import random 
 import time
+import itertools
+import numpy as np
 import matplotlib.pyplot as plt
 
 # Market Maker Class
@@ -115,6 +117,86 @@ def simulate_market_making(
     plt.show()
 
 
+# Parameter sweep: many configurations and price paths at once
+def sweep_market_making(
+    bid_spreads=(0.05,), ask_spreads=(0.05,), max_inventories=(10,), n_paths=100, max_steps=1000,
+    initial_cash=10000, prices=None, buy_draws=None, seed=None
+):
+    """
+    Run the MarketMaker strategy for every combination of bid_spread,
+    ask_spread and max_inventory over n_paths random price paths.
+
+    Instead of thousands of serial simulate_market_making() runs, the state
+    (cash, inventory, trade count) is kept in NumPy arrays with one row per
+    configuration and one column per path, and every step updates all of
+    them at once. The step logic is the same as MarketMaker.place_order()
+    and manage_risk(), without printing or sleeping.
+
+    All configurations see the same price paths and the same buy/sell
+    draws, so their results are directly comparable. prices and buy_draws
+    ((n_paths, max_steps) arrays; a draw < 0.5 means "buy") can be passed
+    in, otherwise they are generated like simulate_market_making() does.
+
+    Returns one result row per configuration with the final cash,
+    inventory and trade count of every path, plus their means.
+    """
+    rng = np.random.default_rng(seed)
+    if prices is None:
+        prices = rng.uniform(1000, 1100, size=(n_paths, max_steps))  # Same range as simulate_market_making
+    if buy_draws is None:
+        buy_draws = rng.random(size=(n_paths, max_steps))
+    prices = np.asarray(prices, dtype=float)
+    buys = np.asarray(buy_draws) < 0.5
+    n_paths, max_steps = prices.shape
+
+    grid = list(itertools.product(bid_spreads, ask_spreads, max_inventories))
+    bid_spread = np.array([config[0] for config in grid], dtype=float)[:, None]
+    ask_spread = np.array([config[1] for config in grid], dtype=float)[:, None]
+    max_inventory = np.array([config[2] for config in grid], dtype=float)[:, None]
+
+    cash = np.full((len(grid), n_paths), float(initial_cash))
+    inventory = np.zeros((len(grid), n_paths))
+    trades = np.zeros((len(grid), n_paths), dtype=np.int64)
+
+    for step in range(max_steps):
+        market_price = prices[:, step]
+        buy = buys[:, step]
+
+        # Buying logic: only with enough cash for the bid
+        bid_price = market_price - bid_spread
+        buying = buy & (cash >= bid_price)
+        inventory += buying
+        cash -= np.where(buying, bid_price, 0.0)
+
+        # Selling logic: only with inventory to sell
+        ask_price = market_price + ask_spread
+        selling = ~buy & (inventory > 0)
+        inventory -= selling
+        cash += np.where(selling, ask_price, 0.0)
+        trades += buying | selling
+
+        # Risk management: liquidate at the market price above max_inventory
+        liquidating = np.abs(inventory) > max_inventory
+        cash += np.where(liquidating, inventory * market_price, 0.0)
+        inventory[liquidating] = 0
+        trades += liquidating
+
+    results = []
+    for i, (bid, ask, max_inv) in enumerate(grid):
+        results.append({
+            "bid_spread": bid,
+            "ask_spread": ask,
+            "max_inventory": max_inv,
+            "final_cash": cash[i],
+            "final_inventory": inventory[i],
+            "total_trades": trades[i],
+            "mean_cash": float(cash[i].mean()),
+            "mean_inventory": float(inventory[i].mean()),
+            "mean_trades": float(trades[i].mean()),
+        })
+    return results
+
+
 # Main Execution
 if __name__ == "__main__":
     simulate_market_making(
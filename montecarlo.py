@@ -0,0 +1,127 @@
+import io
+import os
+import json
+import time
+import argparse
+import itertools
+import contextlib
+import multiprocessing
+from dataclasses import asdict, replace
+from simulation import Simulator, Config
+
+
+def config_grid(base=None, seeds=(None,), **params):
+    '''Every combination of the given Config fields, once per seed.
+
+        config_grid(Config(duration=3600), seeds=range(100), volatility=[0.01, 0.02], order_rate=[1, 5])
+    '''
+    base = base or Config()
+    names = sorted(params)
+    configs = []
+    for values in itertools.product(*(params[name] for name in names)):
+        for seed in seeds:
+            configs.append(replace(base, seed=seed, **dict(zip(names, values))))
+    return configs
+
+
+def config_key(config):
+    '''Stable identity of a run in the results file (all Config fields, seed included).'''
+    return json.dumps(asdict(config), sort_keys=True)
+
+
+def _run_config(config):
+    '''Worker: run one seeded Simulator on the virtual clock and return its results record.'''
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # the simulator prints progress lines
+        stats = Simulator(config).run_virtual()
+    return {'key': config_key(config), 'config': asdict(config), 'stats': stats,
+            'seconds': time.perf_counter() - started}
+
+
+def load_results(path):
+    '''Records of the finished runs in a results file (a torn last line is ignored).'''
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+    return records
+
+
+def _trim_torn_line(path):
+    '''Drop a partially written last line so appended records start on a fresh line.'''
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+
+def run_grid(configs, results_path, num_workers=None, verbose=True):
+    '''
+    Run a Simulator for every Config across a process pool and append each
+    run's stats() to results_path (JSON lines) as soon as it finishes.
+
+    Every Config should carry a seed: each Simulator draws from its own
+    random.Random(seed) stream, so a run gives the same result whichever
+    worker picks it up. Runs already in the results file are skipped, so an
+    interrupted study resumes where it stopped when run_grid is called again
+    with the same grid. Returns all records in the results file.
+    '''
+    done = {record['key'] for record in load_results(results_path)}
+    pending = [config for config in configs if config_key(config) not in done]
+    if verbose:
+        print(f"{len(configs)} runs, {len(configs) - len(pending)} already done, {len(pending)} to go")
+
+    if pending:
+        if os.path.exists(results_path):
+            _trim_torn_line(results_path)
+        num_workers = min(num_workers or multiprocessing.cpu_count(), len(pending))
+        with open(results_path, 'a') as f, multiprocessing.Pool(num_workers) as pool:
+            for finished, record in enumerate(pool.imap_unordered(_run_config, pending), 1):
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+                if verbose:
+                    print(f"[{finished}/{len(pending)}] {record['stats']['trades']['count']} trades "
+                          f"in {record['seconds']:.2f}s (seed {record['config']['seed']})")
+    return load_results(results_path)
+
+
+def _parse_values(text):
+    values = []
+    for value in text.split(','):
+        try:
+            values.append(int(value))
+        except ValueError:
+            values.append(float(value))
+    return values
+
+
+def main():
+    '''Monte Carlo runner: python montecarlo.py --grid volatility=0.01,0.02 --seeds 100 --out runs.jsonl'''
+    p = argparse.ArgumentParser(description="Monte Carlo runs of the market simulation over a Config grid")
+    p.add_argument('--grid', action='append', default=[], metavar='FIELD=V1,V2,...',
+                   help='Config field and the values to sweep (repeatable)')
+    p.add_argument('--seeds', type=int, default=10, help='number of seeds per grid point (0..N-1)')
+    p.add_argument('--duration', type=int, default=60)
+    p.add_argument('--workers', type=int)
+    p.add_argument('--out', type=str, default='montecarlo.jsonl')
+    args = p.parse_args()
+
+    params = {}
+    for item in args.grid:
+        name, values = item.split('=', 1)
+        if name not in Config.__dataclass_fields__:
+            p.error(f"unknown Config field {name}")
+        params[name] = _parse_values(values)
+
+    configs = config_grid(Config(duration=args.duration), seeds=range(args.seeds), **params)
+    started = time.perf_counter()
+    records = run_grid(configs, args.out, num_workers=args.workers)
+    print(f"{len(records)} runs in {args.out} ({time.perf_counter() - started:.1f}s)")
+
+if __name__ == '__main__':
+    main()
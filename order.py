@@ -1,36 +1,58 @@
 from decimal import * 
 import time, random
+from orderlist import offset_add, offset_sub
 
 class Order(object):
     '''
     Orders represent the core piece of the exchange. Every bid/ask is an Order.
-    Orders are doubly linked and have helper functions (next_order, prev_order)
-    to help the exchange fullfill orders with quantities larger than a single
-    existing Order.
+    Orders are doubly linked (next_order, prev_order) to help the exchange
+    fullfill orders with quantities larger than a single existing Order.
+
+    Orders are slotted records so resting orders carry no per-instance
+    __dict__, and they are recycled through an OrderPool (see ordertree)
+    once they are cancelled or filled.
     '''
-    def __init__(self, quote, order_list):
-        self.timestamp = int(quote['timestamp']) # integer representing the timestamp of order creation
-        self.quantity = Decimal(quote['quantity']) # decimal representing amount of thing - can be partial amounts
-        self.price = Decimal(quote['price']) # decimal representing price (currency)
-        self.order_id = int(quote['order_id'])
-        self.trade_id = quote['trade_id']
+    __slots__ = ('timestamp', 'quantity', 'price', 'order_id', 'trade_id',
+                 'next_order', 'prev_order', 'order_list', 'queue_end', 'queue_seq')
+
+    def __init__(self, timestamp, quantity, price, order_id, trade_id, order_list=None):
+        self.timestamp = timestamp # integer representing the timestamp of order creation
+        self.quantity = quantity # amount of thing - can be partial amounts (Decimal, or integer lots)
+        self.price = price # price (Decimal currency, or integer ticks)
+        self.order_id = order_id
+        self.trade_id = trade_id
         # doubly linked list to make it easier to re-order Orders for a particular price point
         self.next_order = None
         self.prev_order = None
         self.order_list = order_list
+        # queue position marks, set when the order joins an OrderList (see OrderList.queue_position)
+        self.queue_end = 0
+        self.queue_seq = 0
 
-    # helper functions to get Orders in linked list
-    def next_order(self):
-        return self.next_order
-
-    def prev_order(self):
-        return self.prev_order
+    def reset(self, timestamp, quantity, price, order_id, trade_id, order_list):
+        '''Re-initialise a recycled Order in place.'''
+        self.timestamp = timestamp
+        self.quantity = quantity
+        self.price = price
+        self.order_id = order_id
+        self.trade_id = trade_id
+        self.next_order = None
+        self.prev_order = None
+        self.order_list = order_list
 
     def update_quantity(self, new_quantity, new_timestamp):
-        if new_quantity > self.quantity and self.order_list.tail_order != self:
+        order_list = self.order_list
+        if new_quantity > self.quantity and order_list.tail_order != self:
             # check to see that the order is not the last order in list and the quantity is more
-            self.order_list.move_to_tail(self) # move to the end
-        self.order_list.volume -= (self.quantity - new_quantity) # update volume
+            order_list.move_to_tail(self) # move to the end
+        elif order_list.head_order is self:
+            # orders behind move up, the head stays first
+            order_list.front_volume = offset_add(order_list.front_volume, offset_sub(self.quantity, new_quantity))
+        elif order_list.tail_order is self:
+            self.queue_end = offset_add(self.queue_end, offset_sub(new_quantity, self.quantity)) # nobody behind
+        else:
+            order_list.dirty = True # orders behind move up: renormalize on the next query
+        order_list.volume -= (self.quantity - new_quantity) # update volume
         self.timestamp = new_timestamp
         self.quantity = new_quantity
 
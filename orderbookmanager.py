@@ -0,0 +1,212 @@
+import time
+import zlib
+import queue
+import pickle
+import multiprocessing
+from OrderBook import OrderBook
+
+
+def shard_for(symbol, num_shards):
+    '''Stable shard index for a symbol (the same in every process, unlike hash()).'''
+    return zlib.crc32(symbol.encode()) % num_shards
+
+
+def _pickle_results(results, stats):
+    '''Pickle a batch of results in the worker, so one result that cannot be pickled fails alone.
+
+    Left to the queue, a pickling error would be raised in its feeder thread
+    and the whole response silently lost.
+    '''
+    try:
+        return pickle.dumps(results, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        checked = []
+        for index, result in results:
+            try:
+                pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                stats['errors'] += 1
+                result = RuntimeError(f"result of request {index} cannot be pickled: {e}")
+            checked.append((index, result))
+        return pickle.dumps(checked, pickle.HIGHEST_PROTOCOL)
+
+
+def _shard_worker(shard_id, requests, responses, book_kwargs):
+    '''Worker process: owns the OrderBooks of one shard and serves request batches.'''
+    books = {}
+    stats = {'shard': shard_id, 'batches': 0, 'requests': 0, 'orders': 0, 'fills': 0,
+             'errors': 0, 'busy_seconds': 0.0}
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        request_id, batch = message
+        if batch is None:
+            # stats request
+            stats['symbols'] = sorted(books)
+            stats['resting_orders'] = sum(len(book.bids) + len(book.asks) for book in books.values())
+            responses.put((shard_id, request_id, dict(stats)))
+            continue
+
+        started = time.perf_counter()
+        results = []
+        for index, symbol, method, args, kwargs in batch:
+            book = books.get(symbol)
+            if book is None:
+                book = books[symbol] = OrderBook(symbol=symbol, **book_kwargs)
+            try:
+                result = getattr(book, method)(*args, **kwargs)
+            except (Exception, SystemExit) as e: # the engine reports bad input with sys.exit
+                stats['errors'] += 1
+                result = RuntimeError(f"{symbol} {method}: {e}")
+            if method == 'process_order' and not isinstance(result, Exception):
+                stats['orders'] += 1
+                stats['fills'] += len(result[0])
+            results.append((index, result))
+        stats['batches'] += 1
+        stats['requests'] += len(batch)
+        stats['busy_seconds'] += time.perf_counter() - started
+        responses.put((shard_id, request_id, _pickle_results(results, stats)))
+
+
+class OrderBookManager(object):
+    '''
+    Routes orders for many symbols to OrderBooks hosted in a pool of worker
+    processes, so matching for different symbols runs on different cores.
+
+    Each symbol lives on exactly one shard (chosen by a stable hash of the
+    symbol) and its book is created on first use. Requests are buffered per
+    shard with submit() and shipped as one batch per shard by flush(), which
+    returns the results in submission order. A failed request returns a
+    RuntimeError in its result slot instead of raising. If a worker dies, or
+    no shard answers within response_timeout seconds, flush() and stats()
+    raise instead of waiting forever. The requests of a flush() that timed
+    out may still be applied by their shard, but their late answers are
+    discarded rather than taken as the answers of a later call.
+
+        with OrderBookManager(num_workers=4) as manager:
+            manager.submit('BTC/USD', {'type': 'limit', 'side': 'bid', 'price': 100, 'quantity': 1})
+            manager.submit('ETH/USD', {'type': 'market', 'side': 'ask', 'quantity': 2})
+            results = manager.flush()  # [(trades, order_in_book), ...]
+    '''
+
+    def __init__(self, num_workers=None, book_kwargs=None, response_timeout=60.0):
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.book_kwargs = book_kwargs or {} # extra OrderBook(...) arguments, e.g. integer_ticks
+        self.response_timeout = response_timeout # seconds to wait for a shard's answer, None for no limit
+        self.workers = []
+        self.requests = []
+        self.responses = None
+        self.pending = [[] for _ in range(self.num_workers)] # per shard request buffers
+        self.submitted = 0 # requests buffered since the last flush
+        self.next_request_id = 0 # id of the next batch or stats request sent to a shard
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        if self.workers:
+            return
+        self.responses = multiprocessing.Queue()
+        for shard_id in range(self.num_workers):
+            requests = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=_shard_worker,
+                                             args=(shard_id, requests, self.responses, self.book_kwargs),
+                                             daemon=True)
+            worker.start()
+            self.requests.append(requests)
+            self.workers.append(worker)
+
+    def close(self):
+        for requests in self.requests:
+            requests.put(None)
+        for worker in self.workers:
+            worker.join(self.response_timeout)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self.workers = []
+        self.requests = []
+
+    def _send(self, shard_id, batch):
+        '''Send a batch (None for a stats request) to a shard; returns the request id its answer carries.'''
+        request_id = self.next_request_id
+        self.next_request_id += 1
+        self.requests[shard_id].put((request_id, batch))
+        return request_id
+
+    def _receive(self, expected):
+        '''(shard_id, payload) of the next answer to one of the expected request ids, which it removes.
+
+        Answers to other requests, left over from a call that timed out, are
+        dropped. Raises RuntimeError if a worker died, TimeoutError if no
+        expected answer arrives in time.
+        '''
+        deadline = None if self.response_timeout is None else time.monotonic() + self.response_timeout
+        while True:
+            wait = 0.1 if deadline is None else min(0.1, max(deadline - time.monotonic(), 0))
+            try:
+                shard_id, request_id, payload = self.responses.get(timeout=wait)
+            except queue.Empty:
+                pass
+            else:
+                if request_id in expected:
+                    expected.remove(request_id)
+                    return shard_id, payload
+            dead = [(shard_id, worker.exitcode) for shard_id, worker in enumerate(self.workers)
+                    if not worker.is_alive()]
+            if dead:
+                raise RuntimeError(f"shard worker(s) died (shard, exit code): {dead}")
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"no shard response within {self.response_timeout}s")
+
+    def shard_of(self, symbol):
+        return shard_for(symbol, self.num_workers)
+
+    # ---- Requests ----
+    def call(self, symbol, method, *args, **kwargs):
+        '''Buffer a call of OrderBook.<method> on symbol's book; returns its index in the next flush().'''
+        index = self.submitted
+        self.pending[self.shard_of(symbol)].append((index, symbol, method, args, kwargs))
+        self.submitted += 1
+        return index
+
+    def submit(self, symbol, quote, from_data=False):
+        return self.call(symbol, 'process_order', quote, from_data)
+
+    def cancel(self, symbol, side, order_id):
+        return self.call(symbol, 'cancel_order', side, order_id)
+
+    def cancel_all(self, symbol, owner):
+        return self.call(symbol, 'cancel_all', owner)
+
+    def flush(self):
+        '''Send one batch per shard, wait for every shard, and return results in submission order.'''
+        results = [None] * self.submitted
+        outstanding = {self._send(shard_id, batch) for shard_id, batch in enumerate(self.pending) if batch}
+        self.pending = [[] for _ in range(self.num_workers)]
+        self.submitted = 0
+        while outstanding:
+            _, payload = self._receive(outstanding)
+            for index, result in pickle.loads(payload):
+                results[index] = result
+        return results
+
+    def process_orders(self, orders, from_data=False):
+        '''Route a sequence of (symbol, quote) pairs and return their results in order.'''
+        for symbol, quote in orders:
+            self.submit(symbol, quote, from_data)
+        return self.flush()
+
+    def stats(self):
+        '''Per shard counters: batches, requests, orders, fills, errors, busy_seconds, symbols, resting_orders.'''
+        outstanding = {self._send(shard_id, None) for shard_id in range(self.num_workers)}
+        shard_stats = [None] * self.num_workers
+        while outstanding:
+            shard_id, stats = self._receive(outstanding)
+            shard_stats[shard_id] = stats
+        return shard_stats
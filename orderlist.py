@@ -1,3 +1,26 @@
+from decimal import Context, MAX_PREC, MAX_EMAX, MIN_EMIN
+
+# Queue offsets are running sums of many quantities. Decimal ones are added
+# in an unbounded context: the global one would round them to its precision.
+_EXACT = Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN)
+_exact_add = _EXACT.add
+_exact_sub = _EXACT.subtract
+
+
+def offset_add(a, b):
+    '''a + b for queue offsets: ints add as usual, Decimals without rounding.'''
+    if type(a) is int and type(b) is int:
+        return a + b
+    return _exact_add(a, b)
+
+
+def offset_sub(a, b):
+    '''a - b for queue offsets: ints subtract as usual, Decimals without rounding.'''
+    if type(a) is int and type(b) is int:
+        return a - b
+    return _exact_sub(a, b)
+
+
 class OrderList(object):
     '''
     A doubly linked list of Orders. Used to iterate through Orders when
@@ -6,6 +29,15 @@ class OrderList(object):
     Order, we may need multiple Orders to fullfill a transaction. The
     OrderList makes this easy to do. OrderList is naturally arranged by time.
     Orders at the front of the list have priority.
+
+    Queue position is tracked with offsets: each Order keeps the running
+    volume up to its own end (queue_end) and its sequence number in the list
+    (queue_seq), and the list keeps the volume and number of orders that
+    left from the front since the offsets were last renormalized. Appends,
+    changes at the head or tail and removals from the front keep them exact
+    in O(1). A removal or a quantity change in the middle marks the list
+    dirty, and the next queue_position() call renormalizes it in one walk.
+    Offsets of Decimal quantities are kept exact (offset_add/offset_sub).
     '''
 
     def __init__(self):
@@ -14,6 +46,9 @@ class OrderList(object):
         self.length = 0 # number of Orders in the list
         self.volume = 0 # sum of Order quantity in the list AKA share volume
         self.last = None # helper for iterating
+        self.front_volume = 0 # volume that left from the front since renormalizing
+        self.front_count = 0 # orders that left from the front since renormalizing
+        self.dirty = False # offsets are stale after a change in the middle
 
     def __len__(self):
         return self.length
@@ -41,6 +76,9 @@ class OrderList(object):
         return self.head_order
 
     def append_order(self, order):
+        # self.volume is rounded to the global Decimal precision, the tail's offset is exact
+        order.queue_end = offset_add(self.tail_order.queue_end if self.length else self.front_volume, order.quantity)
+        order.queue_seq = self.front_count + self.length
         if len(self) == 0:
             order.next_order = None
             order.prev_order = None
@@ -58,7 +96,17 @@ class OrderList(object):
         self.volume -= order.quantity
         self.length -= 1
         if len(self) == 0: # if there are no more Orders, stop/return
+            self.front_volume = 0
+            self.front_count = 0
+            self.dirty = False
             return
+        if order is self.head_order:
+            self.front_volume = offset_add(self.front_volume, order.quantity)
+            self.front_count += 1
+            if self.front_count > self.length:
+                self.dirty = True # keep the offsets small: renormalize, amortized O(1)
+        elif order is not self.tail_order:
+            self.dirty = True
 
         # Remove an Order from the OrderList. First grab next / prev order
         # from the Order we are removing. Then relink everything. Finally
@@ -80,6 +128,7 @@ class OrderList(object):
 
         Check to see that the quantity is larger than existing, update the quantities, then move to tail.
         '''
+        self.dirty = True
         if order.prev_order != None: # This Order is not the first Order in the OrderList
             order.prev_order.next_order = order.next_order # Link the previous Order to the next Order, then move the Order to tail
         else: # This Order is the first Order in the OrderList
@@ -95,6 +144,33 @@ class OrderList(object):
         self.tail_order.next_order = order
         self.tail_order = order
 
+    def renormalize(self):
+        '''Recompute the queue position offsets with one walk of the list.'''
+        running = 0
+        order = self.head_order
+        seq = 0
+        while order is not None:
+            running = offset_add(running, order.quantity)
+            order.queue_end = running
+            order.queue_seq = seq
+            seq += 1
+            order = order.next_order
+        self.front_volume = 0
+        self.front_count = 0
+        self.dirty = False
+
+    def queue_position(self, order):
+        '''(volume ahead of order, number of orders ahead of it) in this list.'''
+        if self.dirty:
+            self.renormalize()
+        quantity = order.quantity
+        if type(quantity) is int:
+            return order.queue_end - quantity - self.front_volume, order.queue_seq - self.front_count
+        volume = _exact_sub(order.queue_end, quantity)
+        if self.front_volume:
+            volume = _exact_sub(volume, self.front_volume)
+        return volume, order.queue_seq - self.front_count
+
     def __str__(self):
         from io import StringIO
 
@@ -1,7 +1,42 @@
+from itertools import islice
 from sortedcontainers import SortedDict
 from orderlist import OrderList
+from decimal import Decimal
 from order import Order
 
+
+class OrderPool(object):
+    '''A free list of Order records.
+
+    Cancelled and filled Orders are handed back to the pool and re-initialised
+    on the next insert instead of being garbage collected, which keeps
+    allocation churn out of cancel-heavy flow. One pool can be shared by both
+    sides of a book.
+    '''
+
+    def __init__(self, max_size=1000000):
+        self.free = []
+        self.max_size = max_size # cap on idle records kept around
+
+    def __len__(self):
+        return len(self.free)
+
+    def acquire(self, timestamp, quantity, price, order_id, trade_id, order_list):
+        if self.free:
+            order = self.free.pop()
+            order.reset(timestamp, quantity, price, order_id, trade_id, order_list)
+            return order
+        return Order(timestamp, quantity, price, order_id, trade_id, order_list)
+
+    def release(self, order):
+        # Drop links so a pooled record does not keep a dead OrderList alive
+        order.next_order = None
+        order.prev_order = None
+        order.order_list = None
+        if len(self.free) < self.max_size:
+            self.free.append(order)
+
+
 class OrderTree(object):
     '''A red-black tree used to store OrderLists in price order
 
@@ -9,13 +44,20 @@ class OrderTree(object):
     Keeping the information in a red black tree makes it easier/faster to detect a match.
     '''
 
-    def __init__(self):
+    def __init__(self, integer_ticks=False, pool=None, side=None):
+        self.integer_ticks = integer_ticks # prices keyed by integer ticks, quantities in integer lots
+        self.pool = pool if pool is not None else OrderPool() # recycles Order records
+        self.side = side # 'bid' trees rank the highest price first, anything else the lowest
         self.price_map = SortedDict() # Dictionary containing price : OrderList object
         self.prices = self.price_map.keys()
         self.order_map = {} # Dictionary containing order_id : Order object
         self.volume = 0 # Contains total quantity from all Orders in tree
         self.num_orders = 0 # Contains count of Orders in tree
         self.depth = 0 # Number of different prices in tree (http://en.wikipedia.org/wiki/Order_book_(trading)#Book_depth)
+        self.top_cache = None # cached [(price, volume), ...] for the best top_n levels, None when stale
+        self.top_n = 0
+        self.top_version = 0 # bumped every time top_cache is patched or dropped
+        self.level_listener = None # optional fn(side, price, new level volume) called on every level change
 
     def __len__(self):
         return len(self.order_map)
@@ -30,6 +72,7 @@ class OrderTree(object):
         self.depth += 1 # Add a price depth level to the tree
         new_list = OrderList()
         self.price_map[price] = new_list
+        return new_list
 
     def remove_price(self, price):
         self.depth -= 1 # Remove a price depth level
@@ -38,43 +81,186 @@ class OrderTree(object):
     def price_exists(self, price):
         return price in self.price_map
 
+    def find_price_list(self, price):
+        '''Return the OrderList at price, or None if the level does not exist.'''
+        return self.price_map.get(price)
+
     def order_exists(self, order):
         return order in self.order_map
 
     def insert_order(self, quote):
-        if self.order_exists(quote['order_id']):
-            self.remove_order_by_id(quote['order_id'])
+        # Convert every field before touching the tree so a bad quote cannot leave an empty level behind
+        order_id = int(quote['order_id'])
+        timestamp = int(quote['timestamp'])
+        if self.integer_ticks:
+            # integer tick mode: price is already in ticks and quantity in lots
+            quantity = quote['quantity']
+            price = quote['price']
+        else:
+            quantity = Decimal(quote['quantity'])
+            price = Decimal(quote['price'])
+        if self.order_exists(order_id):
+            self.remove_order_by_id(order_id)
         self.num_orders += 1
-        if quote['price'] not in self.price_map:
-            self.create_price(quote['price']) # If price not in Price Map, create a node in RBtree
-        order = Order(quote, self.price_map[quote['price']]) # Create an order
-        self.price_map[order.price].append_order(order) # Add the order to the OrderList in Price Map
+        order_list = self.find_price_list(price)
+        if order_list is None:
+            order_list = self.create_price(price) # If price not in Price Map, create a node in RBtree
+        order = self.pool.acquire(timestamp, quantity, price, order_id,
+                                  quote['trade_id'], order_list) # Create (or recycle) an order
+        order_list.append_order(order) # Add the order to the OrderList in Price Map
         self.order_map[order.order_id] = order
-        self.volume += order.quantity
+        self.volume += quantity
+        if self.top_cache is not None:
+            self.level_changed(price, order_list)
+        if self.level_listener is not None:
+            self.level_listener(self.side, price, order_list.volume)
 
     def update_order(self, order_update):
         order = self.order_map[order_update['order_id']]
         original_quantity = order.quantity
         if order_update['price'] != order.price:
-            # Price changed. Remove order and update tree.
-            order_list = self.price_map[order.price]
-            order_list.remove_order(order)
-            if len(order_list) == 0: # If there is nothing else in the OrderList, remove the price from RBtree
-                self.remove_price(order.price)
+            # Price changed. Remove order and re-insert it at the new price level.
+            if 'trade_id' not in order_update:
+                order_update['trade_id'] = order.trade_id
+            self.remove_order_by_id(order.order_id)
             self.insert_order(order_update)
         else:
             # Quantity changed. Price is the same.
             order.update_quantity(order_update['quantity'], order_update['timestamp'])
-        self.volume += order.quantity - original_quantity
+            self.volume += order.quantity - original_quantity
+            if self.top_cache is not None:
+                self.level_changed(order.price, order.order_list)
+            if self.level_listener is not None:
+                self.level_listener(self.side, order.price, order.order_list.volume)
+
+    def reduce_order(self, order, new_quantity):
+        '''Shrink a resting order in place after a partial fill, keeping its queue position.'''
+        self.volume -= order.quantity - new_quantity
+        order.update_quantity(new_quantity, order.timestamp)
+        if self.top_cache is not None:
+            self.level_changed(order.price, order.order_list)
+        if self.level_listener is not None:
+            self.level_listener(self.side, order.price, order.order_list.volume)
 
     def remove_order_by_id(self, order_id):
         self.num_orders -= 1
-        order = self.order_map[order_id]
+        order = self.order_map.pop(order_id)
         self.volume -= order.quantity
-        order.order_list.remove_order(order)
-        if len(order.order_list) == 0:
+        order_list = order.order_list
+        order_list.remove_order(order)
+        if len(order_list) == 0:
             self.remove_price(order.price)
-        del self.order_map[order_id]
+        if self.top_cache is not None:
+            self.level_changed(order.price, order_list)
+        if self.level_listener is not None:
+            self.level_listener(self.side, order.price, order_list.volume if len(order_list) > 0 else 0)
+        self.pool.release(order)
+
+    def remove_orders(self, order_ids):
+        '''Remove several orders at once.
+
+        Orders are unlinked first; each level they touched is then checked
+        once, so emptied levels are dropped together and the depth cache and
+        level listener see one change per level rather than one per order.
+        '''
+        order_map = self.order_map
+        release = self.pool.release
+        touched = {} # price : OrderList
+        for order_id in order_ids:
+            order = order_map.pop(order_id)
+            self.volume -= order.quantity
+            order_list = order.order_list
+            order_list.remove_order(order)
+            touched[order.price] = order_list
+            release(order)
+        self.num_orders -= len(order_ids)
+        for price, order_list in touched.items():
+            remaining = len(order_list)
+            if remaining == 0:
+                self.remove_price(price)
+            if self.top_cache is not None:
+                self.level_changed(price, order_list)
+            if self.level_listener is not None:
+                self.level_listener(self.side, price, order_list.volume if remaining > 0 else 0)
+
+    # ---- Bulk restore ----
+    def clear(self):
+        self.price_map = SortedDict()
+        self.prices = self.price_map.keys()
+        self.order_map = {}
+        self.volume = 0
+        self.num_orders = 0
+        self.depth = 0
+        self.top_cache = None
+        self.top_version += 1
+
+    def restore_levels(self, levels):
+        '''Replace the tree contents with levels of (price, volume, order_ids, quantities, timestamps, trade_ids).
+
+        Each level's columns are in FIFO order and volume is the level's
+        aggregate quantity. Orders are linked directly into their OrderLists
+        instead of going through insert_order.
+        '''
+        self.clear()
+        acquire = self.pool.acquire
+        order_map = self.order_map
+        for price, volume, order_ids, quantities, timestamps, trade_ids in levels:
+            order_list = self.create_price(price)
+            prev_order = None
+            for order_id, quantity, timestamp, trade_id in zip(order_ids, quantities, timestamps, trade_ids):
+                order = acquire(timestamp, quantity, price, order_id, trade_id, order_list)
+                if prev_order is None:
+                    order_list.head_order = order
+                else:
+                    prev_order.next_order = order
+                    order.prev_order = prev_order
+                prev_order = order
+                order_map[order_id] = order
+            order_list.tail_order = prev_order
+            order_list.length = len(order_ids)
+            order_list.volume = volume
+            order_list.dirty = True # queue position offsets are set on the first query
+            self.volume += volume
+        self.num_orders = len(order_map)
+
+    # ---- Top of book depth cache ----
+    def iter_levels(self):
+        '''Iterate (price, OrderList) from the best price outwards.'''
+        if self.side == 'bid':
+            return reversed(self.price_map.items())
+        return iter(self.price_map.items())
+
+    def get_depth(self, n):
+        '''Best n levels as a list of (price, volume), best first.
+
+        The list is cached and only patched or rebuilt when a change touches
+        the top n levels, so repeated reads between updates are free. It is
+        shared with the cache: copy it if you need a snapshot.
+        '''
+        if self.top_cache is None or self.top_n != n:
+            self.top_n = n
+            self.top_cache = [(price, order_list.volume) for price, order_list in islice(self.iter_levels(), n)]
+            self.top_version += 1
+        return self.top_cache
+
+    def level_changed(self, price, order_list):
+        '''Patch or drop the depth cache after the level at price changed.'''
+        cache = self.top_cache
+        if cache and len(cache) >= self.top_n:
+            # Window is full: changes behind the worst cached level do not matter
+            edge = cache[-1][0]
+            if (price < edge) if self.side == 'bid' else (price > edge):
+                return
+        for i, (level_price, _) in enumerate(cache):
+            if level_price == price:
+                if len(order_list) > 0:
+                    cache[i] = (price, order_list.volume) # volume change on a cached level
+                    self.top_version += 1
+                    return
+                break
+        # A level appeared in or vanished from the window: rebuild on next read
+        self.top_cache = None
+        self.top_version += 1
 
     def max_price(self):
         if self.depth > 0:
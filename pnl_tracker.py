@@ -1,23 +1,44 @@
-from typing import Dict, List, Tuple, Optional
+from typing import Deque, Dict, List, Tuple, Optional
+from collections import deque
 import time
 
+try:
+    import numpy as np  # only needed for the batch methods (record_trades / mark_to_market)
+except ImportError:
+    np = None
+
+EPSILON = 0.00001 # float tolerance for matching lot quantities
+
 class PnLTracker:
     """
     This class tracks my profit and loss from trading.
     It uses FIFO (First In, First Out) accounting to calculate realized P&L.
     It automatically handles long and short positions!
+
+    Open lots are kept in deques (oldest first) together with running
+    totals of their quantity and cost, so recording a trade and pricing
+    the open position are O(1) per lot touched. Pass verbose=False to
+    skip all the per-trade printing, e.g. for long simulations.
     """
     
-    def __init__(self):
-        # These lists store my positions
-        self.long_positions: List[Tuple[float, float]] = []   # Long positions: (price, quantity)
-        self.short_positions: List[Tuple[float, float]] = []  # Short positions: (price, quantity)
+    def __init__(self, verbose: bool = True):
+        # These deques store my positions, oldest lot first
+        self.long_positions: Deque[Tuple[float, float]] = deque()   # Long positions: (price, quantity)
+        self.short_positions: Deque[Tuple[float, float]] = deque()  # Short positions: (price, quantity)
+
+        # Running totals over the open lots
+        self.long_quantity: float = 0.0   # Sum of long lot quantities
+        self.long_cost: float = 0.0       # Sum of price * quantity over long lots
+        self.short_quantity: float = 0.0  # Sum of short lot quantities
+        self.short_cost: float = 0.0      # Sum of price * quantity over short lots
         
         # P&L tracking
         self.realized_pnl: float = 0.0  # Money I've actually made/lost
         self.cash_flow: float = 0.0     # Net cash in/out
         self.inventory: float = 0.0     # Current position (positive = long, negative = short)
         self.total_trades: int = 0      # Count of all trades
+        self.verbose = verbose          # Print every trade and the open lots
+        self.batch = None               # Cumulative unit curves of the last record_trades() call
 
     def record_trade(self, price: float, quantity: float, side: str):
         """
@@ -27,8 +48,11 @@ class PnLTracker:
         # Ensure price and quantity are floats for PnLTracker's internal calculations
         price = float(price)
         quantity = float(quantity)
+        verbose = self.verbose
+        self.batch = None  # mark_to_market() now values the current lots
 
-        print(f"Recording trade: {side.upper()} {quantity:.2f} shares @ ${price:.2f}")
+        if verbose:
+            print(f"Recording trade: {side.upper()} {quantity:.2f} shares @ ${price:.2f}")
         self.total_trades += 1
         
         if side.lower() == 'buy':
@@ -36,74 +60,240 @@ class PnLTracker:
             self.inventory += quantity
             self.cash_flow -= price * quantity  # Cash goes out
             
-            # First, check if I'm covering any short positions
-            remaining_quantity = quantity
-            while remaining_quantity > 0.00001 and self.short_positions: # Use a small epsilon for float comparison
-                short_price, short_qty = self.short_positions[0]  # Get oldest short position
-                matched_qty = min(remaining_quantity, short_qty)
-                
-                # Calculate P&L for covering short: (short_price - buy_price) * quantity
-                pnl_from_this_match = (short_price - price) * matched_qty
-                self.realized_pnl += pnl_from_this_match
-                
-                print(f"   -> Covering short position: {matched_qty:.2f} @ ${short_price:.2f} with buy @ ${price:.2f}")
-                print(f"   -> P&L from this: ${pnl_from_this_match:.2f}")
-                
-                # Update or remove the short position
-                if abs(matched_qty - short_qty) < 0.00001: # Use epsilon for float comparison
-                    self.short_positions.pop(0)  # Remove this short position completely
-                else:
-                    self.short_positions[0] = (short_price, short_qty - matched_qty)
-                
-                remaining_quantity -= matched_qty
-            
-            # If there's still quantity left, add it as a new long position
-            if remaining_quantity > 0.00001: # Use epsilon
+            # First, cover any short positions, then add what is left as a new long position
+            remaining_quantity = self._close_lots(self.short_positions, price, quantity, -1.0)
+            if remaining_quantity > EPSILON:
                 self.long_positions.append((price, remaining_quantity))
-                print(f"   -> Added new long position: {remaining_quantity:.2f} @ ${price:.2f}")
+                self.long_quantity += remaining_quantity
+                self.long_cost += price * remaining_quantity
+                if verbose:
+                    print(f"   -> Added new long position: {remaining_quantity:.2f} @ ${price:.2f}")
             
-            print(f"   -> Cash outflow: ${price * quantity:.2f} (total cash flow: ${self.cash_flow:.2f})")
-            print(f"   -> Inventory change: +{quantity:.2f} = {self.inventory:.2f}")
+            if verbose:
+                print(f"   -> Cash outflow: ${price * quantity:.2f} (total cash flow: ${self.cash_flow:.2f})")
+                print(f"   -> Inventory change: +{quantity:.2f} = {self.inventory:.2f}")
             
         elif side.lower() == 'sell':
             # I'm selling shares
             self.inventory -= quantity
             self.cash_flow += price * quantity  # Cash comes in
             
-            # First, check if I'm closing any long positions
-            remaining_quantity = quantity
-            while remaining_quantity > 0.00001 and self.long_positions: # Use epsilon
-                long_price, long_qty = self.long_positions[0]  # Get oldest long position
-                matched_qty = min(remaining_quantity, long_qty)
-                
-                # Calculate P&L for closing long: (sell_price - long_price) * quantity
-                pnl_from_this_match = (price - long_price) * matched_qty
-                self.realized_pnl += pnl_from_this_match
-                
-                print(f"   -> Closing long position: {matched_qty:.2f} @ ${long_price:.2f} with sell @ ${price:.2f}")
-                print(f"   -> P&L from this: ${pnl_from_this_match:.2f}")
-                
-                # Update or remove the long position
-                if abs(matched_qty - long_qty) < 0.00001: # Use epsilon
-                    self.long_positions.pop(0)  # Remove this long position completely
-                else:
-                    self.long_positions[0] = (long_price, long_qty - matched_qty)
-                
-                remaining_quantity -= matched_qty
-            
-            # If there's still quantity left, add it as a new short position
-            if remaining_quantity > 0.00001: # Use epsilon
+            # First, close any long positions, then add what is left as a new short position
+            remaining_quantity = self._close_lots(self.long_positions, price, quantity, 1.0)
+            if remaining_quantity > EPSILON:
                 self.short_positions.append((price, remaining_quantity))
-                print(f"   -> Added new short position: {remaining_quantity:.2f} @ ${price:.2f}")
+                self.short_quantity += remaining_quantity
+                self.short_cost += price * remaining_quantity
+                if verbose:
+                    print(f"   -> Added new short position: {remaining_quantity:.2f} @ ${price:.2f}")
             
-            print(f"   -> Cash inflow: ${price * quantity:.2f} (total cash flow: ${self.cash_flow:.2f})")
-            print(f"   -> Inventory change: -{quantity:.2f} = {self.inventory:.2f}")
+            if verbose:
+                print(f"   -> Cash inflow: ${price * quantity:.2f} (total cash flow: ${self.cash_flow:.2f})")
+                print(f"   -> Inventory change: -{quantity:.2f} = {self.inventory:.2f}")
         
-        # Print current state for debugging
-        print(f"   -> Current long positions: {self.long_positions}")
-        print(f"   -> Current short positions: {self.short_positions}")
-        print(f"   -> Total realized P&L: ${self.realized_pnl:.2f}")
-        print()  # Empty line for readability
+        if verbose:
+            # Print current state for debugging
+            print(f"   -> Current long positions: {list(self.long_positions)}")
+            print(f"   -> Current short positions: {list(self.short_positions)}")
+            print(f"   -> Total realized P&L: ${self.realized_pnl:.2f}")
+            print()  # Empty line for readability
+
+    def _close_lots(self, lots: Deque[Tuple[float, float]], price: float, quantity: float, sign: float) -> float:
+        """
+        Match quantity against the oldest opposite lots (FIFO) and book the realized P&L.
+        sign is +1 when closing longs with a sell and -1 when covering shorts with a buy.
+        Returns the quantity left over after all matching lots are used up.
+        """
+        remaining_quantity = quantity
+        matched_total = 0.0
+        matched_cost = 0.0
+        while remaining_quantity > EPSILON and lots: # Use a small epsilon for float comparison
+            lot_price, lot_qty = lots[0]  # Get oldest lot
+            matched_qty = min(remaining_quantity, lot_qty)
+            
+            # Closing long: (sell_price - long_price) * quantity, covering short: (short_price - buy_price) * quantity
+            if sign > 0:
+                pnl_from_this_match = (price - lot_price) * matched_qty
+            else:
+                pnl_from_this_match = (lot_price - price) * matched_qty
+            self.realized_pnl += pnl_from_this_match
+            matched_total += matched_qty
+            matched_cost += lot_price * matched_qty
+            
+            if self.verbose:
+                action = "Closing long" if sign > 0 else "Covering short"
+                trade = "sell" if sign > 0 else "buy"
+                print(f"   -> {action} position: {matched_qty:.2f} @ ${lot_price:.2f} with {trade} @ ${price:.2f}")
+                print(f"   -> P&L from this: ${pnl_from_this_match:.2f}")
+            
+            # Update or remove the lot
+            if abs(matched_qty - lot_qty) < EPSILON:
+                lots.popleft()  # Remove this lot completely
+            else:
+                lots[0] = (lot_price, lot_qty - matched_qty)
+            
+            remaining_quantity -= matched_qty
+
+        if matched_total:
+            if sign > 0:
+                self.long_quantity -= matched_total
+                self.long_cost -= matched_cost
+            else:
+                self.short_quantity -= matched_total
+                self.short_cost -= matched_cost
+            if not lots:
+                # Start the next position from exact zeros instead of accumulated float error
+                if sign > 0:
+                    self.long_quantity = self.long_cost = 0.0
+                else:
+                    self.short_quantity = self.short_cost = 0.0
+        return remaining_quantity
+
+    # ---- Batch (NumPy) ----
+    def record_trades(self, prices, quantities, sides) -> Dict:
+        """
+        Record a whole array of trades in one vectorized pass (needs NumPy).
+        sides holds 'buy'/'sell' strings or signs (> 0 = buy).
+
+        Under FIFO the k-th unit bought is always matched with the k-th unit
+        sold, whichever side was open first. So realized P&L after each trade
+        is the notional of the first min(bought, sold) units sold minus that
+        of the same units bought. Both are read off cumulative notional curves
+        with np.interp. The end state (lots, aggregates, totals) is the same
+        as calling record_trade() for each trade, up to float rounding.
+
+        Returns per-trade series: inventory, cash_flow and realized_pnl.
+        """
+        if np is None:
+            raise ImportError("record_trades needs numpy (pip install numpy)")
+        prices = np.asarray(prices, dtype=float)
+        quantities = np.asarray(quantities, dtype=float)
+        sides = np.asarray(sides)
+        if sides.dtype.kind in 'US':
+            is_buy = np.char.lower(sides) == 'buy'
+        else:
+            is_buy = sides > 0
+
+        batch = self._batch_curves(prices[is_buy], quantities[is_buy], prices[~is_buy], quantities[~is_buy])
+        buy_xp, buy_fp, sell_xp, sell_fp = batch['curves']
+
+        # Units bought / sold up to and including each trade (plus the lots already open)
+        bought = batch['bought'][0] + np.cumsum(np.where(is_buy, quantities, 0.0))
+        sold = batch['sold'][0] + np.cumsum(np.where(is_buy, 0.0, quantities))
+        matched = np.minimum(bought, sold)
+        realized = self.realized_pnl + np.interp(matched, sell_xp, sell_fp) - np.interp(matched, buy_xp, buy_fp)
+        inventory = self.inventory + np.cumsum(np.where(is_buy, quantities, -quantities))
+        cash_flow = self.cash_flow + np.cumsum(np.where(is_buy, -prices * quantities, prices * quantities))
+
+        batch['bought'] = np.concatenate((batch['bought'], bought))
+        batch['sold'] = np.concatenate((batch['sold'], sold))
+        batch['realized'] = np.concatenate(([self.realized_pnl], realized))
+        if len(prices):
+            self.realized_pnl = float(realized[-1])
+            self.inventory = float(inventory[-1])
+            self.cash_flow = float(cash_flow[-1])
+            self.total_trades += len(prices)
+            self._rebuild_lots(batch)
+        self.batch = batch
+        return {"inventory": inventory, "cash_flow": cash_flow, "realized_pnl": realized}
+
+    def mark_to_market(self, price_series, trade_counts=None) -> Dict:
+        """
+        Value the position at every price of price_series in one vectorized pass.
+
+        trade_counts[i] is how many trades of the last record_trades() batch
+        had happened when price_series[i] was observed (e.g. np.searchsorted
+        of the trade times with the tick times, side='right'). By default
+        price_series[i] marks the position right after trade i. Without a
+        batch, the current open lots are valued at every price.
+
+        Returns realized_pnl, unrealized_pnl and total_pnl series.
+        """
+        if np is None:
+            raise ImportError("mark_to_market needs numpy (pip install numpy)")
+        marks = np.asarray(price_series, dtype=float)
+        batch = self.batch
+        if batch is None:
+            batch = self._batch_curves(np.empty(0), np.empty(0), np.empty(0), np.empty(0))
+            batch['realized'] = np.array([self.realized_pnl])
+            index = np.zeros(len(marks), dtype=np.intp)
+        elif trade_counts is None:
+            if len(marks) != len(batch['bought']) - 1:
+                raise ValueError("price_series needs one price per trade of the last batch, or pass trade_counts")
+            index = np.arange(1, len(marks) + 1)
+        else:
+            index = np.asarray(trade_counts, dtype=np.intp)
+        buy_xp, buy_fp, sell_xp, sell_fp = batch['curves']
+
+        bought = batch['bought'][index]
+        sold = batch['sold'][index]
+        realized = batch['realized'][index]
+        # Long: the open units are bought units (sold, bought], short: sold units (bought, sold]
+        long_cost = np.interp(bought, buy_xp, buy_fp) - np.interp(sold, buy_xp, buy_fp)
+        short_cost = np.interp(sold, sell_xp, sell_fp) - np.interp(bought, sell_xp, sell_fp)
+        unrealized = np.where(bought >= sold,
+                              (bought - sold) * marks - long_cost,
+                              short_cost - (sold - bought) * marks)
+        return {"realized_pnl": realized, "unrealized_pnl": unrealized, "total_pnl": realized + unrealized}
+
+    def _batch_curves(self, buy_prices, buy_quantities, sell_prices, sell_quantities) -> Dict:
+        """
+        Cumulative (units, notional) curves of the open lots followed by the new buys / sells.
+        Open lots come first, since FIFO matches them before anything in the batch.
+        """
+        long_prices, long_quantities = self._lot_arrays(self.long_positions)
+        short_prices, short_quantities = self._lot_arrays(self.short_positions)
+        buy_prices = np.concatenate((long_prices, buy_prices))
+        buy_quantities = np.concatenate((long_quantities, buy_quantities))
+        sell_prices = np.concatenate((short_prices, sell_prices))
+        sell_quantities = np.concatenate((short_quantities, sell_quantities))
+        buy_xp = np.concatenate(([0.0], np.cumsum(buy_quantities)))
+        sell_xp = np.concatenate(([0.0], np.cumsum(sell_quantities)))
+        return {
+            "curves": (buy_xp, np.concatenate(([0.0], np.cumsum(buy_prices * buy_quantities))),
+                       sell_xp, np.concatenate(([0.0], np.cumsum(sell_prices * sell_quantities)))),
+            "lots": (buy_prices, buy_quantities, sell_prices, sell_quantities),
+            "bought": np.array([buy_xp[len(long_quantities)]]),
+            "sold": np.array([sell_xp[len(short_quantities)]]),
+        }
+
+    @staticmethod
+    def _lot_arrays(lots):
+        if not lots:
+            return np.empty(0), np.empty(0)
+        lot_prices, lot_quantities = zip(*lots)
+        return np.array(lot_prices, dtype=float), np.array(lot_quantities, dtype=float)
+
+    def _rebuild_lots(self, batch):
+        """Rebuild the open lot deques and running aggregates after a batch."""
+        buy_prices, buy_quantities, sell_prices, sell_quantities = batch['lots']
+        buy_xp, _, sell_xp, _ = batch['curves']
+        bought = batch['bought'][-1]
+        sold = batch['sold'][-1]
+        self.long_positions = deque()
+        self.short_positions = deque()
+        self.long_quantity = self.long_cost = 0.0
+        self.short_quantity = self.short_cost = 0.0
+        if bought - sold > EPSILON:
+            lots, lot_prices, ends, consumed = self.long_positions, buy_prices, buy_xp[1:], sold
+        elif sold - bought > EPSILON:
+            lots, lot_prices, ends, consumed = self.short_positions, sell_prices, sell_xp[1:], bought
+        else:
+            return
+        # The first lot that is not fully matched may be partially consumed
+        first = np.searchsorted(ends, consumed, side='right')
+        open_prices = lot_prices[first:]
+        open_quantities = np.diff(np.concatenate(([consumed], ends[first:])))
+        keep = open_quantities > EPSILON
+        open_prices = open_prices[keep]
+        open_quantities = open_quantities[keep]
+        lots.extend(zip(open_prices.tolist(), open_quantities.tolist()))
+        if lots is self.long_positions:
+            self.long_quantity = float(open_quantities.sum())
+            self.long_cost = float(open_prices @ open_quantities)
+        else:
+            self.short_quantity = float(open_quantities.sum())
+            self.short_cost = float(open_prices @ open_quantities)
 
     def get_summary(self) -> Dict:
         """
@@ -124,17 +314,11 @@ class PnLTracker:
         Calculate unrealized P&L based on current market price
         This shows how much money I would make/lose if I closed all positions now
         """
-        unrealized = 0.0
-        
-        # Calculate unrealized P&L for long positions
-        for long_price, long_qty in self.long_positions:
-            unrealized += (current_price - long_price) * long_qty
-        
-        # Calculate unrealized P&L for short positions
-        for short_price, short_qty in self.short_positions:
-            unrealized += (short_price - current_price) * short_qty
-        
-        return unrealized
+        # Ensure the price is a float, e.g. a Decimal best bid/ask straight from the OrderBook
+        current_price = float(current_price)
+        # Long lots gain (price - cost) per unit, short lots gain (cost - price) per unit
+        return (current_price * self.long_quantity - self.long_cost) + \
+               (self.short_cost - current_price * self.short_quantity)
 
     def get_total_pnl(self, current_price: float) -> float:
         """
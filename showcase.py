@@ -1,85 +1,72 @@
 import asyncio
+import argparse
 import json
+import urllib.request
 import websockets
 from decimal import Decimal
-from collections import defaultdict
 from OrderBook import OrderBook
-from OrderBook import OrderTree
+from feed import DepthFeedHandler, FeedRecorder
 
-# Binance local snapshot storage
-bids = defaultdict(Decimal)
-asks = defaultdict(Decimal)
-
-# Your own order matching engine
+# Your own order matching engine, mirroring the Binance book
 ob = OrderBook(symbol='BTC/USDT', tick_size=Decimal('0.01'))
+feed = DepthFeedHandler(ob)
 
 def print_binance_book():
     print("\n==== Binance Order Book ====")
-    top_bids = sorted(bids.items(), key=lambda x: x[0], reverse=True)[:5]
-    top_asks = sorted(asks.items(), key=lambda x: x[0])[:5]
+    depth = ob.get_depth(5)  # cached top of book, no sorting
     print("Bids:")
-    for price, qty in top_bids:
+    for price, qty in depth['bids']:
         print(f"  {price} -> {qty}")
     print("Asks:")
-    for price, qty in top_asks:
+    for price, qty in depth['asks']:
         print(f"  {price} -> {qty}")
 
-async def binance_order_book(symbol="btcusdt"):
-    ws_url = f"wss://stream.binance.com:9443/ws/{symbol}@depth20@100ms"
+def fetch_snapshot(symbol, limit=1000):
+    url = f"https://api.binance.com/api/v3/depth?symbol={symbol.upper()}&limit={limit}"
+    with urllib.request.urlopen(url) as response:
+        return json.loads(response.read())
+
+async def binance_order_book(symbol="btcusdt", max_messages=5, recorder=None):
+    """Mirror the Binance book; max_messages=0 runs until interrupted. A FeedRecorder gets every raw message."""
+    ws_url = f"wss://stream.binance.com:9443/ws/{symbol}@depth@100ms"
 
     async with websockets.connect(ws_url) as websocket:
-        print(f"Connected to Binance order book stream for {symbol.upper()}.")
+        print(f"Connected to Binance diff depth stream for {symbol.upper()}.")
         message_count = 0
-        max_messages = 5  # adjust this as you want
 
-        while message_count < max_messages:
+        while not max_messages or message_count < max_messages:
             message = await websocket.recv()
             data = json.loads(message)
+            if not feed.synced:
+                # Start (or restart after a sequence gap) from a REST snapshot; the stream keeps buffering meanwhile
+                snapshot = await asyncio.get_running_loop().run_in_executor(None, fetch_snapshot, symbol)
+                if recorder is not None:
+                    recorder.write(snapshot)  # recorded ahead of the diff, so a replay resyncs at the same point
+                feed.load_snapshot(snapshot)
+                print(f"Loaded snapshot {feed.last_update_id}")
+            if recorder is not None:
+                recorder.write(message)
+            if not feed.apply(data):
+                continue  # stale, or a gap: resync on the next message
             message_count += 1
-            bids_list = data.get('bids', [])
-            asks_list = data.get('asks', [])
-            bids.clear()
-            asks.clear()
-
-            # Build new snapshot
-            for price_str, qty_str in bids_list:
-                price = Decimal(price_str)
-                qty = Decimal(qty_str)
-                if qty > 0:
-                    bids[price] = qty
-
-            for price_str, qty_str in asks_list:
-                price = Decimal(price_str)
-                qty = Decimal(qty_str)
-                if qty > 0:
-                    asks[price] = qty
-
-            
-            ob.bids = OrderTree()
-            ob.asks = OrderTree()
 
-
-            for price, qty in bids.items():
-                ob.process_order({
-                    'type': 'limit',
-                    'side': 'bid',
-                    'price': price,
-                    'quantity': qty,
-                    'trade_id': 'binance'
-                }, from_data=False, verbose=False)
-
-            for price, qty in asks.items():
-                ob.process_order({
-                    'type': 'limit',
-                    'side': 'ask',
-                    'price': price,
-                    'quantity': qty,
-                    'trade_id': 'binance'
-                }, from_data=False, verbose=False)
-
-            # Print both books
             print_binance_book()
-            print("\n==== Your Internal OrderBook ====")
-            print(ob)
+            print(f"Update {feed.last_update_id}: {len(data['b'])} bid / {len(data['a'])} ask levels changed, "
+                  f"depth {ob.bids.depth}/{ob.asks.depth}, gaps {feed.gaps}")
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description="Mirror the Binance order book into the local OrderBook")
+    p.add_argument('--symbol', type=str, default='btcusdt')
+    p.add_argument('--messages', type=int, default=5, help='updates to apply before stopping (0: run until interrupted)')
+    p.add_argument('--record', type=str, help='record the raw feed to this file (replay with python feed.py FILE)')
+    args = p.parse_args()
 
-asyncio.run(binance_order_book())
+    recorder = FeedRecorder(args.record) if args.record else None
+    try:
+        asyncio.run(binance_order_book(args.symbol, args.messages, recorder))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if recorder is not None:
+            recorder.close()
+            print(f"Recorded {recorder.count} messages to {args.record}")
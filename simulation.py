@@ -1,10 +1,15 @@
 import time
+import heapq
+import asyncio
 import random
 import threading
 import argparse
 import json
 from dataclasses import dataclass
+from typing import Optional
 from OrderBook import OrderBook
+from tape import TradeTape
+from eventbus import EventBus, AsyncEventBus
 from decimal import Decimal
 
 @dataclass
@@ -19,88 +24,65 @@ class Config:
     depth: int = 5
     min_size: float = 1.0
     max_size: float = 10.0
+    seed: Optional[int] = None
 
 class Simulator:
-    def __init__(self, config: Config):
+    MM_REFRESH = 5.0  # seconds between market maker refreshes
+    TICK = 0.1        # seconds between market data updates
+    MM_OWNER = 'mm'   # owner of the market maker quotes in the book
+
+    def __init__(self, config: Config, bus: Optional[EventBus] = None):
         self.cfg = config
-        self.book = OrderBook()
+        self.rng = random.Random(config.seed)  # per-simulator RNG so seeded runs are reproducible
+        self.book = OrderBook(tape=TradeTape(trade_window=10))  # VWAP over the last 10 trades
         self.price = Decimal(str(config.base_price))
         self.history = [float(self.price)]
         self.running = False
         self.thread = None
-        self.callbacks = []
-        self.order_counter = 0
-        self.order_id_counter = 0
+        self.bus = bus if bus is not None else EventBus()  # callbacks run on the bus consumer thread
+        self.last_market_data = None  # (price, best_bid, best_ask) last published
 
     def add_callback(self, fn):
-        self.callbacks.append(fn)
+        """Receive every event as fn(event, data)"""
+        self.bus.subscribe(fn)
+
+    def subscribe(self, fn, events=None, batch=False):
+        """Receive only the given event types ('trade', 'order', 'market_data'), optionally in batches"""
+        return self.bus.subscribe(fn, events, batch)
 
     def _notify(self, event: str, data: dict):
-        for fn in self.callbacks:
-            try: 
-                fn(event, data)
-            except Exception as e: 
-                print(f"Error in callback for event {event}: {e}")
+        self.bus.publish(event, data)
 
     def _market_maker(self):
-        """Place market maker orders around current price"""
+        """Requote the market maker ladder around current price, sending only the levels that changed"""
         half_spread = Decimal(str(self.cfg.spread)) * self.price / 2
+        bids, asks = [], []
         
         for i in range(self.cfg.depth):
             offset = half_spread * Decimal(str(1 + i * 0.5))
-            qty = round(random.uniform(self.cfg.min_size, self.cfg.max_size), 4)
-            
-            # Place bid order
-            bid_price = (self.price - offset).quantize(Decimal('0.0001'))
-            self.order_counter += 1
-            bid_order = {
-                'order_id': f"mm_bid_{self.order_counter}",
-                'type': 'limit',
-                'side': 'bid',
-                'quantity': qty,
-                'order_id': self.order_id_counter,
-                'price': bid_price
-            }
-            
-            try:
-                trades, _ = self.book.process_order(bid_order, verbose=False)
-                # Removed trade notification here
-            except Exception as e:
-                print(f"Market maker bid order failed: {e}")
-            
-            # Place ask order
-            ask_price = (self.price + offset).quantize(Decimal('0.0001'))
-            self.order_counter += 1
-            ask_order = {
-                'order_id': f"mm_ask_{self.order_counter}",
-                'type': 'limit',
-                'side': 'ask',
-                'quantity': qty,
-                'order_id': self.order_id_counter,
-                'price': ask_price
-            }
-            
-            try:
-                trades, _ = self.book.process_order(ask_order, verbose=False)
-                # Removed trade notification here
-            except Exception as e:
-                print(f"Market maker ask order failed: {e}")
+            qty = round(self.rng.uniform(self.cfg.min_size, self.cfg.max_size), 4)
+            bids.append(((self.price - offset).quantize(Decimal('0.0001')), qty))
+            asks.append(((self.price + offset).quantize(Decimal('0.0001')), qty))
+        
+        try:
+            # Book-assigned ids, so the maker's quotes never collide with each other in the order maps
+            self.book.replace_ladder(self.MM_OWNER, bids, asks)
+        except Exception as e:
+            print(f"Market maker requote failed: {e}")
 
     def _random_order(self):
         """Generate random market participant order"""
-        is_mkt = random.random() < self.cfg.market_ratio
-        side = 'bid' if random.random() < (0.5 + self.cfg.trend * 0.3) else 'ask'
-        qty = round(random.uniform(self.cfg.min_size, self.cfg.max_size), 4)
-        self.order_id_counter += 1
-        order = {
-            'order_id': f"random_{side}_{self.order_id_counter}",
+        is_mkt = self.rng.random() < self.cfg.market_ratio
+        side = 'bid' if self.rng.random() < (0.5 + self.cfg.trend * 0.3) else 'ask'
+        qty = round(self.rng.uniform(self.cfg.min_size, self.cfg.max_size), 4)
+        order = {  # no order_id: the book assigns integer ids, which resting orders need
             'type': 'market' if is_mkt else 'limit',
             'side': side,
             'quantity': qty
         }
 
         if not is_mkt:
-            shift = Decimal(str(random.uniform(0, self.cfg.volatility * float(self.price))))
+            shift = Decimal(str(self.rng.uniform(0, self.cfg.volatility * float(self.price))))
             price = self.price - shift if side == 'bid' else self.price + shift
             order['price'] = price.quantize(Decimal('0.0001'))
 
@@ -108,15 +90,12 @@ class Simulator:
 
     def _update_price(self):
         """Update price based on recent trades and add random walk"""
-        if hasattr(self.book, 'tape') and self.book.tape:
-            recent = list(self.book.tape)[-10:]
-            if recent:
-                vol = sum(t.get('quantity', Decimal('0')) for t in recent)
-                if vol > Decimal('0'):
-                    vwap = sum(t.get('price', Decimal('0')) * t.get('quantity', Decimal('0')) for t in recent) / vol
-                    self.price = (Decimal('0.9') * self.price + Decimal('0.1') * vwap).quantize(Decimal('0.0001'))
+        vwap = self.book.tape.last_n.vwap()  # rolling, O(1) per trade
+        if vwap is not None:
+            vwap = Decimal(str(vwap))
+            self.price = (Decimal('0.9') * self.price + Decimal('0.1') * vwap).quantize(Decimal('0.0001'))
         
-        random_walk_amount = Decimal(str(random.gauss(0, self.cfg.volatility * float(self.price) * 0.1)))
+        random_walk_amount = Decimal(str(self.rng.gauss(0, self.cfg.volatility * float(self.price) * 0.1)))
         self.price = (self.price + random_walk_amount).quantize(Decimal('0.0001'))
         self.price = max(Decimal('0.01'), self.price)
         self.history.append(float(self.price))
@@ -134,11 +113,50 @@ class Simulator:
         ask = self.book.get_best_ask()
         return float(ask) if ask is not None else None
 
+    def _on_order(self):
+        """Order arrival: submit one random participant order"""
+        order = self._random_order()
+        try:
+            trades, _ = self.book.process_order(order, verbose=False)
+            if trades: 
+                if self.bus.wants("trade"):
+                    self._notify("trade", {"trades": trades})
+                self._update_price() 
+            if self.bus.wants("order"):
+                self._notify("order", {"order": order})
+        except Exception as e:
+            pass  # Silently handle order failures
+
+    def _on_mm_refresh(self):
+        """Refresh market maker orders when the book runs thin"""
+        try:
+            total_orders_in_book = self.book.bids.num_orders + self.book.asks.num_orders
+            if total_orders_in_book < (self.cfg.depth * 2 * 2):
+                self._market_maker()
+        except Exception as e:
+            print(f"Error during market maker refresh: {e}")
+            self._market_maker()
+
+    def _on_market_data(self, now):
+        """Send a market data update when price or top of book changed since the last one"""
+        if not self.bus.wants("market_data"):
+            return
+        state = (float(self.price), self._get_best_bid(), self._get_best_ask())
+        if state == self.last_market_data:
+            return
+        self.last_market_data = state
+        self._notify("market_data", {
+            "price": state[0],
+            "best_bid": state[1],
+            "best_ask": state[2],
+            "timestamp": now
+        })
+
     def _loop(self):
         """Main simulation loop"""
         start = time.time()
         next_order = start
-        next_mm = start + 5  # Market maker refresh every 5 seconds
+        next_mm = start + self.MM_REFRESH  # Market maker refresh every 5 seconds
         
         # Initial market making
         print("Placing initial market maker orders...")
@@ -149,41 +167,68 @@ class Simulator:
             
             # Generate random orders
             if now >= next_order:
-                order = self._random_order()
-                try:
-                    trades, _ = self.book.process_order(order, verbose=False)
-                    if trades: 
-                        self._notify("trade", {"trades": trades})
-                        self._update_price() 
-                    self._notify("order", {"order": order})
-                except Exception as e:
-                    pass  # Silently handle order failures
-                
-                next_order = now + random.expovariate(self.cfg.order_rate)
+                self._on_order()
+                next_order = now + self.rng.expovariate(self.cfg.order_rate)
             
             # Refresh market maker orders
             if now >= next_mm:
-                try:
-                    total_orders_in_book = self.book.bids.num_orders + self.book.asks.num_orders
-                    if total_orders_in_book < (self.cfg.depth * 2 * 2):
-                        self._market_maker()
-                except Exception as e:
-                    print(f"Error during market maker refresh: {e}")
-                    self._market_maker()
-                next_mm = now + 5
+                self._on_mm_refresh()
+                next_mm = now + self.MM_REFRESH
             
-            # Send market data update
-            self._notify("market_data", {
-                "price": float(self.price),
-                "best_bid": self._get_best_bid(),
-                "best_ask": self._get_best_ask(),
-                "timestamp": now
-            })
+            self._on_market_data(now)
             
-            time.sleep(0.1)
+            time.sleep(self.TICK)
         
+        self.bus.flush()  # deliver what is still queued before reporting completion
         print("Simulation completed.")
 
+    ORDER_EVENT, MM_REFRESH_EVENT, MARKET_DATA_EVENT = 0, 1, 2  # also the tie-break order for simultaneous events
+
+    def _initial_events(self):
+        """Event queue of (time, kind) for a scheduled run starting at time 0"""
+        events = [(0.0, self.ORDER_EVENT), (self.MM_REFRESH, self.MM_REFRESH_EVENT)]
+        if self.bus.wants("market_data"):
+            # Market data ticks only matter when someone is listening
+            events.append((0.0, self.MARKET_DATA_EVENT))
+        heapq.heapify(events)
+        return events
+
+    def _handle_event(self, now, kind, events):
+        """Run one scheduled event and queue the next one of its kind"""
+        if kind == self.ORDER_EVENT:
+            self._on_order()
+            heapq.heappush(events, (now + self.rng.expovariate(self.cfg.order_rate), self.ORDER_EVENT))
+        elif kind == self.MM_REFRESH_EVENT:
+            self._on_mm_refresh()
+            heapq.heappush(events, (now + self.MM_REFRESH, self.MM_REFRESH_EVENT))
+        else:
+            self._on_market_data(now)
+            heapq.heappush(events, (now + self.TICK, self.MARKET_DATA_EVENT))
+
+    def run_virtual(self) -> dict:
+        """Run the whole scenario on a virtual clock, as fast as the engine allows.
+
+        Order arrivals, market maker refreshes and market data ticks are
+        kept in an event queue and processed in timestamp order; nothing
+        sleeps. Timestamps are virtual seconds since the start, and with
+        Config.seed set the run is fully reproducible. Returns stats().
+        """
+        self.running = True
+        print("Placing initial market maker orders...")
+        self._market_maker()
+
+        events = self._initial_events()
+        while events and self.running:
+            now, kind = heapq.heappop(events)
+            if now >= self.cfg.duration:
+                break
+            self._handle_event(now, kind, events)
+
+        self.running = False
+        self.bus.flush()
+        print("Simulation completed.")
+        return self.stats()
+
     def start(self):
         """Start simulation in separate thread"""
         if self.running: 
@@ -196,14 +241,15 @@ class Simulator:
         self.running = False
         if self.thread: 
             self.thread.join()
+        self.bus.close()
 
     def stats(self) -> dict:
         """Get simulation statistics"""
         changes = [(self.history[i] - self.history[i-1]) / self.history[i-1] 
                   for i in range(1, len(self.history))]
         
-        total_trades = len(self.book.tape) if hasattr(self.book, 'tape') else 0
-        total_volume = sum(float(t.get('quantity', Decimal('0'))) for t in self.book.tape) if hasattr(self.book, 'tape') else 0.0
+        total_trades = self.book.tape.total_count
+        total_volume = self.book.tape.total_volume
         
         return {
             "price": {
@@ -221,6 +267,54 @@ class Simulator:
             }
         }
 
+class AsyncSimulator(Simulator):
+    """Simulator that runs as a coroutine, so one event loop can host many markets"""
+
+    def __init__(self, config: Config, bus: Optional[AsyncEventBus] = None):
+        super().__init__(config, bus if bus is not None else AsyncEventBus())
+        self.outbox = []  # events raised by the current step, published once it is done
+
+    def _notify(self, event: str, data: dict):
+        self.outbox.append((event, data))
+
+    async def run(self, speed: Optional[float] = 1.0) -> dict:
+        """Run the scenario on the event loop, speed times faster than real time.
+
+        Events are scheduled exactly as in run_virtual (same seed, same
+        results), but each one waits with asyncio.sleep until its time has
+        come, so other coroutines run in between. With speed=None nothing
+        waits, but the loop is still yielded to after every event.
+        Callbacks may be coroutine functions. Timestamps are simulated
+        seconds since the start. Returns stats().
+        """
+        loop = asyncio.get_running_loop()
+        self.running = True
+        self._market_maker()
+
+        events = self._initial_events()
+        start = loop.time()
+        while events and self.running:
+            now, kind = heapq.heappop(events)
+            if now >= self.cfg.duration:
+                break
+            delay = start + now / speed - loop.time() if speed else 0
+            await asyncio.sleep(max(delay, 0))
+            self._handle_event(now, kind, events)
+            outbox, self.outbox = self.outbox, []
+            for event, data in outbox:
+                await self.bus.publish(event, data)
+
+        self.running = False
+        await self.bus.close()  # deliver what is still queued
+        return self.stats()
+
+    def stop(self):
+        self.running = False
+
+async def run_markets(simulators, speed: Optional[float] = 1.0) -> list:
+    """Run AsyncSimulators concurrently on the current event loop; returns their stats() in order"""
+    return await asyncio.gather(*(sim.run(speed) for sim in simulators))
+
 def main():
     """Standalone simulation runner"""
     p = argparse.ArgumentParser(description="Market Simulation")
@@ -236,13 +330,16 @@ def main():
     p.add_argument('--max-size', type=float, default=10.0)
     p.add_argument('--monitor', action='store_true')
     p.add_argument('--export', type=str)
+    p.add_argument('--seed', type=int)
+    p.add_argument('--fast', action='store_true', help='run on a virtual clock as fast as possible')
     
     args = p.parse_args()
     
     cfg = Config(
         duration=args.duration, order_rate=args.order_rate, base_price=args.base_price,
         volatility=args.volatility, spread=args.spread, market_ratio=args.market_ratio,
-        trend=args.trend, depth=args.depth, min_size=args.min_size, max_size=args.max_size
+        trend=args.trend, depth=args.depth, min_size=args.min_size, max_size=args.max_size,
+        seed=args.seed
     )
     
     sim = Simulator(cfg)
@@ -259,8 +356,12 @@ def main():
                 print(f"MARKET: ${md['price']:.2f} | Bid: {bid}, Ask: {ask}")
         sim.add_callback(cb)
     
-    sim.start()
-    sim.thread.join()
+    if args.fast:
+        sim.run_virtual()
+    else:
+        sim.start()
+        sim.thread.join()
+        sim.stop()
     
     stats = sim.stats()
     print(f"\n{'='*40}")
@@ -0,0 +1,133 @@
+import sys
+import struct
+from array import array
+from decimal import Decimal
+from journal import pack_owner, unpack_owner
+
+MAGIC = b'OBS3'
+# magic, integer_ticks flag, tick_size, lot_size, book time, next_order_id, bid levels, ask levels
+HEADER = struct.Struct('<4sB3x24s24sqqII')
+# integer tick books: price, level volume, number of orders at the level
+INT_LEVEL = struct.Struct('<qqI4x')
+# Decimal books: byte lengths of the price text, volume text and quantity column, number of orders
+DECIMAL_LEVEL = struct.Struct('<HHII')
+# owner index after the levels: number of owners, then per owner the byte length of the owner
+# (journal.pack_owner) and its order count
+OWNERS = struct.Struct('<I')
+OWNER = struct.Struct('<HI')
+
+BIG_ENDIAN = sys.byteorder == 'big'
+
+
+def _pack_array(typecode, values):
+    column = array(typecode, values)
+    if BIG_ENDIAN:
+        column.byteswap() # columns are stored little-endian like the headers
+    return column.tobytes()
+
+
+def _unpack_array(typecode, buffer, offset, count):
+    column = array(typecode)
+    end = offset + count * column.itemsize
+    column.frombytes(buffer[offset:end])
+    if BIG_ENDIAN:
+        column.byteswap()
+    return column, end
+
+
+def dump_book(book):
+    '''Serialise the resting orders of book into a compact binary snapshot.
+
+    Each price level is written as a small header followed by four columns
+    in FIFO order: order_id, quantity, timestamp and trade_id. Integer tick
+    books store prices, volumes and quantities as int64 ticks/lots. Decimal
+    books store them as text so every Decimal comes back exactly. The owner
+    index follows the levels: each owner (a str or int, kept with its type)
+    and the ids of its resting orders, oldest first. Order and trade ids
+    must be integers.
+    '''
+    integer_ticks = book.integer_ticks
+    parts = [HEADER.pack(MAGIC, 1 if integer_ticks else 0, str(book.tick_size).encode(),
+                         str(book.lot_size).encode(), int(book.time), book.next_order_id,
+                         book.bids.depth, book.asks.depth)]
+    for tree in (book.bids, book.asks):
+        for price, order_list in tree.price_map.items():
+            orders = list(order_list)
+            if integer_ticks:
+                parts.append(INT_LEVEL.pack(price, order_list.volume, len(orders)))
+                parts.append(_pack_array('q', [order.order_id for order in orders]))
+                parts.append(_pack_array('q', [order.quantity for order in orders]))
+            else:
+                price_text = str(price).encode()
+                volume_text = str(order_list.volume).encode()
+                quantities = b' '.join([str(order.quantity).encode() for order in orders])
+                parts.append(DECIMAL_LEVEL.pack(len(price_text), len(volume_text), len(quantities), len(orders)))
+                parts.append(price_text)
+                parts.append(volume_text)
+                parts.append(_pack_array('q', [order.order_id for order in orders]))
+                parts.append(quantities)
+            parts.append(_pack_array('q', [order.timestamp for order in orders]))
+            parts.append(_pack_array('q', [order.trade_id for order in orders]))
+    parts.append(OWNERS.pack(len(book.owner_orders)))
+    for owner, orders in book.owner_orders.items():
+        name = pack_owner(owner)
+        parts.append(OWNER.pack(len(name), len(orders)))
+        parts.append(name)
+        parts.append(_pack_array('q', list(orders)))
+    return b''.join(parts)
+
+
+def load_book(book, data):
+    '''Replace the resting orders of book with the contents of a snapshot.
+
+    Levels are rebuilt in bulk through OrderTree.restore_levels, without
+    going through the matching path. The book must use the same tick mode,
+    tick size and lot size as the one the snapshot was taken from.
+    '''
+    data = memoryview(data)
+    magic, integer_ticks, tick_size, lot_size, time, next_order_id, bid_levels, ask_levels = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError('not an OrderBook snapshot')
+    integer_ticks = bool(integer_ticks)
+    tick_size = Decimal(tick_size.rstrip(b'\0').decode())
+    lot_size = Decimal(lot_size.rstrip(b'\0').decode())
+    if integer_ticks != book.integer_ticks or tick_size != book.tick_size or (integer_ticks and lot_size != book.lot_size):
+        raise ValueError('snapshot was taken from a book with a different tick mode, tick_size or lot_size')
+
+    offset = HEADER.size
+    for tree, num_levels in ((book.bids, bid_levels), (book.asks, ask_levels)):
+        levels = []
+        for _ in range(num_levels):
+            if integer_ticks:
+                price, volume, count = INT_LEVEL.unpack_from(data, offset)
+                offset += INT_LEVEL.size
+                order_ids, offset = _unpack_array('q', data, offset, count)
+                quantities, offset = _unpack_array('q', data, offset, count)
+            else:
+                price_length, volume_length, quantities_length, count = DECIMAL_LEVEL.unpack_from(data, offset)
+                offset += DECIMAL_LEVEL.size
+                price = Decimal(bytes(data[offset:offset + price_length]).decode())
+                offset += price_length
+                volume = Decimal(bytes(data[offset:offset + volume_length]).decode())
+                offset += volume_length
+                order_ids, offset = _unpack_array('q', data, offset, count)
+                quantities = [Decimal(text) for text in bytes(data[offset:offset + quantities_length]).decode().split(' ')]
+                offset += quantities_length
+            timestamps, offset = _unpack_array('q', data, offset, count)
+            trade_ids, offset = _unpack_array('q', data, offset, count)
+            levels.append((price, volume, order_ids, quantities, timestamps, trade_ids))
+        tree.restore_levels(levels)
+    book.owner_orders = {}
+    book.order_owners = {}
+    (num_owners,) = OWNERS.unpack_from(data, offset)
+    offset += OWNERS.size
+    for _ in range(num_owners):
+        name_length, count = OWNER.unpack_from(data, offset)
+        offset += OWNER.size
+        owner = unpack_owner(data[offset:offset + name_length])
+        offset += name_length
+        order_ids, offset = _unpack_array('q', data, offset, count)
+        for order_id in order_ids:
+            book._index_owner(owner, order_id, 'bid' if book.bids.order_exists(order_id) else 'ask')
+    book.time = time
+    book.next_order_id = next_order_id
@@ -0,0 +1,201 @@
+from array import array
+
+NAN = float('nan')
+INITIAL_SLOTS = 1024 # columns start this long and double up to capacity as trades arrive
+
+
+class RollingWindow(object):
+    '''Running count / volume / notional over a window of the trade tape.'''
+
+    def __init__(self):
+        self.count = 0
+        self.volume = 0.0
+        self.notional = 0.0 # sum of price * quantity
+
+    def add(self, price, quantity):
+        self.count += 1
+        self.volume += quantity
+        self.notional += price * quantity
+
+    def remove(self, price, quantity):
+        self.count -= 1
+        self.volume -= quantity
+        self.notional -= price * quantity
+
+    def reset(self):
+        self.count = 0
+        self.volume = 0.0
+        self.notional = 0.0
+
+    def vwap(self):
+        if self.count == 0 or self.volume <= 0:
+            return None
+        return self.notional / self.volume
+
+
+class TradeTape(object):
+    '''
+    Fixed capacity trade tape stored as ring buffers of typed columns.
+
+    Only the last ``capacity`` trades are kept, so long simulations do not
+    grow without bound. Two rolling windows are maintained in O(1) per trade:
+
+    - ``last_n``: VWAP, volume and count of the last ``trade_window`` trades
+    - ``last_t``: the same over trades whose timestamp is within
+      ``time_window`` of the newest trade (in book time units)
+
+    ``total_count`` and ``total_volume`` cover every trade ever appended.
+    Indexing and iteration return the familiar tape record dicts, built on
+    demand from the columns. Prices and quantities are stored as floats.
+
+    Columns are allocated lazily: they start at INITIAL_SLOTS and double in
+    place until they reach capacity, so books that trade little (many
+    markets in one process) do not pay for a full tape up front.
+    '''
+
+    def __init__(self, capacity=100000, trade_window=None, time_window=None):
+        if trade_window is not None and not 0 < trade_window <= capacity:
+            raise ValueError('trade_window must be between 1 and capacity')
+        self.capacity = capacity
+        self.trade_window = trade_window
+        self.time_window = time_window
+
+        slots = min(capacity, INITIAL_SLOTS)
+        self.allocated = slots # slots in each column; grows to capacity
+        self.timestamp = array('q', [0]) * slots
+        self.price = array('d', [0.0]) * slots
+        self.quantity = array('d', [0.0]) * slots
+        self.maker_side = array('b', [0]) * slots # 1 = resting order was a bid, 0 = ask
+        self.maker_order_id = array('q', [0]) * slots
+        self.maker_remaining = array('d', [0.0]) * slots # NaN when the resting order was filled
+        # trade ids are free-form (ints from the book, strings from data feeds)
+        self.maker_trade_id = [None] * slots
+        self.taker_trade_id = [None] * slots
+
+        self.head = 0 # next slot to write
+        self.size = 0 # trades currently stored
+        self.total_count = 0
+        self.total_volume = 0.0
+        self.last_n = RollingWindow()
+        self.last_t = RollingWindow()
+        self.time_tail = 0 # sequence number of the oldest trade inside last_t
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def _grow(self):
+        '''Double the columns in place, up to capacity.'''
+        extra = min(self.capacity, 2 * self.allocated) - self.allocated
+        for column in (self.timestamp, self.maker_order_id):
+            column.extend(array('q', [0]) * extra)
+        for column in (self.price, self.quantity, self.maker_remaining):
+            column.extend(array('d', [0.0]) * extra)
+        self.maker_side.extend(array('b', [0]) * extra)
+        self.maker_trade_id.extend([None] * extra)
+        self.taker_trade_id.extend([None] * extra)
+        self.allocated += extra
+
+    def append(self, timestamp, price, quantity, maker_trade_id, maker_side, maker_order_id,
+               maker_remaining, taker_trade_id):
+        cap = self.capacity
+        i = self.head
+        if i == self.allocated:
+            # Still filling the first lap, so slots are used in order and the ring has not wrapped
+            self._grow()
+        seq = self.total_count # sequence number of this trade
+        price = float(price)
+        quantity = float(quantity)
+
+        if self.trade_window is not None:
+            if seq >= self.trade_window:
+                # The trade falling out of the window is still in the buffer (trade_window <= capacity)
+                j = (i - self.trade_window) % cap
+                self.last_n.remove(self.price[j], self.quantity[j])
+            self.last_n.add(price, quantity)
+
+        if self.time_window is not None and self.size == cap and self.time_tail == seq - cap:
+            # The slot about to be overwritten is still inside the time window
+            self.last_t.remove(self.price[i], self.quantity[i])
+            self.time_tail += 1
+
+        self.timestamp[i] = timestamp
+        self.price[i] = price
+        self.quantity[i] = quantity
+        self.maker_side[i] = 1 if maker_side == 'bid' else 0
+        self.maker_order_id[i] = maker_order_id
+        self.maker_remaining[i] = NAN if maker_remaining is None else float(maker_remaining)
+        self.maker_trade_id[i] = maker_trade_id
+        self.taker_trade_id[i] = taker_trade_id
+
+        self.head = i + 1 if i + 1 < cap else 0
+        if self.size < cap:
+            self.size += 1
+        self.total_count = seq + 1
+        self.total_volume += quantity
+
+        if self.time_window is not None:
+            self.last_t.add(price, quantity)
+            self.advance(timestamp)
+
+        if self.head == 0:
+            self._resync()
+
+    def advance(self, now):
+        '''Expire trades older than time_window from last_t as of book time now.'''
+        if self.time_window is None:
+            return
+        cutoff = now - self.time_window
+        cap = self.capacity
+        while self.time_tail < self.total_count:
+            j = self.time_tail % cap
+            if self.timestamp[j] > cutoff:
+                break
+            self.last_t.remove(self.price[j], self.quantity[j])
+            self.time_tail += 1
+
+    def _resync(self):
+        '''Recompute the rolling sums from the columns once per lap to stop float drift.'''
+        cap = self.capacity
+        if self.trade_window is not None:
+            self.last_n.reset()
+            for k in range(max(0, self.total_count - self.trade_window), self.total_count):
+                self.last_n.add(self.price[k % cap], self.quantity[k % cap])
+        if self.time_window is not None:
+            self.last_t.reset()
+            for k in range(self.time_tail, self.total_count):
+                self.last_t.add(self.price[k % cap], self.quantity[k % cap])
+
+    def _slot(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError('tape index out of range')
+        return (self.head - self.size + index) % self.capacity
+
+    def record(self, slot):
+        '''Tape record dict for a buffer slot.'''
+        maker_side = 'bid' if self.maker_side[slot] else 'ask'
+        remaining = self.maker_remaining[slot]
+        return {
+            'timestamp': self.timestamp[slot],
+            'price': self.price[slot],
+            'quantity': self.quantity[slot],
+            'party1': [self.maker_trade_id[slot], maker_side, self.maker_order_id[slot],
+                       None if remaining != remaining else remaining],
+            'party2': [self.taker_trade_id[slot], 'ask' if maker_side == 'bid' else 'bid', None, None]
+        }
+
+    def __getitem__(self, index):
+        return self.record(self._slot(index))
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield self.record(self._slot(index))
+
+    def last(self, n):
+        '''The last n trades, oldest first.'''
+        n = min(n, self.size)
+        return [self.record(self._slot(index)) for index in range(self.size - n, self.size)]
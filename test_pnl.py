@@ -1,5 +1,14 @@
 from pnl_tracker import PnLTracker
 from OrderBook import OrderBook
+from tape import TradeTape
+from simulation import Simulator, AsyncSimulator, Config, run_markets
+from orderbookmanager import OrderBookManager, shard_for, _shard_worker
+from journal import replay_journal
+from montecarlo import config_grid, run_grid
+from benchmark import run_benchmarks, compare
+from latency import LatencyHistogram
+from eventbus import EventBus
+from feed import DepthFeedHandler, read_feed, FeedRecorder, read_recording, replay_recording, parse_scaled, CHUNK
 from decimal import Decimal  # Import Decimal for consistent type handling
 import time  # For adding delays in manual test
 
@@ -81,6 +90,1370 @@ def test_quote_from_orderbook():
     print()
 
 
+def test_integer_tick_mode():
+    """Integer tick mode should match exactly like the Decimal engine"""
+    print("=== Testing Integer Tick Mode ===")
+    ob = OrderBook(integer_ticks=True, lot_size=Decimal('0.0001'))
+
+    ob.process_order({'price': Decimal('99.50'), 'quantity': 1.5, 'side': 'bid', 'type': 'limit'})
+    ob.process_order({'price': 99, 'quantity': 2, 'side': 'bid', 'type': 'limit'})
+
+    # Internally the tree is keyed by integer ticks and lots
+    assert list(ob.bids.price_map.keys()) == [9900, 9950], f"Unexpected tick keys {list(ob.bids.price_map.keys())}"
+    assert ob.bids.volume == 35000, f"Expected 35000 lots, got {ob.bids.volume}"
+
+    # Sell 3 through both levels, leaving 0.5 bid at 99
+    trades, order_in_book = ob.process_order({'price': '98.75', 'quantity': 3, 'side': 'ask', 'type': 'limit'})
+    assert [(t['price'], t['quantity']) for t in trades] == [(Decimal('99.5'), Decimal('1.5')), (Decimal('99'), Decimal('1.5'))]
+    assert order_in_book is None, f"Expected fully filled order, got {order_in_book}"
+    assert ob.get_best_bid() == Decimal('99'), f"Expected best bid of 99, got {ob.get_best_bid()}"
+    assert ob.get_volume_at_price('bid', 99) == Decimal('0.5')
+    assert ob.tape[-1]['price'] == Decimal('99')
+
+    print("✓ test_integer_tick_mode PASSED!")
+    print()
+
+
+def test_order_pool_recycling():
+    """Cancelled and filled orders should be recycled through the pool"""
+    print("=== Testing Order Pool Recycling ===")
+    ob = OrderBook()
+
+    ob.process_order({'price': Decimal('100'), 'quantity': 1, 'side': 'ask', 'type': 'limit'})
+    ob.process_order({'price': Decimal('101'), 'quantity': 1, 'side': 'ask', 'type': 'limit'})
+    first = ob.asks.get_order(1)
+
+    ob.cancel_order('ask', 1)
+    assert len(ob.order_pool) == 1, f"Expected 1 pooled order, got {len(ob.order_pool)}"
+
+    # The next insert reuses the cancelled record, on either side
+    ob.process_order({'price': Decimal('99'), 'quantity': 2, 'side': 'bid', 'type': 'limit'})
+    assert ob.bids.get_order(3) is first, "Expected the pooled Order to be reused"
+    assert first.price == Decimal('99') and first.quantity == 2
+
+    # Price amendments move the order between levels without corrupting totals
+    ob.modify_order(3, {'side': 'bid', 'price': Decimal('98'), 'quantity': 3})
+    assert ob.bids.depth == 1 and ob.bids.num_orders == 1 and ob.bids.volume == 3
+    assert ob.get_best_bid() == Decimal('98')
+
+    trades, _ = ob.process_order({'quantity': 1, 'side': 'bid', 'type': 'market'})
+    assert ob.tape[-1]['party1'][2] == 2, f"Expected maker order 2, got {ob.tape[-1]}"
+    assert ob.asks.depth == 0 and len(ob.order_pool) == 1
+
+    print("✓ test_order_pool_recycling PASSED!")
+    print()
+
+
+def test_batch_process_orders():
+    """Batch submission should return fills as column arrays"""
+    print("=== Testing Batch Order Submission ===")
+    for integer_ticks in (False, True):
+        ob = OrderBook(integer_ticks=integer_ticks, lot_size=Decimal('0.01'))
+        fills = ob.process_orders(
+            sides=['ask', 'ask', 'bid', 'bid'],
+            types=['limit', 'limit', 'limit', 'market'],
+            prices=[101, 102, 101.5, None],
+            quantities=[1, 2, 1.5, 1],
+        )
+
+        # The 101.5 bid takes 1 @ 101, the market bid takes 1 @ 102
+        assert len(fills) == 2, f"Expected 2 fills, got {len(fills)}"
+        assert list(fills.maker_id) == [1, 2] and list(fills.taker_id) == [3, 4]
+        assert list(fills.timestamp) == [3, 4]
+        if integer_ticks:
+            assert list(fills.price) == [10100, 10200] and list(fills.quantity) == [100, 100]
+        else:
+            assert list(fills.price) == [101.0, 102.0] and list(fills.quantity) == [1.0, 1.0]
+
+        # Unfilled remainder of the limit bid rests on the book
+        assert ob.get_best_bid() == Decimal('101.5'), f"Expected best bid of 101.5, got {ob.get_best_bid()}"
+        assert len(ob.tape) == 2
+
+    print("✓ test_batch_process_orders PASSED!")
+    print()
+
+
+def test_ladder_order_tree():
+    """The dense tick ladder should behave like the SortedDict OrderTree"""
+    print("=== Testing Ladder Order Tree ===")
+    ob = OrderBook(integer_ticks=True, ladder_capacity=16)
+
+    ob.process_order({'price': Decimal('100.00'), 'quantity': 1, 'side': 'bid', 'type': 'limit'})
+    ob.process_order({'price': Decimal('99.95'), 'quantity': 2, 'side': 'bid', 'type': 'limit'})
+    # A far-off bid away from the touch is parked outside the band instead of widening it
+    ob.process_order({'price': Decimal('0.01'), 'quantity': 5, 'side': 'bid', 'type': 'limit'})
+    assert len(ob.bids.levels) == 16 and list(ob.bids.overflow.keys()) == [1], "Far level should sit in the overflow"
+    # A better bid far outside the 16 tick band: the band recenters on it, the old levels move to the overflow
+    ob.process_order({'price': Decimal('101.00'), 'quantity': 3, 'side': 'bid', 'type': 'limit'})
+    assert len(ob.bids.levels) == 16, f"Ladder grew to {len(ob.bids.levels)} slots"
+    assert ob.get_best_bid() == Decimal('101'), f"Expected best bid of 101, got {ob.get_best_bid()}"
+    assert list(ob.bids.price_map.keys()) == [1, 9995, 10000, 10100]
+
+    # Sweep the top two levels: the band follows the touch back and the best pointer walks down to 99.95
+    trades, _ = ob.process_order({'quantity': 4, 'side': 'ask', 'type': 'market'})
+    assert [t['price'] for t in trades] == [Decimal('101'), Decimal('100')]
+    assert ob.get_best_bid() == Decimal('99.95'), f"Expected best bid of 99.95, got {ob.get_best_bid()}"
+    assert ob.bids.depth == 2 and ob.get_volume_at_price('bid', '99.95') == 2
+    assert ob.get_depth(5)['bids'] == [(Decimal('99.95'), 2), (Decimal('0.01'), 5)]
+    assert ob.bids.price_map is ob.bids.price_map, "price_map should be cached between level changes"
+
+    ob.process_order({'price': Decimal('100.05'), 'quantity': 1, 'side': 'ask', 'type': 'limit'})
+    assert ob.get_best_ask() == Decimal('100.05')
+
+    print("✓ test_ladder_order_tree PASSED!")
+    print()
+
+
+def test_depth_snapshot_cache():
+    """get_depth should serve the cached top levels and patch them on change"""
+    print("=== Testing Top-N Depth Snapshot ===")
+    ob = OrderBook()
+    for price, qty in [(99, 1), (98, 2), (97, 3), (96, 4)]:
+        ob.process_order({'price': Decimal(price), 'quantity': qty, 'side': 'bid', 'type': 'limit'})
+    ob.process_order({'price': Decimal('101'), 'quantity': 5, 'side': 'ask', 'type': 'limit'})
+
+    depth = ob.get_depth(2)
+    assert depth['bids'] == [(99, 1), (98, 2)], f"Unexpected bids {depth['bids']}"
+    assert depth['asks'] == [(101, 5)], f"Unexpected asks {depth['asks']}"
+    cached = ob.bids.top_cache
+
+    # Changes behind the top 2 leave the cache untouched
+    ob.process_order({'price': Decimal('96'), 'quantity': 1, 'side': 'bid', 'type': 'limit'})
+    assert ob.get_depth(2)['bids'] is cached
+
+    # A partial fill on the best level is patched in place
+    ob.process_order({'quantity': 0.5, 'side': 'ask', 'type': 'market'})
+    assert ob.get_depth(2)['bids'] == [(99, Decimal('0.5')), (98, 2)]
+
+    # Clearing the best level pulls the next one into the window
+    ob.process_order({'quantity': 0.5, 'side': 'ask', 'type': 'market'})
+    assert ob.get_depth(2)['bids'] == [(98, 2), (97, 3)]
+
+    print("✓ test_depth_snapshot_cache PASSED!")
+    print()
+
+
+def test_depth_delta_feed():
+    """L2 deltas should be enough to keep a mirror of the book in sync"""
+    print("=== Testing L2 Depth Delta Feed ===")
+    ob = OrderBook()
+    deltas = []
+    ob.add_depth_listener(lambda seq, side, price, volume: deltas.append((seq, side, price, volume)))
+
+    ob.process_order({'price': Decimal('100'), 'quantity': 2, 'side': 'ask', 'type': 'limit'})
+    ob.process_order({'price': Decimal('100'), 'quantity': 1, 'side': 'ask', 'type': 'limit'})
+    ob.process_order({'price': Decimal('99'), 'quantity': 1, 'side': 'bid', 'type': 'limit'})
+    ob.process_order({'quantity': 2.5, 'side': 'bid', 'type': 'market'})
+    ob.cancel_order('bid', 3)
+
+    assert deltas == [
+        (1, 'ask', 100, 2),
+        (2, 'ask', 100, 3),
+        (3, 'bid', 99, 1),
+        (4, 'ask', 100, 1),                # first ask filled and removed
+        (5, 'ask', 100, Decimal('0.5')),   # second ask partially filled
+        (6, 'bid', 99, 0),                 # bid cancelled, level gone
+    ], f"Unexpected deltas {deltas}"
+    assert ob.depth_seq == 6
+
+    print("✓ test_depth_delta_feed PASSED!")
+    print()
+
+
+def test_bounded_trade_tape():
+    """The tape keeps only the newest trades and rolls its windows in O(1)"""
+    print("=== Testing Bounded Trade Tape ===")
+    tape = TradeTape(capacity=4, trade_window=2, time_window=10)
+    for timestamp, price, qty in [(1, 100, 1), (5, 102, 1), (12, 104, 2), (13, 101, 1), (30, 99, 3)]:
+        tape.append(timestamp, price, qty, 'maker', 'ask', timestamp, None, 'taker')
+
+    assert len(tape) == 4 and tape.total_count == 5 and tape.total_volume == 8
+    assert tape[0]['timestamp'] == 5 and tape[-1]['price'] == 99
+    assert tape[-1]['party1'] == ['maker', 'ask', 30, None]
+
+    # Last 2 trades: 1 @ 101 and 3 @ 99
+    assert tape.last_n.count == 2 and tape.last_n.vwap() == (101 + 3 * 99) / 4
+    # Only the trade at t=30 is within 10 time units of the newest trade
+    assert tape.last_t.count == 1 and tape.last_t.volume == 3
+
+    # The OrderBook writes every fill to its tape
+    ob = OrderBook(tape=TradeTape(capacity=2))
+    ob.process_order({'price': Decimal('100'), 'quantity': 3, 'side': 'ask', 'type': 'limit'})
+    for _ in range(3):
+        ob.process_order({'quantity': 1, 'side': 'bid', 'type': 'market'})
+    assert len(ob.tape) == 2 and ob.tape.total_count == 3
+    assert ob.tape[-1]['party1'][3] is None and ob.tape[0]['party1'][3] == 1
+
+    print("✓ test_bounded_trade_tape PASSED!")
+    print()
+
+
+def test_virtual_clock_simulation():
+    """A seeded virtual-clock run is fast and reproducible"""
+    print("=== Testing Virtual Clock Simulation ===")
+    config = Config(duration=600, order_rate=5.0, seed=42)
+
+    ticks = []
+    first = Simulator(config, bus=EventBus(threaded=False))
+    first.add_callback(lambda event, data: ticks.append((data['timestamp'], data['price'], data['best_bid'], data['best_ask']))
+                       if event == 'market_data' else None)
+    stats = first.run_virtual()
+    second = Simulator(config).run_virtual()
+
+    assert stats == second, "Seeded runs should produce identical statistics"
+    assert stats['trades']['count'] > 0, "Expected some trades in 10 virtual minutes"
+    # Market data is sampled every 0.1 virtual seconds but only sent when the state changed
+    assert 0 < len(ticks) < 6000 and ticks == sorted(ticks)
+    assert all(a[1:] != b[1:] for a, b in zip(ticks, ticks[1:])), "Unchanged market data was sent"
+
+    # On the threaded bus a consumer sees a conflated subset that always ends with the latest state
+    latest = []
+    third = Simulator(config)
+    third.subscribe(lambda event, data: latest.append((data['timestamp'], data['price'], data['best_bid'], data['best_ask'])),
+                    events='market_data')
+    assert third.run_virtual() == stats
+    assert latest and latest == sorted(latest) and set(latest) <= set(ticks)
+    assert latest[-1] == ticks[-1]
+    third.stop()
+
+    print("✓ test_virtual_clock_simulation PASSED!")
+    print()
+
+
+def test_order_book_manager():
+    """Orders are routed by symbol to books living in worker processes"""
+    print("=== Testing Sharded OrderBook Manager ===")
+    symbols = ['BTC/USD', 'ETH/USD', 'SOL/USD']
+    with OrderBookManager(num_workers=2) as manager:
+        orders = []
+        for symbol in symbols:
+            orders.append((symbol, {'type': 'limit', 'side': 'ask', 'price': Decimal('100'), 'quantity': 2}))
+            orders.append((symbol, {'type': 'market', 'side': 'bid', 'quantity': 1}))
+        results = manager.process_orders(orders)
+
+        assert len(results) == 6
+        for i in range(0, 6, 2):
+            trades, resting = results[i]
+            assert trades == [] and resting['price'] == Decimal('100')
+            trades, _ = results[i + 1]
+            assert [(t['price'], t['quantity']) for t in trades] == [(Decimal('100'), Decimal('1'))]
+
+        manager.call('BTC/USD', 'get_volume_at_price', 'ask', 100)
+        manager.call('BTC/USD', 'process_order', {'type': 'limit', 'side': 'bid', 'price': 1, 'quantity': 0})
+        volume, error = manager.flush()
+        assert volume == Decimal('1') and isinstance(error, RuntimeError)
+
+        stats = manager.stats()
+        assert sum(s['orders'] for s in stats) == 6 and sum(s['fills'] for s in stats) == 3
+        assert sorted(sym for s in stats for sym in s['symbols']) == sorted(symbols)
+
+    print("✓ test_order_book_manager PASSED!")
+    print()
+
+
+def test_journal_replay(tmp_path):
+    """Replaying the binary journal rebuilds the same book"""
+    print("=== Testing Event Journal Replay ===")
+    for integer_ticks in (False, True):
+        path = str(tmp_path / f"journal_{integer_ticks}.bin")
+        book = OrderBook(integer_ticks=integer_ticks)
+        book.open_journal(path)
+        book.process_order({'price': Decimal('100.5'), 'quantity': 2, 'side': 'ask', 'type': 'limit'})
+        book.process_order({'price': Decimal('101'), 'quantity': 1.25, 'side': 'ask', 'type': 'limit'})
+        book.process_order({'price': Decimal('99'), 'quantity': 3, 'side': 'bid', 'type': 'limit'})
+        book.process_order({'quantity': 2.5, 'side': 'bid', 'type': 'market'})
+        book.modify_order(3, {'side': 'bid', 'price': Decimal('99.5'), 'quantity': 4})
+        book.cancel_order('ask', 2)
+        book.close_journal()
+
+        replayed = OrderBook(integer_ticks=integer_ticks)
+        assert replay_journal(path, replayed) == 6
+        assert str(replayed) == str(book), f"Replayed book differs:\n{replayed}\n{book}"
+        assert replayed.next_order_id == book.next_order_id
+
+    print("✓ test_journal_replay PASSED!")
+    print()
+
+
+def test_snapshot_restore():
+    """Restoring a snapshot rebuilds the same book with FIFO order intact"""
+    print("=== Testing Snapshot / Restore ===")
+    for kwargs in ({}, {'integer_ticks': True}, {'integer_ticks': True, 'ladder_capacity': 16}):
+        book = OrderBook(**kwargs)
+        book.process_order({'price': Decimal('100.5'), 'quantity': 2, 'side': 'ask', 'type': 'limit'})
+        book.process_order({'price': Decimal('100.5'), 'quantity': 1.1, 'side': 'ask', 'type': 'limit'})
+        book.process_order({'price': Decimal('101'), 'quantity': 1.25, 'side': 'ask', 'type': 'limit'})
+        book.process_order({'price': Decimal('99'), 'quantity': 3, 'side': 'bid', 'type': 'limit'})
+        book.process_order({'quantity': 0.5, 'side': 'bid', 'type': 'market'})
+
+        restored = OrderBook(**kwargs)
+        restored.restore(book.snapshot())
+        assert restored.get_depth() == book.get_depth(), f"Restored book differs:\n{restored}\n{book}"
+        assert [str(order) for order in restored.asks.order_map.values()] == \
+            [str(order) for order in book.asks.order_map.values()]
+        assert restored.next_order_id == book.next_order_id
+
+        # The partially filled order 1 is still first in the queue at 100.5
+        trades, _ = restored.process_order({'quantity': 2, 'side': 'bid', 'type': 'market'})
+        assert [trade['buy_order_id'] for trade in trades] == [1, 2], f"FIFO order lost: {trades}"
+
+    print("✓ test_snapshot_restore PASSED!")
+    print()
+
+
+def test_pnl_tracker_aggregates():
+    """Running lot aggregates match a brute force walk over the lots"""
+    print("=== Testing PnLTracker Running Aggregates ===")
+    tracker = PnLTracker(verbose=False)
+    trades = [(100, 3, 'buy'), (102, 1, 'buy'), (105, 2, 'sell'), (101, 4, 'sell'),
+              (99, 1.5, 'buy'), (98, 0.5, 'sell'), (97, 2, 'buy')]
+    for price, quantity, side in trades:
+        tracker.record_trade(price, quantity, side)
+        expected = sum((103 - p) * q for p, q in tracker.long_positions) + \
+                   sum((p - 103) * q for p, q in tracker.short_positions)
+        assert abs(tracker.get_unrealized_pnl(103) - expected) < 1e-9, \
+            f"Unrealized P&L {tracker.get_unrealized_pnl(103)} != {expected}"
+
+    # Longs 3 @ 100 and 1 @ 102 close at 105/101 (+10 +1 -1), the 2 @ 101 short is
+    # covered at 99 (+3) and 97 (+2), the 0.5 @ 98 short at 97 (+0.5), leaving 1 @ 97 long
+    assert abs(tracker.realized_pnl - 15.5) < 1e-9, f"Expected realized P&L 15.5, got {tracker.realized_pnl}"
+    assert list(tracker.long_positions) == [(97.0, 1.0)], f"Unexpected long lots {tracker.long_positions}"
+    assert not tracker.short_positions, f"Unexpected short lots {tracker.short_positions}"
+    assert tracker.long_quantity == 1.0 and tracker.short_quantity == 0
+
+    print("✓ test_pnl_tracker_aggregates PASSED!")
+    print()
+
+
+def test_pnl_tracker_batch():
+    """record_trades / mark_to_market match trade by trade FIFO accounting"""
+    print("=== Testing Vectorized PnLTracker Batch ===")
+    try:
+        import numpy as np
+    except ImportError:
+        print("numpy not installed, skipping")
+        return
+    trades = [(100, 3, 'buy'), (102, 1, 'buy'), (105, 2, 'sell'), (101, 4, 'sell'),
+              (99, 1.5, 'buy'), (98, 0.5, 'sell'), (97, 2, 'buy'), (96, 0.25, 'sell')]
+    scalar = PnLTracker(verbose=False)
+    realized, total = [], []
+    for price, quantity, side in trades:
+        scalar.record_trade(price, quantity, side)
+        realized.append(scalar.realized_pnl)
+        total.append(scalar.get_total_pnl(price + 0.5))
+
+    # Start the batch with a lot already open so it has to be matched first
+    batch = PnLTracker(verbose=False)
+    batch.record_trade(*trades[0])
+    prices, quantities, sides = (list(column) for column in zip(*trades[1:]))
+    series = batch.record_trades(prices, quantities, sides)
+    assert np.allclose(series['realized_pnl'], realized[1:]), f"{series['realized_pnl']} != {realized[1:]}"
+    marked = batch.mark_to_market(np.array(prices) + 0.5)
+    assert np.allclose(marked['total_pnl'], total[1:]), f"{marked['total_pnl']} != {total[1:]}"
+
+    assert batch.total_trades == scalar.total_trades
+    assert list(batch.long_positions) == list(scalar.long_positions), \
+        f"{batch.long_positions} != {scalar.long_positions}"
+    assert abs(batch.get_unrealized_pnl(103) - scalar.get_unrealized_pnl(103)) < 1e-9
+
+    print("✓ test_pnl_tracker_batch PASSED!")
+    print()
+
+
+def test_market_maker_sweep():
+    """The vectorized sweep matches serial MarketMaker runs on the same paths"""
+    print("=== Testing MarketMaker Parameter Sweep ===")
+    try:
+        import numpy as np
+        from market_making_strategy import MarketMaker, sweep_market_making
+    except ImportError:
+        print("numpy/matplotlib not installed, skipping")
+        return
+    import io, random, contextlib
+    rng = np.random.default_rng(7)
+    prices = rng.uniform(1000, 1100, size=(4, 50))
+    draws = rng.random(size=(4, 50))
+    # Little cash so the "not enough cash" branch is exercised too
+    results = sweep_market_making([0.05, 1.0], [0.05, 2.0], [2, 10], initial_cash=3000,
+                                  prices=prices, buy_draws=draws)
+    assert len(results) == 8
+
+    real_random = random.random
+    try:
+        for row in results:
+            for path in range(4):
+                mm = MarketMaker(3000, 'BTC/USD', row['max_inventory'], row['bid_spread'], row['ask_spread'])
+                random.random = iter(draws[path]).__next__  # replay the same buy/sell draws
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for step in range(50):
+                        mm.place_order(prices[path, step])
+                        mm.manage_risk(prices[path, step])
+                cash, inventory, trades = mm.track_performance()
+                assert abs(cash - row['final_cash'][path]) < 1e-6, f"{cash} != {row['final_cash'][path]}"
+                assert inventory == row['final_inventory'][path]
+                assert trades == row['total_trades'][path]
+    finally:
+        random.random = real_random
+
+    print("✓ test_market_maker_sweep PASSED!")
+    print()
+
+
+def test_monte_carlo_resume(tmp_path):
+    """Grid runs stream to the results file and resume without redoing finished runs"""
+    print("=== Testing Monte Carlo Runner ===")
+    path = str(tmp_path / "runs.jsonl")
+    configs = config_grid(Config(duration=30), seeds=[1, 2], volatility=[0.01, 0.05])
+    assert len(configs) == 4
+
+    # Pretend an earlier run was interrupted after one run and half a line
+    first = run_grid(configs[:1], path, num_workers=1, verbose=False)
+    with open(path, 'a') as f:
+        f.write('{"key": "torn')
+    records = run_grid(configs, path, num_workers=2, verbose=False)
+    assert len(records) == 4, f"Expected 4 records, got {len(records)}"
+    assert records[0] == first[0]
+    assert len(run_grid(configs, path, num_workers=2, verbose=False)) == 4  # nothing left to run
+
+    # Seeded runs give the same stats in a worker as in this process
+    expected = Simulator(configs[3]).run_virtual()
+    by_seed = {(r['config']['seed'], r['config']['volatility']): r['stats'] for r in records}
+    assert by_seed[(2, 0.05)] == expected
+
+    print("✓ test_monte_carlo_resume PASSED!")
+    print()
+
+
+def test_benchmark_gate():
+    """Every benchmark case runs and the regression gate flags slowdowns"""
+    print("=== Testing Benchmark Regression Gate ===")
+    results = run_benchmarks(depths=(5,), orders_per_level=(2,), repeat=1, min_time=0.001, verbose=False)
+    assert 'market_sweep[ticks,depth=5,per_level=2]' in results
+    assert 'pnl_record_trade[depth=5,per_level=2]' in results
+    assert all(ops > 0 for ops in results.values()), results
+
+    baseline = {'results': dict(results)}
+    assert compare(results, baseline, threshold=0.2) == []
+    slower = dict(results, **{'tree_insert[decimal,depth=5,per_level=2]': results['tree_insert[decimal,depth=5,per_level=2]'] / 2})
+    regressions = compare(slower, baseline, threshold=0.2)
+    assert [key for key, _, _, _ in regressions] == ['tree_insert[decimal,depth=5,per_level=2]'], regressions
+
+    # A machine half as fast is not a regression once normalized by the calibration workload
+    half_speed = {key: ops / 2 for key, ops in results.items()}
+    assert len(compare(half_speed, baseline, threshold=0.2)) == len(results) - 1
+    assert compare(half_speed, baseline, threshold=0.2, normalize=True) == []
+
+    print("✓ test_benchmark_gate PASSED!")
+    print()
+
+
+def test_latency_stats():
+    """Latency histograms classify outcomes and keep percentiles within a bucket width"""
+    print("=== Testing Latency Histograms ===")
+    import math, random
+    rng = random.Random(3)
+    values = sorted(int(rng.lognormvariate(9, 1.5)) for _ in range(5000))
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    for p in (50, 99, 99.9):
+        exact = values[max(0, math.ceil(len(values) * p / 100) - 1)]
+        estimate = histogram.percentile(p)
+        assert exact <= estimate <= exact * (1 + 1 / 32) + 1, f"p{p}: {estimate} vs exact {exact}"
+    assert histogram.percentile(100) == values[-1] == histogram.max
+
+    book = OrderBook(track_latency=True)
+    book.process_order({'type': 'limit', 'side': 'ask', 'price': Decimal('101'), 'quantity': 5})   # rested
+    book.process_order({'type': 'limit', 'side': 'bid', 'price': Decimal('101'), 'quantity': 2})   # filled
+    book.process_order({'type': 'limit', 'side': 'bid', 'price': Decimal('101'), 'quantity': 4})   # partial
+    book.process_order({'type': 'market', 'side': 'bid', 'quantity': 1})                           # unfilled
+    book.modify_order(3, {'side': 'bid', 'price': Decimal('100'), 'quantity': 1})                  # repriced
+    book.cancel_order('bid', 3)
+    book.cancel_order('bid', 3)                                                                     # not_found
+
+    stats = book.latency_stats()
+    counts = {(op, outcome): summary['count'] for op, outcomes in stats.items() for outcome, summary in outcomes.items()}
+    assert counts == {('limit', 'rested'): 1, ('limit', 'filled'): 1, ('limit', 'partial'): 1,
+                      ('market', 'unfilled'): 1, ('match', 'filled'): 1, ('match', 'partial'): 1,
+                      ('modify', 'repriced'): 1, ('cancel', 'cancelled'): 1, ('cancel', 'not_found'): 1}, counts
+    summary = stats['limit']['rested']
+    assert 0 < summary['p50_ns'] <= summary['p99_ns'] <= summary['p99.9_ns'] <= summary['max_ns']
+
+    print("✓ test_latency_stats PASSED!")
+    print()
+
+
+def test_event_bus():
+    """Filtered, batched, conflated delivery on a consumer thread that never stalls the publisher"""
+    print("=== Testing Event Bus ===")
+    import threading
+    gate, entered = threading.Event(), threading.Event()
+    trades, batches, market_data, errors = [], [], [], []
+    bus = EventBus(maxsize=5, overflow='drop', on_error=lambda event, e: errors.append(event))
+
+    def slow_monitor(event, data):
+        entered.set()
+        gate.wait()  # a consumer that is stuck until the publisher is done
+        market_data.append(data['price'])
+
+    bus.subscribe(slow_monitor, events='market_data')
+    bus.subscribe(lambda event, data: trades.append(data['id']), events=['trade'])
+    bus.subscribe(lambda items: batches.append([event for event, _ in items]), batch=True)
+    bus.subscribe(lambda event, data: 1 / 0, events='order')
+
+    bus.publish('market_data', {'price': 0})
+    assert entered.wait(5)
+    for price in range(1, 1000):
+        bus.publish('market_data', {'price': price})
+    for trade_id in range(3):
+        bus.publish('trade', {'id': trade_id})
+    bus.publish('order', {})
+    for trade_id in range(3, 100):
+        bus.publish('trade', {'id': trade_id})  # the queue (1 market data marker + 4 events) is full
+    gate.set()
+    bus.close()
+
+    assert market_data == [0, 999], f"Expected conflated market data, got {market_data}"
+    assert trades == [0, 1, 2], trades
+    assert bus.dropped == 97 and bus.conflated == 998, bus.stats()
+    assert errors == ['order'] and bus.errors == 1
+    assert sum(len(batch) for batch in batches) == len(market_data) + 4
+
+    print("✓ test_event_bus PASSED!")
+    print()
+
+
+def test_async_simulator():
+    """Hundreds of markets share one event loop, paced by asyncio.sleep, with async callbacks"""
+    print("=== Testing Async Simulator ===")
+    import asyncio
+    configs = [Config(duration=30, order_rate=2.0, seed=seed) for seed in range(200)]
+    trades = [0] * len(configs)
+    ticks = []
+
+    def counter(i):
+        async def on_trade(event, data):
+            await asyncio.sleep(0)  # callbacks may await
+            trades[i] += len(data['trades'])
+        return on_trade
+
+    simulators = [AsyncSimulator(config) for config in configs]
+    for i, sim in enumerate(simulators):
+        sim.subscribe(counter(i), events='trade')
+    simulators[0].subscribe(lambda event, data: ticks.append(data['timestamp']), events='market_data')
+
+    started = time.perf_counter()
+    results = asyncio.run(run_markets(simulators, speed=300))
+    elapsed = time.perf_counter() - started
+
+    assert elapsed >= 0.8 * 30 / 300, f"Markets were not paced in real time ({elapsed:.3f}s)"
+    for i in (0, 1, 199):
+        reference = Simulator(configs[i], bus=EventBus(threaded=False))
+        reference_trades = []
+        reference.subscribe(lambda event, data: reference_trades.extend(data['trades']), events='trade')
+        assert results[i] == reference.run_virtual(), "Same seed should give the virtual clock results"
+        assert trades[i] == len(reference_trades), "Every trade event should reach its market's callback"
+    assert sum(trades) > 0 and ticks and ticks == sorted(ticks) and ticks[-1] < 30
+
+    print("✓ test_async_simulator PASSED!")
+    print()
+
+
+def test_depth_feed_handler(tmp_path):
+    """A recorded diff-depth feed is applied level by level, with stale diffs dropped and gaps detected"""
+    print("=== Testing Depth Feed Handler ===")
+    import json, random
+    rng = random.Random(5)
+    prices = [f"{100 + i / 100:.2f}" for i in range(-60, 60)]
+    snapshot = {'lastUpdateId': 1000,
+                'bids': [[p, f"{rng.uniform(0.1, 5):.4f}"] for p in prices[:50]],
+                'asks': [[p, f"{rng.uniform(0.1, 5):.4f}"] for p in prices[70:]]}
+    messages = [snapshot, {'U': 990, 'u': 1000, 'b': [[prices[0], "9"]], 'a': []}]  # already in the snapshot
+    update_id = 998
+    for _ in range(300):
+        diff = {'U': update_id + 1, 'u': max(update_id + rng.randint(1, 3), 1001), 'b': [], 'a': []}  # the first overlaps the snapshot
+        update_id = diff['u']
+        for _ in range(rng.randint(1, 4)):
+            i = rng.randrange(len(prices))
+            quantity = "0.00000000" if rng.random() < 0.3 else f"{rng.uniform(0.1, 5):.4f}"
+            diff['b' if i < 60 else 'a'].append([prices[i], quantity])
+        messages.append(diff)
+    messages.append({'U': update_id + 5, 'u': update_id + 6, 'b': [[prices[1], "1"]], 'a': []})  # gap
+    path = tmp_path / "depth_feed.jsonl"
+    path.write_text("\n".join(json.dumps(message) for message in messages))
+
+    # Expected book: snapshot then every in-sequence diff, rebuilt from scratch
+    expected = {'bids': {}, 'asks': {}}
+    for side, key in (('bids', 'bids'), ('asks', 'asks')):
+        expected[side] = {Decimal(p): Decimal(q) for p, q in snapshot[key]}
+    changes = 0
+    for diff in messages[2:-1]:
+        for side, key in (('bids', 'b'), ('asks', 'a')):
+            for p, q in diff[key]:
+                if Decimal(q):
+                    expected[side][Decimal(p)] = Decimal(q)
+                    changes += 1
+                elif expected[side].pop(Decimal(p), None) is not None:
+                    changes += 1
+
+    for integer_ticks in (False, True):
+        book = OrderBook(integer_ticks=integer_ticks)
+        handler = DepthFeedHandler(book)
+        deltas = []
+        feed = read_feed(str(path))
+        handler.process(next(feed))  # the snapshot
+        book.add_depth_listener(lambda seq, side, price, volume: deltas.append(seq))
+        for message in feed:
+            handler.process(message)
+        depth = book.get_depth(1000)
+        for side, reverse in (('bids', True), ('asks', False)):
+            want = sorted(expected[side].items(), reverse=reverse)
+            assert [(Decimal(p), Decimal(q)) for p, q in depth[side]] == want, f"{side} differ (integer_ticks={integer_ticks})"
+        assert handler.stale == 1 and handler.applied == 300 and handler.gaps == 1 and not handler.synced
+        assert len(deltas) == changes, "Only the levels a diff changes should be touched"
+        assert book.bids.num_orders == book.bids.depth, "One order per feed level"
+
+    print("✓ test_depth_feed_handler PASSED!")
+    print()
+
+
+def test_feed_recording_replay(tmp_path):
+    """A chunked, compressed recording replays into the same book, at full speed or paced"""
+    print("=== Testing Feed Recording and Replay ===")
+    import json, random
+    rng = random.Random(11)
+    messages = [{'lastUpdateId': 10,
+                 'bids': [[f"{100 - i / 100:.8f}", f"{rng.uniform(0.1, 5):.8f}"] for i in range(1, 100)],
+                 'asks': [[f"{100 + i / 100:.8f}", f"{rng.uniform(0.1, 5):.8f}"] for i in range(100)]}]
+    for update_id in range(11, 2011):
+        side, sign = ('b', -1) if rng.random() < 0.5 else ('a', 1)
+        level = [f"{100 + sign * rng.randint(1, 120) / 100:.8f}", "0.00000000" if rng.random() < 0.3 else f"{rng.uniform(0.1, 5):.8f}"]
+        messages.append({'U': update_id, 'u': update_id, 'E': update_id, 'b': [level] if side == 'b' else [],
+                         'a': [level] if side == 'a' else []})
+    raw = [json.dumps(message) for message in messages]
+    start_ns = 1_700_000_000_000_000_000
+    timestamps = [start_ns + i * 100_000 for i in range(len(raw))]  # 0.1 ms apart, 0.2 s in total
+
+    path = str(tmp_path / "depth.feed")
+    recorder = FeedRecorder(path, chunk_size=4096)
+    for message, timestamp in zip(raw, timestamps):
+        recorder.write(message, timestamp)
+    recorder.close()
+    assert recorder.chunks > 10, "Expected the recording to be split into chunks"
+    assert [(t, m.decode()) for t, m in read_recording(path)] == list(zip(timestamps, raw))
+
+    expected = DepthFeedHandler(OrderBook())
+    for message in messages:
+        expected.process(message)
+    want = expected.book.get_depth(1000)
+
+    for integer_ticks in (False, True):
+        handler = DepthFeedHandler(OrderBook(integer_ticks=integer_ticks))
+        stats = replay_recording(path, handler)
+        assert stats['messages'] == len(messages) and stats['applied'] == 2000 and stats['gaps'] == 0
+        assert handler.book.get_depth(1000) == want, f"Replay differs (integer_ticks={integer_ticks})"
+
+    stats = replay_recording(path, DepthFeedHandler(OrderBook()), speed=4)
+    assert stats['seconds'] >= 0.8 * 0.2 / 4, f"Paced replay ran too fast ({stats['seconds']:.3f}s)"
+
+    # Strings go straight to ticks/lots; anything finer than the tick falls back to Decimal rounding
+    assert parse_scaled("67123.45000000", 2) == 6712345 and parse_scaled("0.001", 8) == 100000
+    assert parse_scaled("7", 2) == 700 and parse_scaled("1.005", 2) is None and parse_scaled("1.5", None) is None
+
+    # A chunk cut short by a crash is skipped, the chunks before it still replay
+    with open(path, 'rb+') as f:
+        f.truncate(f.seek(0, 2) - 10)
+    assert 0 < sum(1 for _ in read_recording(path)) < len(messages)
+
+    print("✓ test_feed_recording_replay PASSED!")
+    print()
+
+
+def test_cancel_by_id_and_owner():
+    """Orders are cancelled and modified by id alone, and a whole owner ladder goes in one call"""
+    print("=== Testing Cancel by Id and Owner ===")
+    for integer_ticks in (False, True):
+        books = [OrderBook(integer_ticks=integer_ticks) for _ in range(2)]
+        for book in books:
+            for i in range(5):
+                for owner in ('mm', 'other', 'mm'):
+                    book.process_order({'type': 'limit', 'side': 'bid', 'price': Decimal(99 - i), 'quantity': 2, 'owner': owner})
+                    book.process_order({'type': 'limit', 'side': 'ask', 'price': Decimal(101 + i), 'quantity': 2, 'owner': owner})
+            book.process_order({'type': 'market', 'side': 'bid', 'quantity': 5})  # fills mm and other at 101, part of the next mm
+        book, reference = books
+        mm_orders = book.owner_order_ids('mm')
+        assert len(mm_orders) == 19 and book.order_side(mm_orders[0]) == 'bid', "Filled orders should leave the owner index"
+
+        bid_id = mm_orders[0]
+        book.modify_order(bid_id, {'price': Decimal('98.5'), 'quantity': 1})  # no side needed
+        reference.modify_order(bid_id, {'side': 'bid', 'price': Decimal('98.5'), 'quantity': 1})
+        assert book.cancel(mm_orders[1]) and reference.cancel(mm_orders[1]) and not book.cancel(10 ** 6)
+
+        deltas = []
+        book.add_depth_listener(lambda seq, side, price, volume: deltas.append((side, price, volume)))
+        assert book.cancel_all('mm') == 18 and book.cancel_all('mm') == 0
+        for order_id in mm_orders[:1] + mm_orders[2:]:
+            reference.cancel_order(reference.order_side(order_id), order_id)
+        assert book.get_depth(20) == reference.get_depth(20), "Mass cancel should match one-by-one cancels"
+        assert len(deltas) == 10, "One depth delta per level touched"  # 98.5 emptied, the rest keep 'other'
+        assert book.bids.num_orders == 5 and book.asks.num_orders == 4 and 'mm' not in book.owner_orders
+        assert book.owner_order_ids('other') == reference.owner_order_ids('other')
+
+    print("✓ test_cancel_by_id_and_owner PASSED!")
+    print()
+
+
+def test_replace_ladder():
+    """A requote only touches the levels that changed; quantity cuts keep queue priority"""
+    print("=== Testing Replace Ladder ===")
+    for integer_ticks in (False, True):
+        book = OrderBook(integer_ticks=integer_ticks)
+        first = book.replace_ladder('mm', bids=[(99, 2), (98, 2), (97, 2)], asks=[(101, 2), (102, 2), (103, 2)])
+        assert first['inserted'] == 6 and not first['trades']
+        others = [book.process_order({'type': 'limit', 'side': 'bid', 'price': price, 'quantity': 1, 'owner': 'other'})[1]['order_id']
+                  for price in (99, 98)]
+        ids = book.owner_order_ids('mm')
+        assert len(set(ids)) == 6, "Every quote should get its own order id"
+
+        deltas = []
+        book.add_depth_listener(lambda seq, side, price, volume: deltas.append((side, price, volume)))
+        assert book.replace_ladder('mm', [(99, 2), (98, 2), (97, 2)], [(101, 2), (102, 2), (103, 2)])['unchanged'] == 6
+        assert not deltas, "An identical ladder should not touch the book"
+
+        # 99 cut, 98 raised, 97 kept, 96 new; 101 dropped, 102/103 kept, 100.5 new and crossing nothing
+        result = book.replace_ladder('mm', [(99, 1), (98, 3), (97, 2), (96, 2)], [(100.5, 2), (102, 2), (103, 2)])
+        assert (result['unchanged'], result['amended'], result['cancelled'], result['inserted']) == (3, 2, 1, 2), result
+        assert len(deltas) == 5, "Only changed levels should emit depth deltas"
+        volume = lambda side, price: book.get_volume_at_price(side, price)
+        assert volume('bid', 99) == 2 and volume('bid', 98) == 4 and volume('bid', 96) == 2 and volume('ask', 101) == 0
+
+        # The cut at 99 keeps its place ahead of 'other'; the raise at 98 goes behind it
+        trades, _ = book.process_order({'type': 'market', 'side': 'ask', 'quantity': 1})
+        assert trades[0]['sell_order_id'] == ids[0], "Quantity cut should keep queue priority"
+        trades, _ = book.process_order({'type': 'market', 'side': 'ask', 'quantity': 2})
+        assert [trade['sell_order_id'] for trade in trades] == others, "Quantity raise should lose queue priority"
+
+        assert book.cancel_all('mm') == 7 - 1, "The filled quote should have left the ladder"
+
+    print("✓ test_replace_ladder PASSED!")
+    print()
+
+
+def test_queue_position():
+    """Queue position stays exact through fills, cancels, modifies and restores"""
+    print("=== Testing Queue Position ===")
+    import random
+    from decimal import Context, MAX_PREC, MAX_EMAX, MIN_EMIN
+    exact = Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN)
+
+    def walk(book, order_id):
+        tree = book.bids if book.order_side(order_id) == 'bid' else book.asks
+        volume, orders = 0, 0
+        for order in tree.get_order(order_id).order_list:
+            if order.order_id == order_id:
+                return (book.from_lots(volume) if book.integer_ticks else volume), orders
+            volume = exact.add(volume, order.quantity) # the global context would round the sum
+            orders += 1
+
+    def quantity(rng):
+        # Non-integer sizes: cents, floats with up to 8 places, and more digits than the global precision
+        return rng.choice([Decimal(rng.randint(1, 500)) / 100, round(rng.uniform(0.1, 5), rng.randint(1, 8)),
+                           Decimal('12345.12345678')])
+
+    for options in ({}, {'integer_ticks': True}, {'integer_ticks': True, 'ladder_capacity': 16}):
+        rng = random.Random(3)
+        book = OrderBook(**options)
+        resting = []
+        for step in range(1500):
+            action = rng.random()
+            side = 'bid' if rng.random() < 0.5 else 'ask'
+            if action < 0.5 or not resting:
+                price = Decimal(99 - rng.randint(0, 3)) if side == 'bid' else Decimal(101 + rng.randint(0, 3))
+                _, quote = book.process_order({'type': 'limit', 'side': side, 'price': price, 'quantity': quantity(rng)})
+                if quote is None:
+                    continue
+                resting.append(quote['order_id'])
+            elif action < 0.7:
+                book.cancel(resting.pop(rng.randrange(len(resting))))
+            elif action < 0.85:
+                order_id = rng.choice(resting)
+                tree = book.bids if book.order_side(order_id) == 'bid' else book.asks
+                price = tree.get_order(order_id).price
+                book.modify_order(order_id, {'price': book.from_ticks(price) if book.integer_ticks else price,
+                                             'quantity': quantity(rng)})
+            else:
+                book.process_order({'type': 'market', 'side': side, 'quantity': quantity(rng)})
+            resting = [order_id for order_id in resting if book.order_side(order_id) is not None]
+            if step % 250 == 249 and 'ladder_capacity' not in options:
+                restored = OrderBook(**options)
+                restored.restore(book.snapshot())
+                book = restored
+            for order_id in rng.sample(resting, min(len(resting), 5)):
+                assert book.queue_position(order_id) == walk(book, order_id), f"Step {step}: wrong position for {order_id}"
+        assert all(book.queue_position(order_id) == walk(book, order_id) for order_id in resting)
+        assert book.queue_position(10 ** 6) is None
+
+    # A lone order has nothing ahead of it, however many digits its size has
+    book = OrderBook()
+    _, quote = book.process_order({'type': 'limit', 'side': 'ask', 'price': 100, 'quantity': Decimal('12345.12345678')})
+    assert book.queue_position(quote['order_id']) == (0, 0)
+    book.process_order({'type': 'market', 'side': 'bid', 'quantity': 0.1})
+    assert book.queue_position(quote['order_id']) == (0, 0), "A partially filled head order has nothing ahead"
+
+    print("✓ test_queue_position PASSED!")
+    print()
+
+
+def test_fill_buffer():
+    """Sweeps write into a reused fill buffer; the view gives the same trades as the dict API"""
+    print("=== Testing Fill Buffer ===")
+    for integer_ticks in (False, True):
+        books = [OrderBook(integer_ticks=integer_ticks) for _ in range(2)]
+        for book in books:
+            for level in range(400):
+                book.process_order({'type': 'limit', 'side': 'ask', 'price': Decimal(100) + Decimal(level) / 100,
+                                    'quantity': Decimal('1.5')})
+        book, reference = books
+        buffer = book.fill_buffer
+        price_column = buffer.price
+
+        fills, _ = book.process_order_fills({'type': 'market', 'side': 'bid', 'quantity': 450})
+        trades, _ = reference.process_order({'type': 'market', 'side': 'bid', 'quantity': 450})
+        assert len(fills) == len(trades) == 300 and fills.to_dicts() == trades == list(fills)
+        assert fills[-1] == trades[-1] and fills.maker_id(0) == 1
+        if integer_ticks:
+            assert fills.price(0) == 10000 and fills.quantity(0) == book.to_lots('1.5'), "Views read engine units"
+        else:
+            assert fills.price(0) == Decimal(100) and fills.quantity(0) == Decimal('1.5')
+
+        capacity = buffer.capacity
+        assert capacity == 512 and buffer.price is price_column, "The buffer should have grown once, in place"
+        fills, _ = book.process_order_fills({'type': 'market', 'side': 'bid', 'quantity': 150})
+        assert len(fills) == 100 and buffer.capacity == capacity, "A warm buffer is reused, not reallocated"
+        fills, _ = book.process_order_fills({'type': 'limit', 'side': 'bid', 'price': 90, 'quantity': 1})
+        assert len(fills) == 0 and fills.to_dicts() == []
+
+    print("✓ test_fill_buffer PASSED!")
+    print()
+
+
+def test_off_grid_rejected():
+    """Integer tick mode should reject prices and quantities off the tick/lot grid instead of rounding them"""
+    print("=== Testing Off-Grid Input ===")
+    ob = OrderBook(integer_ticks=True, lot_size=Decimal('0.0001'))
+    assert ob.to_ticks('99.50') == 9950 and ob.to_lots(0.25) == 2500
+
+    for quote in ({'price': '99.505', 'quantity': 1, 'side': 'bid', 'type': 'limit'},
+                  {'price': 99, 'quantity': Decimal('0.00001'), 'side': 'bid', 'type': 'limit'},
+                  {'quantity': '1.00005', 'side': 'ask', 'type': 'market'}):
+        try:
+            ob.process_order(quote)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"Off-grid order should be rejected: {quote}")
+    assert ob.bids.num_orders == 0 and ob.tape.total_count == 0, "A rejected order must not touch the book"
+
+    print("✓ test_off_grid_rejected PASSED!")
+    print()
+
+
+def test_tape_lazy_allocation():
+    """The tape should allocate its columns as trades arrive, not the whole capacity up front"""
+    print("=== Testing Lazy Tape Allocation ===")
+    assert OrderBook().tape.allocated == 1024, "A fresh book should not preallocate the full tape"
+
+    tape = TradeTape(capacity=5000, trade_window=100, time_window=50)
+    trades = [(t, 100 + t % 7, 1 + t % 3) for t in range(6000)]
+    for timestamp, price, qty in trades[:3000]:
+        tape.append(timestamp, price, qty, 'maker', 'ask', timestamp, None, 'taker')
+    assert tape.allocated == 4096 and len(tape) == 3000, f"Expected 4096 slots, got {tape.allocated}"
+    for timestamp, price, qty in trades[3000:]:
+        tape.append(timestamp, price, qty, 'maker', 'ask', timestamp, None, 'taker')
+    assert tape.allocated == 5000 and len(tape) == 5000, "Columns should stop growing at capacity"
+
+    # Once wrapped, the ring holds the newest trades and the windows match a brute force recomputation
+    assert [(record['timestamp'], record['price']) for record in tape] == [(t, p) for t, p, _ in trades[1000:]]
+    last = trades[-100:]
+    assert abs(tape.last_n.vwap() - sum(p * q for _, p, q in last) / sum(q for _, _, q in last)) < 1e-9
+    assert tape.last_t.count == 50, f"Expected 50 trades in the time window, got {tape.last_t.count}"
+
+    print("✓ test_tape_lazy_allocation PASSED!")
+    print()
+
+
+def test_manager_worker_failures():
+    """A dead worker or an unpicklable result should raise or fail one request, never hang flush()"""
+    print("=== Testing Manager Worker Failures ===")
+    import queue, pickle, threading
+
+    # Run a shard worker in this process: a result that cannot be pickled fails alone
+    requests, responses = queue.Queue(), queue.Queue()
+    requests.put((0, [(0, 'BTC/USD', 'process_order',
+                       ({'type': 'limit', 'side': 'bid', 'price': 1, 'quantity': 1, 'tag': threading.Lock()},), {}),
+                      (1, 'BTC/USD', 'get_best_bid', (), {})]))
+    requests.put(None)
+    _shard_worker(0, requests, responses, {})
+    _, _, payload = responses.get_nowait()
+    results = dict(pickle.loads(payload))
+    assert isinstance(results[0], RuntimeError) and results[1] == Decimal('1'), f"Unexpected results {results}"
+
+    with OrderBookManager(num_workers=2, response_timeout=5) as manager:
+        manager.workers[0].terminate()
+        manager.workers[0].join()
+        symbol = next(s for s in ('BTC/USD', 'ETH/USD', 'SOL/USD', 'XRP/USD') if shard_for(s, 2) == 0)
+        manager.submit(symbol, {'type': 'limit', 'side': 'bid', 'price': 1, 'quantity': 1})
+        started = time.perf_counter()
+        try:
+            manager.flush()
+        except RuntimeError as e:
+            assert 'died' in str(e)
+        else:
+            raise AssertionError("flush() should raise when a worker is dead")
+        assert time.perf_counter() - started < 5, "A dead worker should be noticed without waiting for the timeout"
+
+    print("✓ test_manager_worker_failures PASSED!")
+    print()
+
+
+def test_journal_exact_decimal(tmp_path):
+    """A Decimal book journal should replay exactly, including quantities float64 cannot hold"""
+    print("=== Testing Exact Decimal Journal ===")
+    path = str(tmp_path / "journal_exact.bin")
+    book = OrderBook()
+    book.open_journal(path)
+    book.process_order({'price': Decimal('100.1'), 'quantity': Decimal('0.1'), 'side': 'ask', 'type': 'limit'})
+    book.process_order({'price': '100.2', 'quantity': 0.1, 'side': 'ask', 'type': 'limit'})
+    book.process_order({'price': Decimal('100.123456789012345678'), 'quantity': Decimal('12345.12345678'),
+                        'side': 'ask', 'type': 'limit'})
+    book.process_order({'price': 99.7, 'quantity': Decimal('0.3'), 'side': 'bid', 'type': 'limit'})
+    book.process_order({'quantity': Decimal('0.15'), 'side': 'bid', 'type': 'market'})
+    book.modify_order(4, {'price': Decimal('99.8'), 'quantity': Decimal('0.7')})
+    book.close_journal()
+
+    replayed = OrderBook()
+    assert replay_journal(path, replayed) == 6
+    assert str(replayed) == str(book), f"Replayed book differs:\n{replayed}\n{book}"
+    original = [(order.price, order.quantity) for tree in (book.bids, book.asks) for order in tree.order_map.values()]
+    restored = [(order.price, order.quantity) for tree in (replayed.bids, replayed.asks)
+                for order in tree.order_map.values()]
+    assert restored == original, f"Prices/quantities changed on replay:\n{restored}\n{original}"
+    # A float quantity rests as Decimal(float) in the engine, and must do so again on replay
+    assert replayed.asks.get_order(2).quantity == Decimal(0.1) and 1 not in replayed.asks.order_map
+
+    print("✓ test_journal_exact_decimal PASSED!")
+    print()
+
+
+def test_journal_append(tmp_path):
+    """Reopening a journal should validate its header and resume cleanly after a torn record"""
+    print("=== Testing Journal Append ===")
+    for integer_ticks in (False, True):
+        path = str(tmp_path / f"journal_append_{integer_ticks}.bin")
+        book = OrderBook(integer_ticks=integer_ticks)
+        book.open_journal(path)
+        book.process_order({'price': Decimal('100.5'), 'quantity': 2, 'side': 'ask', 'type': 'limit'})
+        book.process_order({'price': Decimal('99'), 'quantity': 3, 'side': 'bid', 'type': 'limit'})
+        book.close_journal()
+        with open(path, 'ab') as f:
+            f.write(b'\x00\x01\x00') # a record torn by a crash
+
+        # The other tick mode, or another tick size, must not append records in the wrong format
+        for kwargs in ({'integer_ticks': not integer_ticks}, {'integer_ticks': integer_ticks, 'tick_size': '0.5'}):
+            try:
+                OrderBook(**kwargs).open_journal(path)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"Reopening with {kwargs} should be refused")
+
+        book.open_journal(path)
+        book.process_order({'quantity': 1, 'side': 'bid', 'type': 'market'})
+        book.process_order({'price': Decimal('99.5'), 'quantity': 1, 'side': 'bid', 'type': 'limit'})
+        book.close_journal()
+
+        replayed = OrderBook(integer_ticks=integer_ticks)
+        assert replay_journal(path, replayed) == 4, "The torn bytes should have been cut before appending"
+        assert str(replayed) == str(book), f"Replayed book differs:\n{replayed}\n{book}"
+
+    print("✓ test_journal_append PASSED!")
+    print()
+
+
+def test_restore_depth_deltas():
+    """Restoring a snapshot should emit the L2 deltas that bring a depth mirror up to date"""
+    print("=== Testing Restore Depth Deltas ===")
+    for kwargs in ({}, {'integer_ticks': True}):
+        source = OrderBook(**kwargs)
+        source.process_order({'price': Decimal('100.5'), 'quantity': 2, 'side': 'ask', 'type': 'limit'})
+        source.process_order({'price': Decimal('101'), 'quantity': 1, 'side': 'ask', 'type': 'limit'})
+        source.process_order({'price': Decimal('99'), 'quantity': 3, 'side': 'bid', 'type': 'limit'})
+
+        book = OrderBook(**kwargs)
+        mirror = {}
+        seqs = []
+
+        def on_delta(seq, side, price, volume):
+            seqs.append(seq)
+            if volume:
+                mirror[(side, price)] = volume
+            else:
+                mirror.pop((side, price), None)
+        book.add_depth_listener(on_delta)
+        book.process_order({'price': Decimal('100.5'), 'quantity': 2, 'side': 'ask', 'type': 'limit'})
+        book.process_order({'price': Decimal('98'), 'quantity': 1, 'side': 'bid', 'type': 'limit'})
+        book.process_order({'price': Decimal('99'), 'quantity': 1, 'side': 'bid', 'type': 'limit'})
+        before = book.depth_seq
+
+        book.restore(source.snapshot())
+        depth = book.get_depth()
+        expected = {('bid', price): volume for price, volume in depth['bids']}
+        expected.update({('ask', price): volume for price, volume in depth['asks']})
+        assert mirror == expected, f"Mirror out of sync after restore: {mirror} != {expected}"
+        # 98 removed, 99 changed, 101 added; the unchanged 100.5 ask needs no delta
+        assert book.depth_seq == before + 3 and seqs == list(range(1, book.depth_seq + 1))
+
+    print("✓ test_restore_depth_deltas PASSED!")
+    print()
+
+
+def test_unrealized_pnl_decimal_price():
+    """Unrealized P&L should accept the Decimal prices the OrderBook returns"""
+    print("=== Testing Unrealized P&L with Decimal Prices ===")
+    ob = OrderBook()
+    ob.process_order({'price': Decimal('101.5'), 'quantity': 1, 'side': 'bid', 'type': 'limit'})
+    tracker = PnLTracker(verbose=False)
+    assert tracker.get_unrealized_pnl(ob.get_best_bid()) == 0.0, "No open position means no unrealized P&L"
+
+    tracker.record_trade(100, 2, 'buy')
+    tracker.record_trade(103, 1, 'sell')
+    unrealized = tracker.get_unrealized_pnl(ob.get_best_bid())
+    assert unrealized == 1.5, f"Expected unrealized P&L of 1.5, got {unrealized}"
+    assert tracker.get_total_pnl(Decimal('101.5')) == 4.5
+
+    print("✓ test_unrealized_pnl_decimal_price PASSED!")
+    print()
+
+
+def test_benchmark_gc_restored():
+    """A failing benchmark case must not leave the garbage collector disabled"""
+    print("=== Testing Benchmark GC Restore ===")
+    import gc
+    from benchmark import measure
+
+    def failing_case(depth, per_level, integer_ticks):
+        def run(state):
+            raise RuntimeError("case failed")
+        return dict, run
+
+    assert gc.isenabled()
+    try:
+        measure(failing_case, 10, 1, False, repeat=1)
+    except RuntimeError:
+        pass
+    assert gc.isenabled(), "measure() left the garbage collector disabled"
+
+    print("✓ test_benchmark_gc_restored PASSED!")
+    print()
+
+
+def test_feed_recording_resume(tmp_path):
+    """Resuming a recording after a crash should drop the torn chunk and keep the file readable"""
+    print("=== Testing Feed Recording Resume ===")
+    path = str(tmp_path / "resume.feed")
+    recorder = FeedRecorder(path, chunk_size=64)
+    for i in range(20):
+        recorder.write(f'{{"u": {i}}}', i)
+    recorder.close()
+    complete = list(read_recording(path))
+    assert len(complete) == 20
+
+    # A crash in the middle of a chunk: full header, payload cut short
+    with open(path, 'ab') as f:
+        f.write(CHUNK.pack(100, 3, 0, 0) + b'\x78\x9c\x01')
+    assert list(read_recording(path)) == complete, "A torn chunk should end the stream cleanly"
+
+    recorder = FeedRecorder(path, chunk_size=64)
+    for i in range(20, 30):
+        recorder.write(f'{{"u": {i}}}', i)
+    recorder.close()
+    resumed = list(read_recording(path))
+    assert [timestamp for timestamp, _ in resumed] == list(range(30)), "Appended chunks should follow the last complete one"
+
+    # A complete but corrupt chunk also ends the stream instead of raising zlib.error
+    with open(path, 'ab') as f:
+        f.write(CHUNK.pack(4, 1, 0, 0) + b'junk')
+    assert list(read_recording(path)) == resumed
+
+    with open(str(tmp_path / "not.feed"), 'wb') as f:
+        f.write(b'something else')
+    try:
+        FeedRecorder(str(tmp_path / "not.feed"))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Appending to a file that is not a recording should be refused")
+
+    print("✓ test_feed_recording_resume PASSED!")
+    print()
+
+
+def test_owner_recovery(tmp_path):
+    """Journal replay and snapshot restore should bring back the owner index, so requoting adds no duplicates"""
+    print("=== Testing Owner Recovery ===")
+    for integer_ticks in (False, True):
+        path = str(tmp_path / f"journal_owners_{integer_ticks}.bin")
+        book = OrderBook(integer_ticks=integer_ticks)
+        book.open_journal(path)
+        ladder = {'bids': [(Decimal('99'), 1)], 'asks': [(Decimal('101'), 1)]}
+        book.replace_ladder('mm', **ladder)
+        book.process_order({'price': Decimal('98'), 'quantity': 2, 'side': 'bid', 'type': 'limit', 'owner': 'other'})
+        book.process_order({'price': Decimal('102'), 'quantity': 2, 'side': 'ask', 'type': 'limit'})
+        book.close_journal()
+
+        replayed = OrderBook(integer_ticks=integer_ticks)
+        replay_journal(path, replayed)
+        restored = OrderBook(integer_ticks=integer_ticks)
+        restored.restore(book.snapshot())
+        for recovered in (replayed, restored):
+            assert recovered.owner_orders == book.owner_orders, f"Owner index lost: {recovered.owner_orders}"
+            result = recovered.replace_ladder('mm', **ladder)
+            assert result['unchanged'] == 2 and result['inserted'] == 0, f"Requote after recovery: {result}"
+            assert recovered.bids.num_orders == 2 and recovered.asks.num_orders == 2, "Quotes were duplicated"
+            assert recovered.cancel_all('other') == 1
+
+    print("✓ test_owner_recovery PASSED!")
+    print()
+
+
+def test_replace_ladder_validation():
+    """A bad ladder entry leaves the book untouched; a zero quantity pulls the level"""
+    print("=== Testing Replace Ladder Validation ===")
+    for integer_ticks in (False, True):
+        book = OrderBook(integer_ticks=integer_ticks)
+        book.replace_ladder('mm', bids=[(99, 1), (98, 1)], asks=[(101, 1)])
+        before = book.get_depth()
+        ids = book.owner_order_ids('mm')
+
+        bad_asks = [(101.005, 1)] if integer_ticks else [(101, -1)]
+        try:
+            book.replace_ladder('mm', bids=[(97, 1)], asks=bad_asks)
+            assert False, "A bad ask entry should raise"
+        except ValueError:
+            pass
+        try:
+            book.replace_ladder('mm', bids=[(97, -1)])
+            assert False, "A negative quantity should raise"
+        except ValueError:
+            pass
+        assert book.get_depth() == before and book.owner_order_ids('mm') == ids, "A rejected ladder should change nothing"
+
+        result = book.replace_ladder('mm', bids=[(99, 0), (98, 1)], asks=[(101, 1), (102, 0)])
+        assert (result['unchanged'], result['cancelled'], result['inserted']) == (2, 1, 0), result
+        assert [price for price, _ in book.get_depth()['bids']] == [98], "Quantity 0 should cancel the level"
+        trades, _ = book.process_order({'type': 'market', 'side': 'ask', 'quantity': 1})
+        assert [trade['quantity'] for trade in trades] == [1], "No 0 quantity order should be left to trade"
+
+    print("✓ test_replace_ladder_validation PASSED!")
+    print()
+
+
+def test_manager_stale_responses():
+    """Late answers to a flush() that timed out must not be taken as answers to the next call"""
+    print("=== Testing Manager Stale Responses ===")
+    slow = [{'type': 'limit', 'side': 'bid', 'price': 1 + i % 50, 'quantity': 1} for i in range(50000)]
+    with OrderBookManager(num_workers=1, response_timeout=0.05) as manager:
+        for call_next in ('flush', 'stats'):
+            manager.response_timeout = 0.05
+            manager.call('BTC/USD', 'process_orders', slow)
+            try:
+                manager.flush()
+            except TimeoutError:
+                pass
+            else:
+                raise AssertionError("The slow batch should time out")
+            manager.response_timeout = 30
+            if call_next == 'flush':
+                manager.submit('BTC/USD', {'type': 'limit', 'side': 'ask', 'price': 1000, 'quantity': 1})
+                [(trades, order_in_book)] = manager.flush()
+                assert trades == [] and order_in_book['price'] == Decimal('1000'), "flush() took the stale batch's answer"
+            else:
+                [stats] = manager.stats()
+                assert isinstance(stats, dict) and stats['shard'] == 0, "stats() took the stale batch's answer"
+                assert stats['requests'] == 3, "Every batch should have been applied by the shard"
+
+    print("✓ test_manager_stale_responses PASSED!")
+    print()
+
+
+def test_feed_book_user_orders():
+    """Orders placed on a feed-built book get their own ids, and the book can be snapshotted"""
+    print("=== Testing Feed Book User Orders ===")
+    for integer_ticks in (False, True):
+        book = OrderBook(integer_ticks=integer_ticks)
+        handler = DepthFeedHandler(book)
+        handler.process({'lastUpdateId': 1, 'bids': [["100.00", "1"], ["99.00", "2"]], 'asks': [["101.00", "1"]]})
+        _, order = book.process_order({'type': 'limit', 'side': 'bid', 'price': Decimal('98'), 'quantity': 1})
+        depth = book.get_depth()
+        assert [price for price, _ in depth['bids']] == [100, 99, 98], "A user order should not replace a feed level"
+        assert book.bids.num_orders == 3 and book.asks.num_orders == 1
+
+        restored = OrderBook(integer_ticks=integer_ticks)
+        restored.restore(book.snapshot())
+        assert restored.get_depth() == depth, "A feed-built book should survive snapshot/restore"
+        assert restored.cancel(order['order_id']) and len(restored.bids) == 2
+
+    print("✓ test_feed_book_user_orders PASSED!")
+    print()
+
+
+def test_feed_resync_deltas():
+    """A resync snapshot sends depth listeners the deltas for every level it changed or dropped"""
+    print("=== Testing Feed Resync Deltas ===")
+    for integer_ticks in (False, True):
+        book = OrderBook(integer_ticks=integer_ticks)
+        handler = DepthFeedHandler(book)
+        mirror = {}
+
+        def on_delta(seq, side, price, volume):
+            if volume:
+                mirror[(side, price)] = volume
+            else:
+                mirror.pop((side, price), None)
+        book.add_depth_listener(on_delta)
+        handler.process({'lastUpdateId': 1, 'bids': [["100.00", "1"], ["99.00", "2"], ["98.00", "3"]],
+                         'asks': [["101.00", "1"], ["102.00", "2"]]})
+        book.process_order({'type': 'limit', 'side': 'bid', 'price': Decimal('97'), 'quantity': 1, 'owner': 'mm'})
+        book.process_order({'type': 'limit', 'side': 'bid', 'price': Decimal('99'), 'quantity': 1, 'owner': 'mm'})
+        assert not handler.process({'U': 5, 'u': 6, 'b': [], 'a': []}) and not handler.synced
+
+        seq = book.depth_seq
+        # 100 unchanged, 99 (with an mm order behind the feed) reset, 98 and 97 dropped, 96 new; 101 changed, 102 dropped
+        handler.process({'lastUpdateId': 10, 'bids': [["100.00", "1"], ["99.00", "2"], ["96.00", "4"]],
+                         'asks': [["101.00", "5"]]})
+        depth = book.get_depth()
+        expected = {('bid', price): volume for price, volume in depth['bids']}
+        expected.update({('ask', price): volume for price, volume in depth['asks']})
+        assert mirror == expected, f"Mirror out of sync after resync: {mirror} != {expected}"
+        assert [price for price, _ in depth['bids']] == [100, 99, 96] and depth['asks'] == [(101, 5)]
+        # 99 is removed and re-entered (2 deltas), 98, 97 and 102 removed, 96 and 101 set; 100 is left alone
+        assert book.depth_seq - seq == 7, "Unchanged levels should not be sent again"
+        assert book.bids.num_orders == book.bids.depth, "One order per feed level"
+        assert book.owner_order_ids('mm') == [] and book.cancel_all('mm') == 0, "Owners of removed orders should be dropped"
+
+    print("✓ test_feed_resync_deltas PASSED!")
+    print()
+
+
+def test_modify_unknown_order():
+    """Modifying an order that has just been filled returns False instead of exiting"""
+    print("=== Testing Modify Unknown Order ===")
+    for integer_ticks in (False, True):
+        book = OrderBook(integer_ticks=integer_ticks, track_latency=True)
+        _, quote = book.process_order({'type': 'limit', 'side': 'ask', 'price': Decimal('101'), 'quantity': 1})
+        book.process_order({'type': 'market', 'side': 'bid', 'quantity': 1})
+        assert book.modify_order(quote['order_id'], {'price': Decimal('102'), 'quantity': 1}) is False
+        assert len(book.asks) == 0, "A failed modify should not change the book"
+        assert book.latency_stats()['modify']['not_found']['count'] == 1
+
+        _, quote = book.process_order({'type': 'limit', 'side': 'ask', 'price': Decimal('101'), 'quantity': 1})
+        assert book.modify_order(quote['order_id'], {'price': Decimal('102'), 'quantity': 2}) is True
+        assert book.get_volume_at_price('ask', Decimal('102')) == 2
+
+    print("✓ test_modify_unknown_order PASSED!")
+    print()
+
+
+def test_owner_types(tmp_path):
+    """Integer owners survive journal replay and snapshots; other owner types are rejected up front"""
+    print("=== Testing Owner Types ===")
+    for integer_ticks in (False, True):
+        path = tmp_path / f"owner_types_{integer_ticks}.bin"
+        book = OrderBook(integer_ticks=integer_ticks)
+        book.open_journal(str(path))
+        book.replace_ladder(7, bids=[(99, 1), (98, 1)], asks=[(101, 1)])
+        book.process_order({'type': 'limit', 'side': 'bid', 'price': Decimal('97'), 'quantity': 1, 'owner': '7'})
+        book.close_journal()
+
+        replayed = OrderBook(integer_ticks=integer_ticks)
+        replay_journal(str(path), replayed)
+        restored = OrderBook(integer_ticks=integer_ticks)
+        restored.restore(book.snapshot())
+        for copy in (replayed, restored):
+            assert copy.owner_order_ids(7) == book.owner_order_ids(7) and copy.owner_order_ids('7') == book.owner_order_ids('7')
+            assert copy.replace_ladder(7, bids=[(99, 1), (98, 1)], asks=[(101, 1)])['unchanged'] == 3
+            assert copy.cancel_all(7) == 3 and copy.cancel_all('7') == 1
+
+        for owner in (('mm', 1), 1.5, True):
+            try:
+                book.process_order({'type': 'limit', 'side': 'bid', 'price': Decimal('90'), 'quantity': 1, 'owner': owner})
+                assert False, f"Owner {owner!r} should be rejected"
+            except TypeError:
+                pass
+        assert book.get_volume_at_price('bid', Decimal('90')) == 0
+
+    print("✓ test_owner_types PASSED!")
+    print()
+
+
+def test_journal_fixed_width(tmp_path):
+    """Integer tick journal records all have the same width; owners live in a side table kept across appends"""
+    print("=== Testing Journal Fixed Width ===")
+    import os
+    from journal import HEADER, INT_RECORD, read_journal
+    path = str(tmp_path / "journal_fixed.bin")
+    book = OrderBook(integer_ticks=True)
+    book.open_journal(path)
+    book.process_order({'price': Decimal('100.5'), 'quantity': 2, 'side': 'ask', 'type': 'limit', 'owner': 'a long owner name'})
+    book.process_order({'price': Decimal('99'), 'quantity': 3, 'side': 'bid', 'type': 'limit', 'owner': 7})
+    book.process_order({'price': Decimal('98'), 'quantity': 1, 'side': 'bid', 'type': 'limit'})
+    book.cancel(2)
+    book.close_journal()
+    assert os.path.getsize(path) == HEADER.size + 4 * INT_RECORD.size, "Records should not grow with the owner"
+    with open(path + '.owners', 'ab') as f:
+        f.write(b'\x09\x00si') # an owner entry torn by a crash
+
+    book.open_journal(path)
+    book.process_order({'price': Decimal('98.5'), 'quantity': 1, 'side': 'bid', 'type': 'limit', 'owner': 'mm'})
+    book.process_order({'price': Decimal('101'), 'quantity': 1, 'side': 'ask', 'type': 'limit', 'owner': 'a long owner name'})
+    book.close_journal()
+    owners = [record[-1] for record in read_journal(path)]
+    assert owners == ['a long owner name', 7, None, None, 'mm', 'a long owner name'], owners
+
+    replayed = OrderBook(integer_ticks=True)
+    replay_journal(path, replayed)
+    assert str(replayed) == str(book)
+    assert replayed.owner_order_ids('a long owner name') == book.owner_order_ids('a long owner name') == [1, 5]
+
+    print("✓ test_journal_fixed_width PASSED!")
+    print()
+
+
+def test_tape_no_decimal_per_fill():
+    """Integer tick fills reach the tape as correctly rounded floats without building Decimals"""
+    print("=== Testing Tape Without Decimal Per Fill ===")
+    import random
+    rng = random.Random(3)
+    book = OrderBook(integer_ticks=True, tick_size=Decimal('0.05'), lot_size=Decimal('0.001'))
+    for _ in range(200):
+        book.process_order({'type': 'limit', 'side': 'ask', 'price': Decimal(rng.randint(2000, 2100)) * book.tick_size,
+                            'quantity': Decimal(rng.randint(1, 5000)) * book.lot_size})
+    conversions = []
+    for name in ('from_ticks', 'from_lots'):
+        convert = getattr(book, name)
+        setattr(book, name, lambda value, convert=convert: conversions.append(value) or convert(value))
+    fills = book.process_orders(sides=['bid'] * 50, types=['market'] * 50, prices=[None] * 50,
+                                quantities=[Decimal(rng.randint(1, 9000)) * book.lot_size for _ in range(50)])
+    assert not conversions, f"{len(conversions)} Decimal conversions on the fill path"
+    del book.from_ticks, book.from_lots
+    assert len(book.tape) == len(fills.price) > 50
+    for record, price, quantity in zip(book.tape, fills.price, fills.quantity):
+        assert record['price'] == float(book.from_ticks(price)) and record['quantity'] == float(book.from_lots(quantity))
+
+    print("✓ test_tape_no_decimal_per_fill PASSED!")
+    print()
+
+
 def manual_order_test():
     """Interactive manual testing - FIXED VERSION with proper Decimal handling"""
     print("=== Manual Order Entry Mode  ===")
@@ -290,6 +1663,51 @@ if __name__ == "__main__":
     test_simple_buy_sell()
     test_multiple_trades()
     test_quote_from_orderbook()
+    test_integer_tick_mode()
+    test_order_pool_recycling()
+    test_batch_process_orders()
+    test_ladder_order_tree()
+    test_depth_snapshot_cache()
+    test_depth_delta_feed()
+    test_bounded_trade_tape()
+    test_virtual_clock_simulation()
+    test_order_book_manager()
+    import tempfile, pathlib
+    with tempfile.TemporaryDirectory() as tmp:
+        test_journal_replay(pathlib.Path(tmp))
+        test_monte_carlo_resume(pathlib.Path(tmp))
+        test_depth_feed_handler(pathlib.Path(tmp))
+        test_feed_recording_replay(pathlib.Path(tmp))
+        test_journal_exact_decimal(pathlib.Path(tmp))
+        test_journal_append(pathlib.Path(tmp))
+        test_feed_recording_resume(pathlib.Path(tmp))
+        test_owner_recovery(pathlib.Path(tmp))
+        test_owner_types(pathlib.Path(tmp))
+        test_journal_fixed_width(pathlib.Path(tmp))
+    test_snapshot_restore()
+    test_pnl_tracker_aggregates()
+    test_pnl_tracker_batch()
+    test_market_maker_sweep()
+    test_benchmark_gate()
+    test_latency_stats()
+    test_event_bus()
+    test_async_simulator()
+    test_cancel_by_id_and_owner()
+    test_replace_ladder()
+    test_queue_position()
+    test_fill_buffer()
+    test_off_grid_rejected()
+    test_tape_lazy_allocation()
+    test_manager_worker_failures()
+    test_restore_depth_deltas()
+    test_unrealized_pnl_decimal_price()
+    test_benchmark_gc_restored()
+    test_replace_ladder_validation()
+    test_manager_stale_responses()
+    test_feed_book_user_orders()
+    test_feed_resync_deltas()
+    test_modify_unknown_order()
+    test_tape_no_decimal_per_fill()
     
     print("All automated tests PASSED!")
     print()
@@ -29,24 +29,29 @@ def generate_plots():
     trades = create_sample_data()
     spread_data = simulate_spread_data()
     
-    # Process trades through P&L tracker
-    inventory_over_time = []
-    pnl_over_time = []
+    # Process all trades through the P&L tracker in one batch
     tracker = PnLTracker()
     
     print("Processing sample trades...")
     for i, trade in enumerate(trades):
         print(f"Trade {i+1}: {trade}")
-        tracker.record_trade(trade["price"], trade["quantity"], trade["side"])
-        inventory_over_time.append(tracker.inventory)
-        pnl_over_time.append(tracker.realized_pnl)
+    prices = [trade["price"] for trade in trades]
+    series = tracker.record_trades(prices,
+                                   [trade["quantity"] for trade in trades],
+                                   [trade["side"] for trade in trades])
+    inventory_over_time = series["inventory"]
+    pnl_over_time = series["realized_pnl"]
+    # Total P&L with the open position marked at each trade price
+    total_pnl_over_time = tracker.mark_to_market(prices)["total_pnl"]
     
     # Create the plots - I'm making 3 subplots side by side
     plt.figure(figsize=(15, 5))
     
     # Plot 1: Cumulative P&L over time
     plt.subplot(1, 3, 1)
-    plt.plot(range(len(pnl_over_time)), pnl_over_time, marker='o', color='green', linewidth=2)
+    plt.plot(range(len(pnl_over_time)), pnl_over_time, marker='o', color='green', linewidth=2, label='Realized')
+    plt.plot(range(len(total_pnl_over_time)), total_pnl_over_time, color='gray', linestyle=':', label='Total (marked)')
+    plt.legend()
     plt.title("Cumulative P&L Over Time")
     plt.xlabel("Trade Number")
     plt.ylabel("P&L ($)")